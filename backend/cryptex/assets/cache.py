@@ -0,0 +1,118 @@
+import threading
+import time
+import uuid
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+CATALOGUE_VERSION_KEY = "assets:catalogue:version"
+CATALOGUE_KEY = "assets:catalogue:{version}"
+CATALOGUE_TIMEOUT = 60 * 60 * 24
+LOCAL_TTL = 5
+MISSING_KEY = "assets:missing:{asset_id}"
+MISSING_TIMEOUT = 60
+
+
+class AssetCatalogueCache:
+    """
+    Two-tier cache of serialized asset payloads keyed by id.
+
+    The shared tier is the default Django cache (Redis when ``CACHE_URL`` is
+    set, local memory otherwise) and holds the catalogue under a version
+    key. The process-local tier keeps the last catalogue it saw and only
+    re-checks the shared version every ``LOCAL_TTL`` seconds, so most reads
+    never leave the process. Invalidation bumps the shared version, which
+    every process picks up within ``LOCAL_TTL``.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.payloads = None
+        self.checked_at = 0.0
+
+    def all(self):
+        """Every asset payload, ordered by symbol."""
+        return sorted(self.catalogue().values(), key=lambda payload: payload['symbol'])
+
+    def get(self, asset_id):
+        """The payload for ``asset_id``, or None if no such asset exists."""
+        asset_id = str(asset_id)
+        payload = self.catalogue().get(asset_id)
+        if payload is None:
+            # The asset may be newer than our copy of the catalogue.
+            payload = self.catalogue(recheck=True).get(asset_id)
+        if payload is None:
+            payload = self.lookup_missing(asset_id)
+        return payload
+
+    def lookup_missing(self, asset_id):
+        """
+        Read one asset the shared catalogue lacks. Misses are remembered for
+        ``MISSING_TIMEOUT`` so probing unknown ids costs one query per id,
+        and a hit means the catalogue is stale, so it is invalidated.
+        """
+        from .models import Asset
+        from .serializers import AssetSerializer
+        try:
+            uuid.UUID(asset_id)
+        except ValueError:
+            return None
+        missing_key = MISSING_KEY.format(asset_id=asset_id)
+        if cache.get(missing_key):
+            return None
+        asset = Asset.objects.using(DEFAULT_DB_ALIAS).filter(pk=asset_id).first()
+        if asset is None:
+            cache.set(missing_key, True, MISSING_TIMEOUT)
+            return None
+        self.invalidate()
+        return dict(AssetSerializer(asset).data)
+
+    def invalidate(self):
+        cache.set(CATALOGUE_VERSION_KEY, uuid.uuid4().hex, None)
+        with self.lock:
+            self.version = None
+            self.payloads = None
+
+    def catalogue(self, recheck=False):
+        """The catalogue by id; ``recheck`` skips the local tier's TTL."""
+        now = time.monotonic()
+        with self.lock:
+            if not recheck and self.payloads is not None and now - self.checked_at < LOCAL_TTL:
+                return self.payloads
+
+        version = cache.get(CATALOGUE_VERSION_KEY)
+        if version is None:
+            version = uuid.uuid4().hex
+            if not cache.add(CATALOGUE_VERSION_KEY, version, None):
+                version = cache.get(CATALOGUE_VERSION_KEY)
+
+        with self.lock:
+            if version == self.version and self.payloads is not None:
+                self.checked_at = now
+                return self.payloads
+
+        key = CATALOGUE_KEY.format(version=version)
+        payloads = cache.get(key)
+        if payloads is None:
+            payloads = load_catalogue()
+            cache.set(key, payloads, CATALOGUE_TIMEOUT)
+
+        with self.lock:
+            self.version = version
+            self.payloads = payloads
+            self.checked_at = now
+        return payloads
+
+
+def load_catalogue():
+    # Always the primary: a lagging replica read right after invalidate()
+    # would cache the old catalogue under the new version.
+    from .models import Asset
+    from .serializers import AssetSerializer
+    return {
+        str(payload['id']): dict(payload)
+        for payload in AssetSerializer(Asset.objects.using(DEFAULT_DB_ALIAS), many=True).data
+    }
+
+
+asset_cache = AssetCatalogueCache()
@@ -18,4 +18,28 @@ class AssetSerializer(serializers.ModelSerializer):
         """
         if not value or len(value) == 0:
             raise serializers.ValidationError("Symbol cannot be empty.")
-        return value.upper() 
\ No newline at end of file
+        return value.upper()
+
+
+class CachedAssetField(serializers.RelatedField):
+    """
+    Read-only asset field rendered from the catalogue cache by id, so the
+    embedding serializer never has to join or fetch the asset row.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        # ``many=True`` builds the list field from these kwargs, not ours.
+        kwargs['read_only'] = True
+        return super().many_init(*args, **kwargs)
+
+    def use_pk_only_optimization(self):
+        return True
+
+    def to_representation(self, value):
+        from .cache import asset_cache
+        return asset_cache.get(value.pk)
@@ -0,0 +1,12 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cache import asset_cache
+from .models import Asset
+
+
+@receiver(post_save, sender=Asset)
+@receiver(post_delete, sender=Asset)
+def invalidate_asset_cache(sender, **kwargs):
+    """Drop cached asset payloads once any asset write commits."""
+    transaction.on_commit(asset_cache.invalidate)
@@ -1,3 +1,41 @@
 from django.test import TestCase
+from .cache import asset_cache
+from .models import Asset
 
-# Create your tests here.
+
+class AssetCacheTests(TestCase):
+    def setUp(self):
+        asset_cache.invalidate()
+        self.asset = Asset.objects.create(name='Tether', symbol='USDT')
+
+    def test_reads_are_served_from_cache(self):
+        self.client.get('/api/assets/')
+        with self.assertNumQueries(0):
+            listed = self.client.get('/api/assets/')
+            retrieved = self.client.get(f'/api/assets/{self.asset.id}/')
+        self.assertEqual([payload['symbol'] for payload in listed.data], ['USDT'])
+        self.assertEqual(retrieved.data['name'], 'Tether')
+
+    def test_writes_through_the_api_invalidate_the_cache(self):
+        self.client.get('/api/assets/')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/assets/{self.asset.id}/', {'name': 'Tether USD'}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/assets/').data[0]['name'], 'Tether USD')
+
+    def test_unknown_asset_is_not_found(self):
+        self.assertEqual(self.client.get('/api/assets/not-a-uuid/').status_code, 404)
+
+    def test_unknown_ids_never_reload_the_catalogue(self):
+        import uuid
+        self.client.get('/api/assets/')
+        probe = f'/api/assets/{uuid.uuid4()}/'
+        with self.assertNumQueries(1):  # that one row
+            self.assertEqual(self.client.get(probe).status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(probe).status_code, 404)
+
+        added = Asset.objects.create(name='Bitcoin', symbol='BTC')  # commit hooks do not run here
+        self.assertEqual(self.client.get(f'/api/assets/{added.id}/').data['symbol'], 'BTC')
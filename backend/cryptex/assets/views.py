@@ -1,10 +1,28 @@
+import uuid
+from django.http import Http404
 from rest_framework import viewsets
+from rest_framework.response import Response
+from .cache import asset_cache
 from .models import Asset
 from .serializers import AssetSerializer
 
 class AssetViewSet(viewsets.ModelViewSet):
     """
     A viewset for viewing and editing asset instances.
+    Reads are served from the asset catalogue cache.
     """
     queryset = Asset.objects.all()
     serializer_class = AssetSerializer
+
+    def list(self, request, *args, **kwargs):
+        return Response(asset_cache.all())
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            asset_id = uuid.UUID(str(kwargs[self.lookup_field]))
+        except ValueError:
+            raise Http404
+        payload = asset_cache.get(asset_id)
+        if payload is None:
+            raise Http404
+        return Response(payload)
@@ -0,0 +1,67 @@
+import asyncio
+import weakref
+from channels.db import database_sync_to_async
+from .models import ChatMessage
+
+FLUSH_INTERVAL = 0.005
+MAX_BATCH_SIZE = 100
+
+
+class ChatMessageBuffer:
+    """
+    Write-behind buffer for chat messages received over websockets.
+
+    Messages queue up until ``max_batch_size`` are waiting or
+    ``flush_interval`` seconds have passed since the first one, then the
+    whole batch is written with one ``bulk_create``. Each writer awaits the
+    saved row, so it can acknowledge the server id to its client.
+    """
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL, max_batch_size=MAX_BATCH_SIZE):
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self.pending = []
+        self.timer = None
+
+    async def write(self, message):
+        """Queue an unsaved ChatMessage and return it once it is persisted."""
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((message, future))
+        if len(self.pending) >= self.max_batch_size:
+            await self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(
+                self.flush_interval, lambda: asyncio.ensure_future(self.flush())
+            )
+        return await future
+
+    async def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        try:
+            await database_sync_to_async(ChatMessage.objects.bulk_create)(
+                [message for message, _ in batch]
+            )
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for message, future in batch:
+            if not future.done():
+                future.set_result(message)
+
+
+_buffers = weakref.WeakKeyDictionary()
+
+
+def get_chat_buffer():
+    """The buffer for the running event loop; futures cannot cross loops."""
+    loop = asyncio.get_running_loop()
+    if loop not in _buffers:
+        _buffers[loop] = ChatMessageBuffer()
+    return _buffers[loop]
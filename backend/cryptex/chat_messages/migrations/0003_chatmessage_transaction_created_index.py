@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_messages', '0002_initial'),
+        ('transactions', '0009_transaction_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['transaction', 'created_at', 'id'], name='chat_txn_created_idx'),
+        ),
+    ]
@@ -11,6 +11,11 @@ class ChatMessage(BaseModel):
     recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_messages')
     transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='messages', blank=True, null=True)
     content = models.TextField(blank=False, null=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['transaction', 'created_at', 'id'], name='chat_txn_created_idx'),
+        ]
     
     def __str__(self):
         return f"Message from {self.sender.username} to {self.recipient.username} at {self.timestamp}"
@@ -1,4 +1,6 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
+from cryptex.query_plan import SparseFieldsetMixin, related
 from .models import ChatMessage
 from users.models import User
 from users.serializers import UserSerializer
@@ -6,8 +8,13 @@ from transactions.serializers import TransactionSerializer
 from transactions.models import Transaction
 
 
-class ChatMessageSerializer(serializers.ModelSerializer):
+class ChatMessageSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for ChatMessage model."""
+    field_plans = {
+        'sender': related('sender', UserSerializer),
+        'recipient': related('recipient', UserSerializer),
+        'transaction': related('transaction', TransactionSerializer),
+    }
     sender = UserSerializer(read_only=True)
     recipient = UserSerializer(read_only=True)
     transaction = TransactionSerializer(read_only=True)
@@ -36,4 +43,29 @@ class ChatMessageSerializer(serializers.ModelSerializer):
             'content', 'created_at',
             'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+
+MESSAGES_LIMIT_DEFAULT = 20
+MESSAGES_LIMIT_MAX = 100
+
+
+class EmbeddedChatMessageSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Compact read-only message shape for embedding under a transaction."""
+
+    class Meta:
+        model = ChatMessage
+        fields = ['id', 'sender', 'recipient', 'content', 'created_at']
+        read_only_fields = fields
+
+
+def recent_messages_prefetch(limit=MESSAGES_LIMIT_DEFAULT):
+    """
+    Prefetch the newest ``limit`` messages of every transaction on a page.
+    Django turns the sliced queryset into a single ROW_NUMBER() window query.
+    """
+    return Prefetch(
+        'messages',
+        queryset=ChatMessage.objects.order_by('-created_at', '-id')[:limit],
+        to_attr='recent_messages',
+    )
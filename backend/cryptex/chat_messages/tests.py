@@ -1,3 +1,46 @@
+from functools import partial
 from django.test import TestCase
+from cryptex.testing import QueryBudgetMixin, TradeFixturesMixin
+from .models import ChatMessage
 
-# Create your tests here.
+
+class ChatMessageQueryBudgetTests(TradeFixturesMixin, QueryBudgetMixin, TestCase):
+    def test_list_query_count_is_flat(self):
+        ChatMessage.objects.create(
+            sender=self.seller, recipient=self.vendor.user, transaction=self.make_trade(), content='hi'
+        )
+        self.assertFlatQueryCount('/api/chat_messages/', partial(self.grow_trades, messages=True), budget=6)
+
+
+class ChatMessageSyncTests(TradeFixturesMixin, TestCase):
+    def send(self, trade, content):
+        return ChatMessage.objects.create(
+            sender=self.seller, recipient=self.vendor.user, transaction=trade, content=content
+        )
+
+    def test_sync_returns_only_messages_after_cursor(self):
+        trade = self.make_trade()
+        self.send(self.make_trade(), 'other trade')
+        for content in ('one', 'two', 'three'):
+            self.send(trade, content)
+
+        url = f'/api/chat_messages/sync/?transaction_id={trade.id}&limit=2'
+        first = self.client.get(url).data
+        self.assertEqual([m['content'] for m in first['results']], ['one', 'two'])
+        self.assertTrue(first['has_more'])
+
+        second = self.client.get(f"{url}&after={first['cursor']}").data
+        self.assertEqual([m['content'] for m in second['results']], ['three'])
+        self.assertFalse(second['has_more'])
+
+        self.send(trade, 'four')
+        third = self.client.get(f"{url}&after={second['cursor']}").data
+        self.assertEqual([m['content'] for m in third['results']], ['four'])
+
+    def test_sync_requires_transaction_id(self):
+        self.assertEqual(self.client.get('/api/chat_messages/sync/').status_code, 400)
+
+    def test_sync_rejects_a_malformed_transaction_id(self):
+        response = self.client.get('/api/chat_messages/sync/?transaction_id=abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('transaction_id', response.data)
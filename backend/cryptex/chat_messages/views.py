@@ -1,9 +1,21 @@
+import uuid
+from django.db.models import Q
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from cryptex.exports import streaming_export
+from cryptex.pagination import decode_cursor, encode_cursor
+from cryptex.query_plan import QueryPlanMixin
 from .models import ChatMessage
-from .serializers import ChatMessageSerializer
+from .serializers import ChatMessageSerializer, EmbeddedChatMessageSerializer
 
+SYNC_LIMIT_DEFAULT = 100
+SYNC_LIMIT_MAX = 500
 
-class ChatMessageViewSet(viewsets.ModelViewSet):
+
+class ChatMessageViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and editing chat message instances.
     """
@@ -24,5 +36,62 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
         if sender_id:
             queryset = queryset.filter(sender_id=sender_id)
         if recipient_id:
-            queryset = queryset.filter(recipient_id=recipient_id)    
+            queryset = queryset.filter(recipient_id=recipient_id)
         return queryset
+
+    @action(detail=False, methods=['get'])
+    def sync(self, request):
+        """
+        Return the messages of a transaction newer than the client's cursor,
+        oldest first, in the compact embedded shape.
+
+        Pass the ``cursor`` from the previous response as ``after``; keep
+        calling while ``has_more`` is true.
+        """
+        transaction_id = request.query_params.get('transaction_id')
+        if not transaction_id:
+            raise ValidationError({'transaction_id': 'This query parameter is required.'})
+        try:
+            transaction_id = uuid.UUID(transaction_id)
+        except ValueError:
+            raise ValidationError({'transaction_id': 'A valid UUID is required.'})
+        queryset = ChatMessage.objects.filter(transaction_id=transaction_id)
+
+        after = request.query_params.get('after')
+        if after:
+            try:
+                created_at, pk = decode_cursor(after)
+            except ValueError:
+                created_at = None
+            if created_at is None:
+                raise ValidationError({'after': 'Invalid cursor.'})
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            )
+
+        limit = self.sync_limit()
+        messages = list(queryset.order_by('created_at', 'id')[:limit + 1])
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        cursor = encode_cursor(messages[-1].created_at, messages[-1].pk) if messages else after
+        return Response({
+            'results': EmbeddedChatMessageSerializer(messages, many=True).data,
+            'cursor': cursor,
+            'has_more': has_more,
+        })
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """
+        Stream every chat message as flat CSV (or NDJSON with
+        ``output=ndjson``), oldest first. ``since``/``until`` bound
+        ``created_at``; ``after`` resumes from a row's ``cursor`` column.
+        """
+        return streaming_export(request, 'chat_messages')
+
+    def sync_limit(self):
+        try:
+            limit = int(self.request.query_params['limit'])
+        except (KeyError, ValueError):
+            return SYNC_LIMIT_DEFAULT
+        return max(1, min(limit, SYNC_LIMIT_MAX))
@@ -10,17 +10,24 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cryptex.settings')
+
+# Populate the app registry before routing imports consumers that use models.
+django_asgi_app = get_asgi_application()
+
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 import transactions.routing
-
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cryptex.settings')
+from users.middleware import JWTAuthMiddleware
 
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
-        URLRouter(
-            transactions.routing.websocket_urlpatterns
+        JWTAuthMiddleware(
+            URLRouter(
+                transactions.routing.websocket_urlpatterns
+            )
         )
     ),
 })
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import math
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_databases, teardown_databases
+)
+
+IN_MEMORY_CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer",
+    },
+}
+
+BENCHMARK_CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer",
+        "CONFIG": {"capacity": 100_000},
+    },
+}
+
+
+@contextmanager
+def scratch_environment(keepdb=False):
+    """
+    Run a benchmark against throwaway test databases and an in-memory
+    channel layer so it never touches real data or a live Redis.
+    """
+    # setup_databases also points replica aliases (test mirrors) at the scratch database.
+    old_config = setup_databases(verbosity=0, interactive=False, keepdb=keepdb)
+    try:
+        with override_settings(CHANNEL_LAYERS=BENCHMARK_CHANNEL_LAYERS):
+            yield
+    finally:
+        teardown_databases(old_config, verbosity=0, keepdb=keepdb)
+
+
+def seed(users=200, vendors=50, trades=2_000, messages_per_trade=5, batch_size=2_000, rng=None):
+    """
+    Bulk-create a synthetic marketplace and return a few ids the scenarios
+    need. Rows are spread over the last year so time-ordered indexes see
+    realistic ranges.
+    """
+    from django.utils import timezone
+    from assets.models import Asset
+    from chat_messages.models import ChatMessage
+    from transactions.models import Transaction
+    from users.models import User
+    from vendors.models import Vendor
+    from vendors.stats import rebuild_vendor_stats
+
+    rng = rng or random.Random(0)
+    password = make_password(None)
+    assets = Asset.objects.bulk_create([
+        Asset(name=name, symbol=symbol)
+        for name, symbol in [('Bitcoin', 'BTC'), ('Ethereum', 'ETH'), ('Solana', 'SOL'),
+                             ('USD Coin', 'USDC'), ('Tether', 'USDT'), ('XRP', 'XRP')]
+    ])
+    sellers = User.objects.bulk_create([
+        User(username=f'seller{i}', email=f'seller{i}@bench.local', password=password, is_email_verified=True)
+        for i in range(users)
+    ], batch_size=batch_size)
+    vendor_users = User.objects.bulk_create([
+        User(username=f'vendor{i}', email=f'vendor{i}@bench.local', password=password,
+             is_vendor=True, is_email_verified=True)
+        for i in range(vendors)
+    ], batch_size=batch_size)
+    vendor_rows = Vendor.objects.bulk_create([
+        Vendor(user=user, display_name=f'Vendor {i}', contact_email=user.email,
+               rating=Decimal(rng.randint(100, 500)) / 100)
+        for i, user in enumerate(vendor_users)
+    ], batch_size=batch_size)
+    Through = Vendor.supported_assets.through
+    Through.objects.bulk_create([
+        Through(vendor_id=vendor.id, asset_id=asset.id)
+        for vendor in vendor_rows for asset in rng.sample(assets, 3)
+    ], batch_size=batch_size)
+
+    statuses = ['pending', 'completed', 'completed', 'cancelled']
+    trade_rows = Transaction.objects.bulk_create([
+        Transaction(seller=rng.choice(sellers), vendor=rng.choice(vendor_rows), asset=rng.choice(assets),
+                    quantity=Decimal(rng.randint(1, 10_000)) / 100, amount=Decimal(rng.randint(1, 10_000)),
+                    status=rng.choice(statuses))
+        for _ in range(trades)
+    ], batch_size=batch_size)
+    now = timezone.now()
+    for trade in trade_rows:
+        trade.created_at = now - timedelta(minutes=rng.randint(0, 525_600))
+    Transaction.objects.bulk_update(trade_rows, ['created_at'], batch_size=batch_size)
+
+    ChatMessage.objects.bulk_create([
+        ChatMessage(sender=trade.seller, recipient=trade.vendor.user, transaction=trade,
+                    content=f'message {i}')
+        for trade in trade_rows for i in range(messages_per_trade)
+    ], batch_size=batch_size)
+    rebuild_vendor_stats()  # bulk_create bypasses the incremental updates
+
+    busiest, _ = Counter(trade.vendor_id for trade in trade_rows).most_common(1)[0]
+    return {
+        'vendor_id': str(busiest),
+        'trade_id': str(trade_rows[0].id) if trade_rows else None,
+        'symbol': assets[0].symbol,
+    }
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def measure_endpoint(url, repeat=30, client=None):
+    """Latency percentiles (ms), queries and response size of GET ``url``."""
+    client = client or Client()
+    client.get(url)  # warm process caches
+    timings, queries = [], 0
+    for _ in range(repeat):
+        captures = [CaptureQueriesContext(connections[alias]) for alias in connections]
+        with ExitStack() as stack:
+            for capture in captures:
+                stack.enter_context(capture)
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = sum(len(capture) for capture in captures)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+    return {
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'queries': queries,
+        'bytes': len(response.content),
+    }
+
+
+def measure_fanout(trade_id, subscribers=20, frames=200):
+    """
+    Deliveries per second for frames broadcast to a ``trade_{id}`` group.
+    Subscribers sign in as the trade's seller and vendor in turn, and flow
+    control is opened up so every frame is delivered.
+    """
+    from channels.routing import URLRouter
+    from channels.testing import WebsocketCommunicator
+    from rest_framework_simplejwt.tokens import AccessToken
+    from transactions.models import Transaction
+    from transactions.routing import websocket_urlpatterns
+    from users.middleware import JWTAuthMiddleware
+
+    application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+    trade = Transaction.objects.select_related('seller', 'vendor__user').get(id=trade_id)
+    tokens = [str(AccessToken.for_user(user)) for user in (trade.seller, trade.vendor.user)]
+
+    async def run():
+        communicators = [
+            WebsocketCommunicator(application, f'/ws/trade/{trade_id}/?token={tokens[index % 2]}')
+            for index in range(subscribers)
+        ]
+        for communicator in communicators:
+            connected, _ = await communicator.connect()
+            if not connected:
+                raise RuntimeError(f"Websocket for trade {trade_id} was rejected")
+        sender = communicators[0]
+        started = time.perf_counter()
+        for index in range(frames):
+            await sender.send_to(text_data=json.dumps({'type': 'trade_update', 'seq': index}))
+        for communicator in communicators:
+            for _ in range(frames):
+                await communicator.receive_from(timeout=10)
+        elapsed = time.perf_counter() - started
+        for communicator in communicators:
+            await communicator.disconnect()
+        return elapsed
+
+    unthrottled = {'connection': (frames, frames), 'group': (frames, frames)}
+    with override_settings(WEBSOCKET_THROTTLE=unthrottled, WEBSOCKET_OUTBOUND_QUEUE=frames):
+        elapsed = asyncio.run(run())
+    return {
+        'deliveries': subscribers * frames,
+        'seconds': round(elapsed, 3),
+        'messages_per_s': round(subscribers * frames / elapsed, 1),
+    }
+
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    Regressions of ``results`` against ``baseline``: more queries than
+    before, a p50 slower by more than ``tolerance``, or lower throughput.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if 'queries' in current and current['queries'] > previous['queries']:
+            regressions.append(f"{name}: queries {previous['queries']} -> {current['queries']}")
+        if 'p50_ms' in current and current['p50_ms'] > previous['p50_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {previous['p50_ms']}ms -> {current['p50_ms']}ms")
+        if 'messages_per_s' in current and current['messages_per_s'] < previous['messages_per_s'] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {previous['messages_per_s']} -> {current['messages_per_s']} messages/s"
+            )
+    return regressions
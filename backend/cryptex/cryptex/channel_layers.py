@@ -0,0 +1,158 @@
+import bisect
+import contextvars
+import hashlib
+import random
+import re
+from contextlib import contextmanager
+from channels.layers import BaseChannelLayer, InMemoryChannelLayer
+from django.utils.module_loading import import_string
+
+RING_REPLICAS = 64
+
+_SHARD_CHANNEL = re.compile(r'^shard(\d+)\.(.+)$')
+_placement = contextvars.ContextVar('channel_placement', default=None)
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """
+    Consistent-hash ring over shard names. Each shard owns ``replicas``
+    points, so adding or removing one shard only moves the keys that hash
+    next to its points, about ``1/n`` of them.
+    """
+
+    def __init__(self, nodes, replicas=RING_REPLICAS):
+        points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(replicas))
+        self.hashes = [point for point, _ in points]
+        self.nodes = [node for _, node in points]
+
+    def node(self, key):
+        return self.nodes[bisect.bisect(self.hashes, _hash(key)) % len(self.hashes)]
+
+
+@contextmanager
+def placed_with(group):
+    """
+    Create channels inside this block on the shard that owns ``group``, so
+    ``group_send`` on that shard can deliver to them directly.
+    """
+    token = _placement.set(group)
+    try:
+        yield
+    finally:
+        _placement.reset(token)
+
+
+class ShardedChannelLayer(BaseChannelLayer):
+    """
+    Channel layer that spreads groups over several child layers (e.g. one
+    RedisChannelLayer per Redis host) by consistent hashing of the group
+    name. Configure it with::
+
+        "CONFIG": {"shards": [{"BACKEND": ..., "CONFIG": {...}}, ...]}
+
+    A group's messages only travel through the shard that owns it, so a
+    channel must live on that shard to join the group: consumers create
+    their channel inside ``placed_with(group)``. Specific channel names
+    carry their shard (``shard<n>.<child name>``); other channel names are
+    hashed onto the ring like groups. Shard numbers are positions in the
+    ``shards`` list, so append new hosts rather than reordering them.
+    """
+
+    extensions = ["groups", "flush"]
+
+    def __init__(self, shards, replicas=RING_REPLICAS, **kwargs):
+        super().__init__(**kwargs)
+        self.shards = [import_string(shard['BACKEND'])(**shard.get('CONFIG', {})) for shard in shards]
+        self.ring = HashRing([str(index) for index in range(len(self.shards))], replicas)
+
+    def shard_index(self, key):
+        return int(self.ring.node(key))
+
+    def locate(self, channel):
+        """``(child layer, child channel name)`` for one of our channel names."""
+        match = _SHARD_CHANNEL.match(channel)
+        if match and int(match.group(1)) < len(self.shards):
+            return self.shards[int(match.group(1))], match.group(2)
+        return self.shards[self.shard_index(channel)], channel
+
+    async def new_channel(self, prefix="specific."):
+        group = _placement.get()
+        index = self.shard_index(group) if group else random.randrange(len(self.shards))
+        return f"shard{index}.{await self.shards[index].new_channel(prefix)}"
+
+    async def send(self, channel, message):
+        self.require_valid_channel_name(channel)
+        shard, name = self.locate(channel)
+        await shard.send(name, message)
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        shard, name = self.locate(channel)
+        return await shard.receive(name)
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        shard, name = self.locate(channel)
+        owner = self.shards[self.shard_index(group)]
+        if shard is not owner:
+            raise ValueError(
+                f"Channel {channel} cannot join {group}: the group lives on another shard. "
+                "Create the channel inside placed_with(group)."
+            )
+        await owner.group_add(group, name)
+
+    async def group_discard(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        _, name = self.locate(channel)
+        await self.shards[self.shard_index(group)].group_discard(group, name)
+
+    async def group_send(self, group, message):
+        self.require_valid_group_name(group)
+        await self.shards[self.shard_index(group)].group_send(group, message)
+
+    async def flush(self):
+        for shard in self.shards:
+            await shard.flush()
+
+    async def close(self):
+        for shard in self.shards:
+            close = getattr(shard, 'close', None)
+            if close is not None:
+                await close()
+
+
+class SharedInMemoryChannelLayer(InMemoryChannelLayer):
+    """
+    In-memory layer whose queues and groups are shared by every instance
+    created with the same ``host``. Tests use it as a stand-in for one
+    Redis server reached by several app instances.
+    """
+
+    hosts = {}
+
+    def __init__(self, host="default", **kwargs):
+        super().__init__(**kwargs)
+        self.channels, self.groups = self.hosts.setdefault(host, (self.channels, self.groups))
+
+    async def flush(self):
+        self.channels.clear()
+        self.groups.clear()
+
+
+def sharded_in_memory_layers(shards=3):
+    """``CHANNEL_LAYERS`` for ``shards`` in-memory hosts behind a ShardedChannelLayer."""
+    return {
+        "default": {
+            "BACKEND": "cryptex.channel_layers.ShardedChannelLayer",
+            "CONFIG": {"shards": [
+                {"BACKEND": "cryptex.channel_layers.SharedInMemoryChannelLayer", "CONFIG": {"host": f"shard-{index}"}}
+                for index in range(shards)
+            ]},
+        },
+    }
@@ -0,0 +1,104 @@
+import contextvars
+import itertools
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+PRIMARY_PIN_COOKIE = 'db_primary_pin'
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+_rotation = itertools.count()
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextmanager
+def read_from_replica():
+    """Route reads inside this block to a replica, if any are configured."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes, migrations and ordinary reads use the primary. Reads made inside
+    ``read_from_replica()`` rotate over ``DATABASE_REPLICAS``.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if _replica_reads.get() and replicas:
+            return replicas[next(_rotation) % len(replicas)]
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the primary's data, so rows from either may be related.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replica_aliases()
+
+
+def primary_pin_key(user_id):
+    return f"db:primary-pin:{user_id}"
+
+
+def pinned_to_primary(request):
+    """Whether ``request`` comes from a client that wrote within the replica lag window."""
+    if request.COOKIES.get(PRIMARY_PIN_COOKIE):
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user is not None and user.is_authenticated and cache.get(primary_pin_key(user.pk)))
+
+
+class PrimaryPinMiddleware:
+    """
+    After a successful write, keep the client's reads on the primary for
+    ``DATABASE_REPLICA_LAG`` seconds so it reads its own writes. The pin is
+    a cookie for browsers plus a cache entry for authenticated API clients.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400 and replica_aliases():
+            lag = settings.DATABASE_REPLICA_LAG
+            response.set_cookie(PRIMARY_PIN_COOKIE, '1', max_age=lag, httponly=True, samesite='Lax')
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                cache.set(primary_pin_key(user.pk), True, lag)
+        return response
+
+
+class ReplicaReadMixin:
+    """
+    Viewset mixin serving ``replica_actions`` from a replica on safe
+    requests, unless the client is pinned to the primary after a write.
+    """
+    replica_actions = ('list',)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._replica_token = None
+        if (request.method in SAFE_METHODS and self.action in self.replica_actions
+                and not pinned_to_primary(request)):
+            self._replica_token = _replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _replica_reads.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
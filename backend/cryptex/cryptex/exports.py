@@ -0,0 +1,128 @@
+import csv
+import json
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+from .pagination import decode_cursor, encode_cursor, parse_bound
+
+EXPORT_CHUNK_SIZE = 2_000
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Flat columns per export; related values are joined in the same query
+# rather than rendered through nested serializers.
+EXPORTS = {
+    'transactions': ('transactions.Transaction', [
+        'id', 'created_at', 'updated_at', 'status',
+        'seller_id', 'seller__username', 'vendor_id', 'vendor__display_name',
+        'asset_id', 'asset__symbol', 'quantity', 'amount',
+        'value_paid_in_naira', 'transaction_hash',
+    ]),
+    'chat_messages': ('chat_messages.ChatMessage', [
+        'id', 'created_at', 'transaction_id',
+        'sender_id', 'sender__username', 'recipient_id', 'recipient__username', 'content',
+    ]),
+}
+
+
+def export_rows(name, since=None, until=None, after=None, using=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Value tuples for the ``name`` export, oldest first by ``(created_at,
+    id)``, over ``since <= created_at < until`` and past the ``after``
+    position (a decoded ``(created_at, id)`` cursor).
+
+    Rows stream from a server-side cursor in ``chunk_size`` batches, so
+    memory does not grow with the export.
+    """
+    model, columns = EXPORTS[name]
+    queryset = apps.get_model(model).objects.all()
+    if using:
+        queryset = queryset.using(using)
+    if since:
+        queryset = queryset.filter(created_at__gte=since)
+    if until:
+        queryset = queryset.filter(created_at__lt=until)
+    if after:
+        created_at, pk = after
+        queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+    return queryset.order_by('created_at', 'id').values_list(*columns).iterator(chunk_size=chunk_size)
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def _text(value):
+    if value is None:
+        return ''
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def render(name, rows, format='csv'):
+    """
+    Lines of the ``name`` export ``rows`` in ``format`` (csv or ndjson).
+    Each row ends with a ``cursor`` column; pass the last one received as
+    ``after`` to resume an interrupted export.
+    """
+    _, columns = EXPORTS[name]
+    id_index, created_index = columns.index('id'), columns.index('created_at')
+    writer = csv.writer(_Echo())
+    if format == 'csv':
+        yield writer.writerow([*columns, 'cursor'])
+    for values in rows:
+        cursor = encode_cursor(values[created_index], values[id_index])
+        if format == 'ndjson':
+            record = {column: None if value is None else _text(value) for column, value in zip(columns, values)}
+            record['cursor'] = cursor
+            yield json.dumps(record, separators=(',', ':'), ensure_ascii=False) + '\n'
+        else:
+            yield writer.writerow([*map(_text, values), cursor])
+
+
+async def stream_async(lines):
+    """
+    Serve the sync ``lines`` generator to an ASGI response one chunk at a
+    time. Django would otherwise drain a sync iterator into a list before
+    sending anything under ASGI. ``thread_sensitive`` keeps every pull on
+    the thread that owns the database cursor.
+    """
+    take = sync_to_async(lambda: ''.join(islice(lines, EXPORT_CHUNK_SIZE)), thread_sensitive=True)
+    while chunk := await take():
+        yield chunk
+
+
+def streaming_export(request, name, using=None):
+    """
+    ``StreamingHttpResponse`` for the ``name`` export, driven by the
+    ``output`` (csv or ndjson), ``since``, ``until`` and ``after`` query
+    parameters. (``format`` is taken by DRF's renderer override.)
+    """
+    params = request.query_params
+    format = params.get('output', 'csv')
+    if format not in FORMATS:
+        raise ValidationError({'output': f"Choose one of {', '.join(FORMATS)}."})
+    since, until = parse_bound(params, 'since'), parse_bound(params, 'until')
+    after = params.get('after')
+    if after:
+        try:
+            after = decode_cursor(after)
+        except ValueError:
+            after = None
+        if after is None or after[0] is None:
+            raise ValidationError({'after': 'Invalid cursor.'})
+    lines = render(name, export_rows(name, since, until, after, using=using), format)
+    if isinstance(request._request, ASGIRequest):
+        lines = stream_async(lines)
+    response = StreamingHttpResponse(lines, content_type=FORMATS[format])
+    response['Content-Disposition'] = f'attachment; filename="{name}.{format}"'
+    response['Cache-Control'] = 'no-store'
+    return response
@@ -0,0 +1,257 @@
+import contextvars
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+DUPLICATE_THRESHOLD = 3
+EXPORT_INTERVAL = 30
+# Exports untouched for this long belong to processes that have exited.
+STALE_EXPORT_AGE = 60 * 60 * 24
+
+_request = contextvars.ContextVar('instrumented_request', default=None)
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+def query_shape(sql):
+    """SQL with placeholders only, so queries differing in params compare equal."""
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+class RequestStats:
+    """Numbers gathered while a single request is being handled."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.serializer_depth = 0
+        self.shapes = Counter()
+        self.fields = []
+
+
+class ThreadCounters:
+    """
+    Aggregates owned by one thread. Only that thread writes to them, so the
+    request path never takes a lock; exports read a snapshot.
+    """
+
+    def __init__(self):
+        self.routes = defaultdict(lambda: defaultdict(float))
+        self.fields = defaultdict(lambda: defaultdict(float))
+        self.signatures = Counter()
+
+
+class Registry:
+    def __init__(self):
+        self.local = threading.local()
+        self.all_counters = []
+        self.lock = threading.Lock()
+        self.last_export = time.monotonic()
+
+    def counters(self):
+        counters = getattr(self.local, 'counters', None)
+        if counters is None:
+            counters = self.local.counters = ThreadCounters()
+            with self.lock:  # once per thread, not per request
+                self.all_counters.append(counters)
+        return counters
+
+    def snapshot(self):
+        from transactions import throttling
+        from .notifications import dispatcher
+        routes = defaultdict(lambda: defaultdict(float))
+        fields = defaultdict(lambda: defaultdict(float))
+        signatures = Counter()
+        for counters in list(self.all_counters):
+            for merged, source in ((routes, counters.routes), (fields, counters.fields)):
+                for name, values in list(source.items()):
+                    for key, value in list(values.items()):
+                        merged[name][key] += value
+            signatures.update(dict(counters.signatures))
+        return {
+            'routes': routes,
+            'fields': fields,
+            'signatures': [
+                {'route': route, 'shape': shape, 'count': count}
+                for (route, shape), count in signatures.most_common(50)
+            ],
+            'notifications': dispatcher.metrics(),
+            'websockets': throttling.metrics(),
+        }
+
+    def export(self, force=False):
+        """Write this process's snapshot to the export directory."""
+        now = time.monotonic()
+        if not force and now - self.last_export < EXPORT_INTERVAL:
+            return
+        self.last_export = now
+        directory = export_directory()
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'{os.getpid()}.json'
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self.snapshot()))
+        tmp.replace(path)
+        prune_exports(directory)
+
+
+registry = Registry()
+
+
+def export_directory():
+    return Path(getattr(settings, 'INSTRUMENTATION_EXPORT_DIR', None)
+                or Path(tempfile.gettempdir()) / 'cryptex-instrumentation')
+
+
+def prune_exports(directory=None, max_age=STALE_EXPORT_AGE):
+    """
+    Delete exports (and interrupted ``.tmp`` writes) not updated for
+    ``max_age`` seconds, so restarted workers don't leave their pids behind.
+    """
+    directory = directory or export_directory()
+    cutoff = time.time() - max_age
+    for path in list(directory.glob('*.json')) + list(directory.glob('*.tmp')):
+        try:
+            if path.stat().st_mtime <= cutoff:
+                path.unlink()
+        except FileNotFoundError:
+            pass  # another process pruned it first
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.sql_seconds += time.perf_counter() - started
+        stats.queries += 1
+        stats.shapes[query_shape(sql)] += 1
+        for frame in stats.fields:
+            frame[1] += 1
+
+
+def instrument_serializers():
+    """
+    Wrap DRF so serializer time and per-method-field cost are measured.
+    Nested ``.data`` calls count once, under the outermost serializer.
+    """
+    from rest_framework import fields, serializers
+
+    if getattr(fields.SerializerMethodField, '_instrumented', False):
+        return
+
+    original_method_field = fields.SerializerMethodField.to_representation
+
+    def method_field(self, value):
+        stats = _request.get()
+        if stats is None:
+            return original_method_field(self, value)
+        name = f"{type(self.parent).__name__}.{self.method_name}"
+        frame = [name, 0]
+        stats.fields.append(frame)
+        started = time.perf_counter()
+        try:
+            return original_method_field(self, value)
+        finally:
+            stats.fields.pop()
+            counters = registry.counters().fields[name]
+            counters['calls'] += 1
+            counters['seconds'] += time.perf_counter() - started
+            counters['queries'] += frame[1]
+
+    fields.SerializerMethodField.to_representation = method_field
+    fields.SerializerMethodField._instrumented = True
+
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        original_data = cls.data
+
+        def data(self, _original=original_data):
+            stats = _request.get()
+            if stats is None:
+                return _original.fget(self)
+            stats.serializer_depth += 1
+            started = time.perf_counter()
+            try:
+                return _original.fget(self)
+            finally:
+                stats.serializer_depth -= 1
+                if stats.serializer_depth == 0:
+                    stats.serializer_seconds += time.perf_counter() - started
+
+        cls.data = property(data)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Record per-route query counts, SQL time, serializer time and response
+    size, and flag query shapes repeated ``DUPLICATE_THRESHOLD`` or more
+    times in one request as N+1 signatures. Enabled by
+    ``INSTRUMENTATION_ENABLED``; see ``manage.py instrumentation_report``.
+
+    Each process writes its totals to ``<pid>.json`` in the export directory
+    every ``EXPORT_INTERVAL`` seconds. Files left by exited processes are
+    pruned after ``STALE_EXPORT_AGE``; ``instrumentation_report --reset``
+    clears them all.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        instrument_serializers()
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = _request.set(stats)
+        started = time.perf_counter()
+        try:
+            with _wrap_connections():
+                response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        self.record(request, response, stats, time.perf_counter() - started)
+        registry.export()
+        return response
+
+    def record(self, request, response, stats, elapsed):
+        match = request.resolver_match
+        route = f"{request.method} {match.view_name if match else request.path}"
+        counters = registry.counters()
+        values = counters.routes[route]
+        values['requests'] += 1
+        values['seconds'] += elapsed
+        values['queries'] += stats.queries
+        values['sql_seconds'] += stats.sql_seconds
+        values['serializer_seconds'] += stats.serializer_seconds
+        if not response.streaming:
+            values['response_bytes'] += len(response.content)
+        duplicated = False
+        for shape, count in stats.shapes.items():
+            if count >= DUPLICATE_THRESHOLD:
+                counters.signatures[(route, shape)] += count
+                duplicated = True
+        if duplicated:
+            values['n_plus_one_requests'] += 1
+
+
+class _wrap_connections:
+    """Install ``record_query`` on every configured database for one request."""
+
+    def __enter__(self):
+        self.contexts = [connections[alias].execute_wrapper(record_query) for alias in connections]
+        for context in self.contexts:
+            context.__enter__()
+
+    def __exit__(self, *exc_info):
+        for context in reversed(self.contexts):
+            context.__exit__(*exc_info)
@@ -0,0 +1,44 @@
+import hashlib
+import uuid
+from contextlib import contextmanager
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def advisory_key(name):
+    """A stable signed 64-bit key for ``name``, as PostgreSQL advisory locks take."""
+    return int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), 'big', signed=True)
+
+
+@contextmanager
+def task_lock(name, timeout):
+    """
+    Hold the lock ``name`` for the body, yielding whether it was acquired.
+
+    On PostgreSQL this is a session advisory lock on the primary, so it
+    excludes every worker sharing the database and dies with a crashed
+    worker's connection. Elsewhere (SQLite development) it falls back to a
+    cache entry that expires after ``timeout`` seconds, which only excludes
+    workers sharing that cache; run more than one worker against Postgres.
+    """
+    connection = connections[DEFAULT_DB_ALIAS]
+    if connection.vendor == 'postgresql':
+        key = advisory_key(name)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", [key])
+            acquired = cursor.fetchone()[0]
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", [key])
+        return
+
+    token = uuid.uuid4().hex
+    acquired = cache.add(name, token, timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired and cache.get(name) == token:
+            cache.delete(name)
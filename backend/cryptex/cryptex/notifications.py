@@ -0,0 +1,268 @@
+import asyncio
+import atexit
+import base64
+import heapq
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from datetime import timedelta
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+MAX_BATCH_SIZE = 500
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 0.5
+# Outbox rows older than this were left behind by a process that died
+# before delivering them; ``redeliver_outbox`` sends them again.
+OUTBOX_GRACE = timedelta(seconds=60)
+
+
+class NotificationDispatcher:
+    """
+    Delivers channel-layer group events from a background thread with its
+    own event loop, so sync code (views, Celery tasks) never waits on the
+    channel layer.
+
+    Events queue up in memory and are drained in batches of up to
+    ``MAX_BATCH_SIZE``: identical ``(group, event)`` pairs in a batch are
+    sent once and the rest go out concurrently. A failed send is retried
+    with exponential backoff up to ``MAX_ATTEMPTS`` times before it is
+    dropped and counted as failed. Events that came from the outbox have
+    their rows deleted once sent, or marked failed once dropped, by
+    ``settle`` (``settle_outbox`` unless another callable is given).
+    """
+
+    def __init__(self, max_batch_size=MAX_BATCH_SIZE, settle=None):
+        self.max_batch_size = max_batch_size
+        self.settle = settle
+        self.condition = threading.Condition()
+        self.pending = deque()
+        self.retries = []  # heap of (due, sequence, group, event, attempts)
+        self.sequence = 0
+        self.in_flight = 0
+        self.stats = Counter()
+        self.thread = None
+        self.pid = None
+
+    def enqueue(self, events, outbox_ids=None):
+        """
+        Queue ``(group, event)`` pairs for delivery and return immediately.
+        ``outbox_ids`` are the matching NotificationOutbox rows, if any.
+        """
+        events = list(events)
+        if not events:
+            return
+        outbox_ids = outbox_ids or [None] * len(events)
+        with self.condition:
+            self.pending.extend(
+                (group, event, 0, outbox_id) for (group, event), outbox_id in zip(events, outbox_ids)
+            )
+            self.stats['enqueued'] += len(events)
+            self.condition.notify_all()
+        self.start()
+
+    def start(self):
+        # A thread started before a fork (e.g. Celery prefork) does not
+        # exist in the child, so each process starts its own.
+        if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+            return
+        with self.condition:
+            if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+                return
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self.run, name='notification-dispatcher', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        try:
+            while True:
+                batch = self.next_batch()
+                try:
+                    delivered, dropped = loop.run_until_complete(self.deliver(batch))
+                    if delivered or dropped:
+                        close_old_connections()
+                        (self.settle or settle_outbox)(delivered, dropped)
+                finally:
+                    with self.condition:
+                        self.in_flight = 0
+                        self.condition.notify_all()
+        finally:
+            loop.close()
+
+    def next_batch(self):
+        """Block until events are ready, then take up to ``max_batch_size`` of them."""
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                while self.retries and self.retries[0][0] <= now:
+                    _, _, group, event, attempts, outbox_ids = heapq.heappop(self.retries)
+                    self.pending.extend((group, event, attempts, outbox_id) for outbox_id in outbox_ids)
+                if self.pending:
+                    break
+                timeout = self.retries[0][0] - now if self.retries else None
+                self.condition.wait(timeout)
+            batch = [self.pending.popleft() for _ in range(min(len(self.pending), self.max_batch_size))]
+            self.in_flight = len(batch)
+            return batch
+
+    async def deliver(self, batch):
+        unique = {}
+        for group, event, attempts, outbox_id in batch:
+            key = (group, json.dumps(event, sort_keys=True, default=str))
+            if key in unique:
+                self.stats['coalesced'] += 1
+                unique[key][3].append(outbox_id)
+            else:
+                unique[key] = (group, event, attempts, [outbox_id])
+
+        channel_layer = get_channel_layer()
+        sends = list(unique.values())
+        outcomes = await asyncio.gather(
+            *(channel_layer.group_send(group, event) for group, event, _, _ in sends),
+            return_exceptions=True,
+        )
+        delivered, dropped = [], []
+        with self.condition:
+            for (group, event, attempts, outbox_ids), outcome in zip(sends, outcomes):
+                if not isinstance(outcome, Exception):
+                    self.stats['sent'] += 1
+                    delivered.extend(outbox_ids)
+                elif attempts + 1 >= MAX_ATTEMPTS:
+                    self.stats['failed'] += 1
+                    dropped.extend(outbox_ids)
+                    print(f"Dropping notification to {group} after {MAX_ATTEMPTS} attempts: {outcome}")
+                else:
+                    self.stats['retried'] += 1
+                    self.sequence += 1
+                    due = time.monotonic() + RETRY_DELAY * 2 ** attempts
+                    heapq.heappush(self.retries, (due, self.sequence, group, event, attempts + 1, outbox_ids))
+        return [i for i in delivered if i], [i for i in dropped if i]
+
+    def flush(self, timeout=5.0):
+        """
+        Wait until every queued event has been delivered or dropped.
+        Returns False if that did not happen within ``timeout`` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while self.pending or self.retries or self.in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    def metrics(self):
+        with self.condition:
+            return {
+                'queue_depth': len(self.pending),
+                'retry_depth': len(self.retries),
+                'in_flight': self.in_flight,
+                **{key: self.stats[key] for key in ('enqueued', 'sent', 'coalesced', 'retried', 'failed')},
+            }
+
+
+dispatcher = NotificationDispatcher()
+atexit.register(dispatcher.flush, 2.0)
+
+
+def notify(group, event, using=None):
+    """Send ``event`` to ``group`` once the current database transaction commits."""
+    notify_many([(group, event)], using=using)
+
+
+def notify_many(events, using=None):
+    """
+    Send ``(group, event)`` pairs once the current database transaction
+    commits. They are written to the outbox in that transaction, so they
+    survive this process dying before the dispatcher sends them.
+    """
+    from transactions.models import NotificationOutbox
+
+    events = list(events)
+    if not events:
+        return
+    rows = NotificationOutbox.objects.using(using or DEFAULT_DB_ALIAS).bulk_create([
+        NotificationOutbox(group=group, event=stored_event(event))
+        for group, event in events
+    ])
+    outbox_ids = [row.pk for row in rows]
+    transaction.on_commit(lambda: dispatcher.enqueue(events, outbox_ids), using=using)
+
+
+def stored_event(event):
+    """``event`` as JSON, with binary values (pre-encoded frames) in base64."""
+    binary = [key for key, value in event.items() if isinstance(value, bytes)]
+    stored = {key: base64.b64encode(value).decode() if key in binary else value for key, value in event.items()}
+    return {'event': stored, 'binary': binary}
+
+
+def loaded_event(stored):
+    return {
+        key: base64.b64decode(value) if key in stored['binary'] else value
+        for key, value in stored['event'].items()
+    }
+
+
+def settle_outbox(delivered, dropped):
+    """Delete delivered outbox rows and mark dropped ones failed."""
+    from transactions.models import NotificationOutbox
+
+    if not delivered and not dropped:
+        return
+    try:
+        NotificationOutbox.objects.filter(pk__in=delivered).delete()
+        NotificationOutbox.objects.filter(pk__in=dropped).update(status='failed', attempts=MAX_ATTEMPTS)
+    except DatabaseError as exc:
+        # Left pending, the rows are sent again by the next outbox sweep.
+        print(f"Could not settle {len(delivered) + len(dropped)} outbox rows: {exc}")
+
+
+def redeliver_outbox(grace=OUTBOX_GRACE, batch_size=MAX_BATCH_SIZE):
+    """
+    Send outbox rows older than ``grace`` that are still pending, i.e. ones
+    a process committed but died before delivering, and return how many
+    were sent. Rows are claimed (``attempts`` bumped, ``updated_at`` set) in
+    a short transaction and sent after it commits, so no lock is held during
+    channel-layer I/O; a claimed row is skipped by other sweeps for
+    ``grace``, and one that keeps failing is marked failed after
+    ``MAX_ATTEMPTS``.
+    """
+    from transactions.models import NotificationOutbox
+
+    cutoff = timezone.now() - grace
+    with transaction.atomic():
+        rows = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', created_at__lt=cutoff, updated_at__lt=cutoff)
+            .order_by('created_at')[:batch_size]
+        )
+        if not rows:
+            return 0
+        NotificationOutbox.objects.filter(pk__in=[row.pk for row in rows]).update(
+            attempts=F('attempts') + 1, updated_at=timezone.now(),
+        )
+
+    channel_layer = get_channel_layer()
+
+    async def send_all():
+        return await asyncio.gather(*(
+            channel_layer.group_send(row.group, loaded_event(row.event))
+            for row in rows
+        ), return_exceptions=True)
+
+    outcomes = async_to_sync(send_all)()
+    sent = [row.pk for row, outcome in zip(rows, outcomes) if not isinstance(outcome, Exception)]
+    exhausted = [
+        row.pk for row, outcome in zip(rows, outcomes)
+        if isinstance(outcome, Exception) and row.attempts + 1 >= MAX_ATTEMPTS
+    ]
+    NotificationOutbox.objects.filter(pk__in=sent).delete()
+    NotificationOutbox.objects.filter(pk__in=exhausted).update(status='failed')
+    return len(sent)
@@ -0,0 +1,184 @@
+import base64
+import uuid
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+from datetime import datetime, time
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(value, pk):
+    """Opaque cursor for the ``(value, id)`` position of a row."""
+    value = '' if value is None else value.isoformat() if hasattr(value, 'isoformat') else str(value)
+    raw = f"{value}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(encoded, parse=parse_datetime):
+    """
+    Inverse of ``encode_cursor``; ``parse`` turns the stored value back into
+    a Python value. Raises ValueError for malformed cursors.
+    """
+    value, pk = base64.urlsafe_b64decode(encoded.encode()).decode().split('|')
+    if value:
+        value = parse(value)
+        if value is None:
+            raise ValueError(encoded)
+    else:
+        value = None
+    return value, uuid.UUID(pk)
+
+
+def parse_decimal(value):
+    """A finite Decimal from ``value``; ValueError otherwise (NaN and Infinity included)."""
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(value)
+    if not number.is_finite():
+        raise ValueError(value)
+    return number
+
+
+def parse_bound(params, name):
+    """
+    The ``name`` query parameter as an aware datetime (an ISO date means
+    its midnight), or None when absent. Raises ValidationError otherwise.
+    """
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            parsed = datetime.combine(day, time.min) if day else None
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: 'An ISO date or datetime is required.'})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Forward-only keyset pagination over ``(position_field, id)``, highest
+    first, with nulls last when ``position_nullable`` is set.
+
+    The cursor encodes the last row of the previous page, so every page is a
+    bounded index range scan no matter how deep the client has paged.
+    """
+    position_field = 'created_at'
+    position_nullable = False
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    # Most rows ``keep`` may examine for one page before handing the client
+    # a cursor to continue from, as a multiple of the page size.
+    max_scan_pages = 10
+
+    def paginate_queryset(self, queryset, request, view=None, keep=None):
+        """
+        The next page of ``queryset``. ``keep``, if given, takes a batch of
+        rows and returns those to show: filters the database cannot answer
+        (e.g. live presence) then run over bounded batches in keyset order.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        field = self.position_field
+        if self.position_nullable:
+            queryset = queryset.order_by(F(field).desc(nulls_last=True), '-id')
+        else:
+            queryset = queryset.order_by(f'-{field}', '-id')
+        if keep is None:
+            if position is not None:
+                queryset = queryset.filter(self.after(*position))
+            rows = list(queryset[:self.page_size + 1])
+            self.has_next = len(rows) > self.page_size
+            self.page = rows[:self.page_size]
+            self.resume = self.page[-1] if self.page else None
+            return self.page
+
+        rows, scanned, exhausted = [], 0, False
+        while len(rows) <= self.page_size and scanned < self.page_size * self.max_scan_pages:
+            batch_queryset = queryset.filter(self.after(*position)) if position is not None else queryset
+            batch = list(batch_queryset[:self.page_size + 1])
+            scanned += len(batch)
+            rows.extend(keep(batch))
+            if len(batch) <= self.page_size:
+                exhausted = True
+                break
+            position = (getattr(batch[-1], field), batch[-1].pk)
+        self.page = rows[:self.page_size]
+        self.has_next = len(rows) > self.page_size or not exhausted
+        # Continue after the last row shown, or after everything scanned if
+        # the page came up short.
+        self.resume = self.page[-1] if len(rows) > self.page_size else batch[-1] if batch else None
+        return self.page
+
+    def after(self, value, pk):
+        """Rows that sort strictly after the ``(value, pk)`` position."""
+        field = self.position_field
+        if value is None:
+            return Q(**{f'{field}__isnull': True, 'id__lt': pk})
+        condition = Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk})
+        if self.position_nullable:
+            condition |= Q(**{f'{field}__isnull': True})
+        return condition
+
+    def parse_position(self, value):
+        return parse_datetime(value)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk = decode_cursor(encoded, self.parse_position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if value is None and not self.position_nullable:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def get_next_link(self):
+        if not self.has_next or self.resume is None:
+            return None
+        last = self.resume
+        cursor = encode_cursor(getattr(last, self.position_field), last.pk)
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
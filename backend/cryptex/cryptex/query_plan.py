@@ -0,0 +1,173 @@
+import copy
+from django.db.models import Prefetch
+from django.utils.functional import classproperty
+from rest_framework.serializers import ListSerializer
+
+_UNSET = object()
+
+
+class QueryPlan:
+    """
+    The select_related/prefetch_related graph a serializer tree renders.
+
+    Serializers declare a plan for their own relations and compose the plans
+    of the serializers they nest with ``nest()``, so a viewset can load the
+    whole tree up front instead of one query per row per relation.
+    """
+
+    def __init__(self, select_related=(), prefetch_related=()):
+        self.select_related = tuple(select_related)
+        self.prefetch_related = tuple(prefetch_related)
+
+    def __add__(self, other):
+        seen = {lookup_path(lookup) for lookup in self.prefetch_related}
+        return QueryPlan(
+            self.select_related + tuple(l for l in other.select_related if l not in self.select_related),
+            self.prefetch_related + tuple(
+                l for l in other.prefetch_related if lookup_path(l) not in seen
+            ),
+        )
+
+    def nest(self, prefix):
+        """Re-root every lookup under the relation ``prefix``."""
+        prefetches = []
+        for lookup in self.prefetch_related:
+            if isinstance(lookup, Prefetch):
+                lookup = copy.copy(lookup)
+                lookup.add_prefix(prefix)
+            else:
+                lookup = f"{prefix}__{lookup}"
+            prefetches.append(lookup)
+        return QueryPlan([f"{prefix}__{lookup}" for lookup in self.select_related], prefetches)
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        return queryset
+
+
+def lookup_path(lookup):
+    return lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+
+
+def related(relation, serializer_class=None):
+    """
+    Field plan for a field rendering the forward relation ``relation``:
+    select it, plus whatever ``serializer_class`` renders of it for the
+    requested sub-fieldset.
+    """
+    def plan(fieldset=None):
+        own = QueryPlan(select_related=[relation])
+        if serializer_class is None:
+            return own
+        return own + serializer_class.plan_for(fieldset).nest(relation)
+    return plan
+
+
+def parse_fieldset(value):
+    """
+    ``"id,seller.username,seller.email"`` as ``{'id': {}, 'seller':
+    {'username': {}, 'email': {}}}``; None when ``value`` is empty.
+    """
+    if not value:
+        return None
+    fieldset = {}
+    for path in value.split(','):
+        node = fieldset
+        for name in filter(None, (part.strip() for part in path.split('.'))):
+            node = node.setdefault(name, {})
+    return fieldset or None
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin rendering only a requested subset of its fields.
+
+    The subset is a nested dict from ``parse_fieldset``: passed as
+    ``fields=``, handed down by a sparse parent, or for the top-level
+    serializer taken from ``context['fieldset']``. An empty subset means
+    every field. Write-only fields are always kept so input still
+    validates. ``field_plans`` maps fields to the QueryPlan (or a
+    ``related()`` plan) they need, so unrequested relations are not loaded.
+    """
+    field_plans = {}
+
+    def __init__(self, *args, fields=_UNSET, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._fieldset = fields
+
+    @classmethod
+    def plan_for(cls, fieldset=None):
+        """The query plan for rendering ``fieldset`` (every field when None)."""
+        plan = QueryPlan()
+        for name, field_plan in cls.field_plans.items():
+            if fieldset and name not in fieldset:
+                continue
+            plan += field_plan((fieldset or {}).get(name) or None) if callable(field_plan) else field_plan
+        return plan
+
+    @classproperty
+    def query_plan(cls):
+        return cls.plan_for()
+
+    @property
+    def fieldset(self):
+        if self._fieldset is not _UNSET:
+            return self._fieldset
+        parent = self.parent.parent if isinstance(self.parent, ListSerializer) else self.parent
+        return self.context.get('fieldset') if parent is None else None
+
+    def nested_fieldset(self, name):
+        """The sub-fieldset to pass as ``fields=`` when rendering ``name`` by hand."""
+        return (self.fieldset or {}).get(name) or None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.fieldset
+        if not fieldset:
+            return fields
+        for name, field in list(fields.items()):
+            if name not in fieldset and not field.write_only:
+                del fields[name]
+                continue
+            nested = field.child if isinstance(field, ListSerializer) else field
+            if isinstance(nested, SparseFieldsetMixin):
+                nested._fieldset = fieldset[name] or None
+        return fields
+
+
+class QueryPlanMixin:
+    """
+    Viewset mixin that applies the query plan of its serializer class.
+    Override ``get_query_plan`` to add relations that depend on the request.
+
+    ``?fields=a,b.c`` renders only those fields (and loads only their
+    relations); ``?expand=name`` opts into the heavier nested fields a view
+    offers, such as a user's ``transactions``.
+    """
+
+    def get_query_plan(self):
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, SparseFieldsetMixin):
+            return serializer_class.plan_for(self.get_fieldset())
+        return getattr(serializer_class, 'query_plan', QueryPlan())
+
+    def get_fieldset(self):
+        fieldset = parse_fieldset(self.request.query_params.get('fields'))
+        if fieldset is not None:
+            for name in self.expansions():
+                fieldset.setdefault(name, {})
+        return fieldset
+
+    def expansions(self):
+        return {name.strip() for name in self.request.query_params.get('expand', '').split(',') if name.strip()}
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fieldset'] = self.get_fieldset()
+        return context
+
+    def get_queryset(self):
+        return self.get_query_plan().apply(super().get_queryset())
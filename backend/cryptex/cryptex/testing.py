@@ -0,0 +1,117 @@
+from contextlib import ExitStack
+from decimal import Decimal
+from unittest import mock
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from assets.models import Asset
+from users.models import User
+from vendors.models import Vendor
+
+
+class TradeFixturesMixin:
+    """Shared seller, vendor and asset rows for tests that need trades."""
+    databases = '__all__'  # list endpoints read from the simulated replica
+
+    @classmethod
+    def setUpTestData(cls):
+        from assets.cache import asset_cache
+        asset_cache.invalidate()
+        cls.seller = User.objects.create_user(username='seller', email='seller@example.com')
+        cls.asset = Asset.objects.create(name='Tether', symbol='USDT')
+        cls.vendor = cls.make_vendor('vendor')
+
+    @classmethod
+    def make_vendor(cls, username, **kwargs):
+        user = User.objects.create_user(username=username, email=f'{username}@example.com', is_vendor=True)
+        vendor = Vendor.objects.create(
+            user=user, display_name=username.title(), contact_email=user.email, **kwargs
+        )
+        vendor.supported_assets.add(cls.asset)
+        return vendor
+
+    def make_trade(self, age=None, vendor=None, seller=None, **kwargs):
+        from transactions.models import Transaction
+        kwargs.setdefault('quantity', Decimal('1'))
+        kwargs.setdefault('amount', Decimal('1'))
+        trade = Transaction.objects.create(
+            seller=seller or self.seller, vendor=vendor or self.vendor, asset=self.asset, **kwargs
+        )
+        if age:
+            Transaction.objects.filter(id=trade.id).update(created_at=timezone.now() - age)
+        return trade
+
+    def grow_trades(self, count=5, messages=False):
+        """
+        Add ``count`` trades, each with a vendor of its own (and a chat
+        message when ``messages``), as the ``grow`` of ``assertFlatQueryCount``.
+        """
+        from chat_messages.models import ChatMessage
+        for index in range(count):
+            vendor = self.make_vendor(f'extra-vendor-{index}')
+            trade = self.make_trade(vendor=vendor)
+            if messages:
+                ChatMessage.objects.create(sender=self.seller, recipient=vendor.user, transaction=trade, content='hi')
+
+    def socket(self, path, user=None, subprotocols=None):
+        """A communicator for ``path`` through the websocket auth stack, signed in as ``user``."""
+        from channels.routing import URLRouter
+        from channels.testing import WebsocketCommunicator
+        from rest_framework_simplejwt.tokens import AccessToken
+        from transactions.routing import websocket_urlpatterns
+        from users.middleware import JWTAuthMiddleware
+        user = user or self.seller
+        separator = "&" if "?" in path else "?"
+        return WebsocketCommunicator(
+            JWTAuthMiddleware(URLRouter(websocket_urlpatterns)),
+            f"{path}{separator}token={AccessToken.for_user(user)}",
+            subprotocols=subprotocols,
+        )
+
+
+class SettleOutboxMixin:
+    """
+    For ``TestCase`` classes whose code notifies after commit. The
+    dispatcher thread cannot write while the test's transaction holds
+    SQLite's lock, so the outbox rows it finishes with are collected and
+    settled on the test thread by ``settle_outbox`` (and after each test).
+    """
+
+    def setUp(self):
+        super().setUp()
+        from cryptex.notifications import dispatcher
+        self.unsettled = []
+        patcher = mock.patch.object(dispatcher, 'settle', lambda *ids: self.unsettled.append(ids))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.settle_outbox)
+
+    def settle_outbox(self):
+        """Wait for the dispatcher, then settle what it delivered or dropped."""
+        from cryptex.notifications import dispatcher, settle_outbox
+        self.assertTrue(dispatcher.flush())
+        while self.unsettled:
+            settle_outbox(*self.unsettled.pop(0))
+
+
+class QueryBudgetMixin:
+    """Assertions that an endpoint's query count does not grow with its rows."""
+
+    def count_queries(self, url):
+        """Queries ``url`` issues across every database alias, replicas included."""
+        captures = [CaptureQueriesContext(connections[alias]) for alias in connections]
+        with ExitStack() as stack:
+            for capture in captures:
+                stack.enter_context(capture)
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return sum(len(capture) for capture in captures)
+
+    def assertFlatQueryCount(self, url, grow, budget):
+        """``grow`` adds rows between two requests to ``url``; both must cost the same."""
+        self.count_queries(url)  # warm process caches such as the asset catalogue
+        before = self.count_queries(url)
+        grow()
+        after = self.count_queries(url)
+        self.assertEqual(before, after, f"{url} issues more queries as rows grow")
+        self.assertLessEqual(after, budget, f"{url} exceeds its query budget")
@@ -0,0 +1,128 @@
+import os
+import tempfile
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import connections
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from transactions.framing import frame_event
+from .benchmarking import IN_MEMORY_CHANNEL_LAYERS
+from .channel_layers import HashRing, ShardedChannelLayer, SharedInMemoryChannelLayer, sharded_in_memory_layers
+from .instrumentation import STALE_EXPORT_AGE, prune_exports, query_shape, registry
+from .testing import SettleOutboxMixin, TradeFixturesMixin
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, INSTRUMENTATION_ENABLED=True)
+class InstrumentationTests(TradeFixturesMixin, TestCase):
+    def test_routes_and_serializer_fields_are_recorded(self):
+        self.make_trade()
+
+        Client().get('/api/vendors/?include_transactions=true')
+
+        snapshot = registry.snapshot()
+        route = snapshot['routes']['GET vendor-list']
+        self.assertGreaterEqual(route['requests'], 1)
+        self.assertGreater(route['queries'], 0)
+        self.assertGreater(route['response_bytes'], 0)
+        self.assertGreaterEqual(snapshot['fields']['VendorSerializer.get_transactions']['calls'], 1)
+
+    def test_query_shapes_ignore_in_list_length(self):
+        self.assertEqual(
+            query_shape('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            query_shape('SELECT * FROM t WHERE id IN (%s)'),
+        )
+
+    def test_exports_of_exited_processes_are_pruned(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(INSTRUMENTATION_EXPORT_DIR=directory):
+            stale = Path(directory) / '1.json'
+            stale.write_text('{}')
+            old = time.time() - STALE_EXPORT_AGE - 1
+            os.utime(stale, (old, old))
+
+            registry.export(force=True)
+
+            self.assertEqual([path.name for path in Path(directory).iterdir()], [f'{os.getpid()}.json'])
+            prune_exports(max_age=0)
+            self.assertEqual(list(Path(directory).iterdir()), [])
+
+
+class ShardedChannelLayerTests(TradeFixturesMixin, TransactionTestCase):
+    def setUp(self):
+        self.setUpTestData()
+
+    def test_adding_a_shard_moves_few_groups(self):
+        groups = [f'trade_{index}' for index in range(2_000)]
+        before = HashRing(['0', '1', '2'])
+        after = HashRing(['0', '1', '2', '3'])
+
+        moved = sum(before.node(group) != after.node(group) for group in groups)
+
+        self.assertLess(moved / len(groups), 0.4)
+        self.assertEqual(len({before.node(group) for group in groups}), 3)
+
+    def test_groups_fan_out_across_instances_sharing_the_shards(self):
+        layers = sharded_in_memory_layers(shards=3)
+        trades = [self.make_trade() for _ in range(12)]
+
+        async def scenario():
+            communicators = []
+            for trade in trades:
+                communicator = self.socket(f'/ws/trade/{trade.id}/')
+                self.assertTrue((await communicator.connect())[0])
+                communicators.append(communicator)
+            # A second app instance: its own layer object, the same shard hosts.
+            other_instance = ShardedChannelLayer(**layers['default']['CONFIG'])
+            for trade in trades:
+                await other_instance.group_send(f'trade_{trade.id}', frame_event({'trade': str(trade.id)}))
+            received = [await communicator.receive_json_from() for communicator in communicators]
+            owners = {get_channel_layer().shard_index(f'trade_{trade.id}') for trade in trades}
+            for communicator in communicators:
+                await communicator.disconnect()
+            return received, owners
+
+        SharedInMemoryChannelLayer.hosts.clear()
+        with override_settings(CHANNEL_LAYERS=layers):
+            received, owners = async_to_sync(scenario)()
+
+        self.assertEqual([frame['trade'] for frame in received], [str(trade.id) for trade in trades])
+        self.assertGreater(len(owners), 1)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class ReplicaRoutingTests(TradeFixturesMixin, SettleOutboxMixin, TestCase):
+    def queries_by_alias(self, method, url, **kwargs):
+        captures = {alias: CaptureQueriesContext(connections[alias]) for alias in connections}
+        with ExitStack() as stack:
+            for capture in captures.values():
+                stack.enter_context(capture)
+            response = getattr(self.client, method)(url, **kwargs)
+        return response, {alias: len(capture) for alias, capture in captures.items()}
+
+    def test_lists_read_from_the_replica(self):
+        self.make_trade()
+        response, queries = self.queries_by_alias('get', '/api/transactions/')
+
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertGreater(queries['replica'], 0)
+        self.assertEqual(queries['default'], 0)
+
+    def test_detail_reads_and_writes_use_the_primary(self):
+        trade = self.make_trade()
+        _, queries = self.queries_by_alias('get', f'/api/transactions/{trade.id}/')
+        self.assertEqual(queries['replica'], 0)
+
+    def test_writers_read_their_writes_from_the_primary(self):
+        trade = self.make_trade()
+        with self.captureOnCommitCallbacks(execute=True):
+            response, _ = self.queries_by_alias(
+                'post', '/api/transactions/transition/', content_type='application/json',
+                data=[{'id': str(trade.id), 'expected_status': 'pending', 'new_status': 'completed'}],
+            )
+        self.assertIn('db_primary_pin', response.cookies)
+
+        _, queries = self.queries_by_alias('get', '/api/transactions/')
+        self.assertEqual(queries['replica'], 0)
+        self.assertGreater(queries['default'], 0)
@@ -7,6 +7,10 @@ import sys
 def main():
     """Run administrative tasks."""
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cryptex.settings')
+    if sys.argv[1:2] == ['test']:
+        # Simulate a read replica so the database routing is tested; other
+        # runners set this themselves.
+        os.environ.setdefault('DATABASE_TEST_REPLICA', 'true')
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -0,0 +1,120 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncWeek
+from django.utils import timezone
+from .models import AnalyticsWatermark, Transaction, TradeVolumeBucket
+
+WATERMARK_NAME = 'trade_volume_buckets'
+# Re-read changes this far behind the watermark, so trades whose writing
+# transaction committed after the previous refresh started are not missed.
+REFRESH_OVERLAP = timedelta(minutes=2)
+
+INTERVALS = {
+    # interval: (stored granularity read, default span, longest span)
+    'hour': ('hour', timedelta(days=2), timedelta(days=31)),
+    'day': ('day', timedelta(days=90), timedelta(days=3 * 366)),
+    'week': ('day', timedelta(days=366), timedelta(days=3 * 366)),
+}
+
+
+def refresh_trade_buckets(full=False):
+    """
+    Bring TradeVolumeBucket up to date with trades changed since the last
+    refresh (or rebuild it, with ``full``) and return how many bucket rows
+    were written.
+
+    Buckets are keyed by trade creation time, so a status change to an old
+    trade lands in an old bucket: every day holding a changed trade is
+    recomputed whole from the transactions table and its rows replaced,
+    which also makes overlapping or repeated refreshes harmless.
+    """
+    started = timezone.now()
+    watermark, _ = AnalyticsWatermark.objects.get_or_create(name=WATERMARK_NAME)
+    changed = Transaction.objects.filter(updated_at__lte=started)
+    if watermark.position is not None and not full:
+        changed = changed.filter(updated_at__gt=watermark.position - REFRESH_OVERLAP)
+        days = sorted(set(
+            changed.annotate(day=TruncDay('created_at')).order_by().values_list('day', flat=True).distinct()
+        ))
+        trades = Transaction.objects.filter(reduce(or_, (
+            Q(created_at__gte=day, created_at__lt=day + timedelta(days=1)) for day in days
+        ))) if days else None
+        stale = TradeVolumeBucket.objects.filter(reduce(or_, (
+            Q(bucket_start__gte=day, bucket_start__lt=day + timedelta(days=1)) for day in days
+        ))) if days else None
+    else:
+        trades, stale = Transaction.objects.all(), TradeVolumeBucket.objects.all()
+
+    rows = []
+    with transaction.atomic():
+        if trades is not None:
+            rows = bucket_rows(trades)
+            stale.delete()
+            TradeVolumeBucket.objects.bulk_create(rows, batch_size=1_000)
+        watermark.position = started
+        watermark.save(update_fields=['position', 'updated_at'])
+    return len(rows)
+
+
+def bucket_rows(trades):
+    """Hourly rows for ``trades`` grouped by asset and status, plus their daily sums."""
+    hourly = trades.annotate(bucket=TruncHour('created_at')).values('bucket', 'asset_id', 'status').order_by().annotate(
+        trades=Count('id'),
+        quantity=Sum('quantity'),
+        amount=Sum('amount'),
+        naira_paid=Sum('value_paid_in_naira'),
+    )
+    daily = defaultdict(lambda: {'trades': 0, 'quantity': Decimal(0), 'amount': Decimal(0), 'naira_paid': Decimal(0)})
+    rows = []
+    for row in hourly:
+        totals = {
+            'trades': row['trades'],
+            'quantity': row['quantity'] or Decimal(0),
+            'amount': row['amount'] or Decimal(0),
+            'naira_paid': row['naira_paid'] or Decimal(0),
+        }
+        rows.append(bucket('hour', row['bucket'], row['asset_id'], row['status'], totals))
+        day = daily[(row['bucket'].replace(hour=0), row['asset_id'], row['status'])]
+        for key, value in totals.items():
+            day[key] += value
+    rows.extend(
+        bucket('day', start, asset_id, status, totals)
+        for (start, asset_id, status), totals in daily.items()
+    )
+    return rows
+
+
+def bucket(granularity, start, asset_id, status, totals):
+    return TradeVolumeBucket(
+        granularity=granularity, bucket_start=start, asset_id=asset_id, status=status,
+        trade_count=totals['trades'], quantity=totals['quantity'],
+        amount=totals['amount'], naira_paid=totals['naira_paid'],
+    )
+
+
+def volume_series(interval, start, end, asset_id=None, status=None):
+    """
+    Trade count and volume per ``interval`` bucket, asset and status for
+    trades created in ``[start, end)``, read from the precomputed buckets.
+    """
+    granularity, _, _ = INTERVALS[interval]
+    buckets = TradeVolumeBucket.objects.filter(
+        granularity=granularity, bucket_start__gte=start, bucket_start__lt=end
+    )
+    if asset_id:
+        buckets = buckets.filter(asset_id=asset_id)
+    if status:
+        buckets = buckets.filter(status=status)
+    # Stored buckets already start on the hour or day; weeks roll up days.
+    buckets = buckets.annotate(bucket=TruncWeek('bucket_start') if interval == 'week' else F('bucket_start'))
+    return buckets.values('bucket', 'asset_id', 'status').order_by('bucket', 'asset_id', 'status').annotate(
+        trades=Sum('trade_count'),
+        total_quantity=Sum('quantity'),
+        total_amount=Sum('amount'),
+        total_naira_paid=Sum('naira_paid'),
+    )
@@ -1,74 +1,279 @@
+import asyncio
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
-import json
+from django.conf import settings
+from chat_messages.buffer import get_chat_buffer
+from chat_messages.models import ChatMessage
+from cryptex.channel_layers import placed_with
+from vendors.presence import get_presence_tracker
+from .feed import replay
+from .framing import decode, encode_binary, encode_text, frame_binary, frame_event, frame_text, negotiate
+from .membership import trade_participants, vendor_owner
+from .throttling import OutboundQueue, TokenBucket, counters, group_buckets
+
+def room_group_name(route_kwargs):
+    """The channel-layer group a trade or vendor socket joins, or None."""
+    if "trade_id" in route_kwargs:
+        return f"trade_{route_kwargs['trade_id']}"
+    if "vendor_id" in route_kwargs:
+        return f"vendor_{route_kwargs['vendor_id']}"
+    return None
+
 
 class TradeConsumer(AsyncWebsocketConsumer):
+    async def __call__(self, scope, receive, send):
+        # Create this connection's channel on the shard that owns its room.
+        group = room_group_name(scope.get("url_route", {}).get("kwargs", {}))
+        with placed_with(group):
+            await super().__call__(scope, receive, send)
+
     async def connect(self):
+        """
+        Admit the trade's seller and vendor to a trade room, and a vendor to
+        their own room. New trades are announced to the vendor's room by the
+        server, so nobody else needs it. Membership comes from cached
+        lookups, so reconnects skip the database.
+        """
         route_kwargs = self.scope["url_route"]["kwargs"]
+        user = self.scope.get("user")
+        self.participants = None
+        self.listening = False
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+        self.user_id = str(user.pk)
         if "trade_id" in route_kwargs:
             self.trade_id = route_kwargs["trade_id"]
-            self.room_group_name = f"trade_{self.trade_id}"
+            self.participants = await database_sync_to_async(trade_participants)(self.trade_id)
+            if self.participants is None or self.user_id not in self.participants:
+                await self.close()
+                return
+            self.listening = True
         elif "vendor_id" in route_kwargs:
             self.vendor_id = route_kwargs["vendor_id"]
-            self.room_group_name = f"vendor_{self.vendor_id}"
+            owner = await database_sync_to_async(vendor_owner)(self.vendor_id)
+            if owner != self.user_id:
+                await self.close()
+                return
+            self.listening = True
         else:
             await self.close()
             return
-        await self.channel_layer.group_add(self.room_group_name, self.channel_name)
-        await self.accept()
+        self.room_group_name = room_group_name(route_kwargs)
+        subprotocol, self.binary = negotiate(self.scope.get("subprotocols", []))
+        if self.listening:
+            await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+        self.start_flow_control()
+        await self.accept(subprotocol=subprotocol)
+        if hasattr(self, "vendor_id"):
+            get_presence_tracker().connected(self.vendor_id)
+            await self.replay_feed()
+
+    async def replay_feed(self):
+        """
+        Send a vendor who reconnects with ``?after=<seq>&epoch=<id>`` the
+        trade events they missed. Frames carry their ``seq``, so one that
+        also arrives live is dropped by the client. If the buffer no longer
+        holds every missed event, or numbering restarted, the client is told
+        to resync.
+        """
+        params = parse_qs(self.scope.get("query_string", b"").decode())
+        try:
+            after = int(params["after"][0])
+        except (KeyError, ValueError):
+            return
+        epoch = params.get("epoch", [None])[0]
+        events, resync = await database_sync_to_async(replay)(self.vendor_id, after, epoch)
+        for payload in events:
+            await self.send_payload(payload)
+        if resync is not None:
+            await self.send_payload(resync)
+
+    def start_flow_control(self):
+        """
+        Token buckets for frames this client sends (its own, and one shared
+        by the room), plus the bounded queue its outbound frames go through.
+        """
+        limits = settings.WEBSOCKET_THROTTLE
+        self.bucket = TokenBucket(*limits["connection"])
+        self.group_bucket = group_buckets.acquire(self.room_group_name, *limits["group"])
+        self.throttled = False
+        self.outbound = OutboundQueue(settings.WEBSOCKET_OUTBOUND_QUEUE)
+        self.writer = asyncio.ensure_future(self.write_outbound())
 
     async def disconnect(self, close_code):
+        writer = getattr(self, "writer", None)
+        if writer is not None:
+            writer.cancel()
+            group_buckets.release(self.room_group_name)
+        if not getattr(self, "listening", False):
+            return
         await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        if hasattr(self, "vendor_id"):
+            get_presence_tracker().disconnected(self.vendor_id)
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
+        if getattr(self, "outbound", None) is None:
+            return  # rejected in connect; the close is already on its way
+        counters["frames_in"] += 1
         try:
-            data = json.loads(text_data)
-        except Exception:
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    "type": "trade_message",
-                    "message": text_data,
-                }
-            )
+            data = decode(text_data, bytes_data)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            # Only well-formed frames are worth channel-layer capacity.
+            counters["invalid"] += 1
+            return
+        if not await self.admit(data):
             return
 
-        if data.get("type") == "chat_message":
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    "type": "chat_message",
-                    "message": data,
-                }
-            )
+        if data.get("type") == "chat_message" and "id" not in data and hasattr(self, "trade_id"):
+            data = await self.persist_chat_message(data)
+            if data is None:
+                return
+            await self.channel_layer.group_send(self.room_group_name, frame_event(data))
+        elif data.get("type") == "chat_message" and str(data.get("sender")) != self.user_id:
+            # Messages saved through the API are relayed as sent, but only by their sender.
+            await self.send_chat_error(data, "Invalid chat message.")
         else:
+            # Relay the frame as received; subscribers on the other wire format convert it.
             await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    "type": "trade_message",
-                    "message": json.dumps(data),
-                }
+                self.room_group_name, frame_event(data, text=text_data, binary=bytes_data)
             )
-            
+
+    async def persist_chat_message(self, data):
+        """
+        Save a chat frame that arrived without a server id through the
+        write-behind buffer, acknowledge it to the sender and return the
+        frame to broadcast. The recipient is the other trade participant.
+        """
+        participants = self.participants
+        sender = str(data.get("sender", self.user_id))
+        content = data.get("content")
+        if sender != self.user_id or not content:
+            await self.send_chat_error(data, "Invalid chat message.")
+            return None
+
+        recipient = participants[1] if sender == participants[0] else participants[0]
+        try:
+            message = await get_chat_buffer().write(ChatMessage(
+                sender_id=sender, recipient_id=recipient, transaction_id=self.trade_id, content=content
+            ))
+        except Exception:
+            await self.send_chat_error(data, "Message could not be saved.")
+            return None
+        await self.send_payload({
+            "type": "chat_message_ack",
+            "client_id": data.get("client_id"),
+            "id": str(message.id),
+            "timestamp": message.created_at.isoformat(),
+        })
+        return {
+            "type": "chat_message",
+            "id": str(message.id),
+            "content": message.content,
+            "sender": sender,
+            "recipient": recipient,
+            "timestamp": message.created_at.isoformat(),
+        }
+
+    async def admit(self, data):
+        """
+        Take a token from this connection's bucket and the room's. A
+        rejected chat frame gets an error for its ``client_id``; other
+        frames get one ``rate_limited`` notice per burst of rejections.
+        """
+        if not self.bucket.take():
+            counters["throttled_connection"] += 1
+            bucket = self.bucket
+        elif not self.group_bucket.take():
+            counters["throttled_group"] += 1
+            bucket = self.group_bucket
+        else:
+            self.throttled = False
+            return True
+        if data.get("type") == "chat_message":
+            await self.send_chat_error(data, "Too many messages, slow down.")
+        elif not self.throttled:
+            await self.send_payload({"type": "rate_limited", "retry_after": round(bucket.retry_after(), 2)})
+        self.throttled = True
+        return False
+
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        """Queue a frame for the writer task instead of writing it inline."""
+        outbound = getattr(self, "outbound", None)
+        if outbound is None or close:
+            await super().send(text_data=text_data, bytes_data=bytes_data, close=close)
+        elif bytes_data is not None:
+            outbound.put(("bytes", bytes_data))
+        else:
+            outbound.put(("text", text_data))
+
+    async def write_outbound(self):
+        """
+        Write queued frames to the client in order. After frames were dropped
+        for a slow client, tell it to resync (e.g. chat through the sync
+        endpoint) once it has caught up.
+        """
+        while True:
+            kind, frame = await self.outbound.get()
+            await super().send(**{f"{kind}_data": frame})
+            counters["frames_out"] += 1
+            if self.outbound.lagged and not self.outbound.frames:
+                self.outbound.lagged = False
+                payload = {"type": "resync"}
+                if self.binary:
+                    await super().send(bytes_data=encode_binary(payload))
+                else:
+                    await super().send(text_data=encode_text(payload))
+
+    async def send_chat_error(self, data, message):
+        await self.send_payload({
+            "type": "chat_message_error",
+            "client_id": data.get("client_id"),
+            "message": message,
+        })
+
+    async def send_payload(self, payload):
+        """Send a frame meant for this connection only, in its negotiated format."""
+        if self.binary:
+            await self.send(bytes_data=encode_binary(payload))
+        else:
+            await self.send(text_data=encode_text(payload))
+
+    async def broadcast_frame(self, event):
+        if self.binary:
+            await self.send(bytes_data=frame_binary(event))
+        else:
+            await self.send(text_data=frame_text(event))
+
+    # Events in the older per-type shapes, encoded by each subscriber.
+
     async def chat_message(self, event):
-        await self.send(text_data=json.dumps(event["message"]))
+        await self.send_payload(event["message"])
 
     async def trade_message(self, event):
         await self.send(text_data=event["message"])
-        
+
     async def transaction_cancelled(self, event):
-        await self.send(
-            text_data=json.dumps({
-                "type": "transaction_cancelled",
-                "cancelled_by": event.get("cancelled_by", "system"),
-                "trade_id": event["trade_id"],
-                "message": event["message"],
-            })
-        )
+        await self.send_payload({
+            "type": "transaction_cancelled",
+            "cancelled_by": event.get("cancelled_by", "system"),
+            "trade_id": event["trade_id"],
+            "message": event["message"],
+        })
+
+    async def transaction_completed(self, event):
+        await self.send_payload({
+            "type": "transaction_completed",
+            "completed_by": event.get("completed_by", "system"),
+            "trade_id": event["trade_id"],
+            "message": event["message"],
+        })
 
     async def trade_created(self, event):
-        await self.send(
-            text_data=json.dumps({
-                "type": "trade_started",
-                "trade": event["trade"],
-            })
-        )
\ No newline at end of file
+        await self.send_payload({
+            "type": "trade_started",
+            "trade": event["trade"],
+        })
@@ -0,0 +1,112 @@
+import uuid
+from django.core.cache import cache
+from django.db import transaction
+from assets.cache import asset_cache
+from cryptex.notifications import notify
+from .framing import frame_event
+
+# How many of a vendor's latest events a resuming client can read back,
+# and how long each is kept.
+REPLAY_SIZE = 100
+REPLAY_TIMEOUT = 60 * 60 * 24
+
+
+def sequence_key(vendor_id, epoch):
+    return f"transactions:vendor-feed:{vendor_id}:{epoch}:seq"
+
+
+def epoch_key(vendor_id):
+    return f"transactions:vendor-feed:{vendor_id}:epoch"
+
+
+def successor_key(vendor_id, epoch):
+    return f"transactions:vendor-feed:{vendor_id}:{epoch}:next"
+
+
+def event_key(vendor_id, seq):
+    return f"transactions:vendor-feed:{vendor_id}:{seq}"
+
+
+def trade_created_payload(trade):
+    """The compact ``trade_started`` frame vendor dashboards render."""
+    asset = asset_cache.get(trade.asset_id) or {}
+    return {
+        "type": "trade_started",
+        "trade": {
+            "id": str(trade.id),
+            "seller": {"id": str(trade.seller_id), "username": trade.seller.username},
+            "asset": {"id": str(trade.asset_id), "symbol": asset.get("symbol"), "name": asset.get("name")},
+            "quantity": str(trade.quantity),
+            "amount": str(trade.amount),
+            "created_at": trade.created_at.isoformat(),
+        },
+    }
+
+
+def publish_trade_created(trade, using=None):
+    """Announce a new trade to its vendor's room once the creating transaction commits."""
+    payload = trade_created_payload(trade)
+    transaction.on_commit(lambda: publish(trade.vendor_id, payload), using=using)
+
+
+def start_epoch(vendor_id, key, timeout=None):
+    """
+    Store a new epoch, its counter already at zero, under ``key`` unless a
+    concurrent caller got there first; return whichever epoch won.
+    """
+    epoch = uuid.uuid4().hex
+    cache.set(sequence_key(vendor_id, epoch), 0, None)
+    if not cache.add(key, epoch, timeout):
+        cache.delete(sequence_key(vendor_id, epoch))
+        epoch = cache.get(key)
+    return epoch
+
+
+def publish(vendor_id, payload):
+    """
+    Number ``payload`` with the vendor's next sequence number, keep it for
+    replay and queue it for the vendor's room. Returns the sequence number.
+
+    Numbers belong to an epoch, a random id that changes whenever the
+    counter restarts (it was evicted, or the cache emptied), so a client
+    holding an old number can tell a new 1 from its old one. Each epoch has
+    its own counter, created before the epoch is visible and never
+    recreated, and ``cache.add`` picks a single winner whenever one starts,
+    so concurrent publishers never share or reset a count.
+    """
+    epoch = cache.get(epoch_key(vendor_id)) or start_epoch(vendor_id, epoch_key(vendor_id))
+    try:
+        seq = cache.incr(sequence_key(vendor_id, epoch))
+    except ValueError:
+        # The counter was lost: every publisher moves on to the same next epoch.
+        epoch = start_epoch(vendor_id, successor_key(vendor_id, epoch), REPLAY_TIMEOUT)
+        cache.set(epoch_key(vendor_id), epoch, None)
+        seq = cache.incr(sequence_key(vendor_id, epoch))
+    payload = dict(payload, epoch=epoch, seq=seq)
+    cache.set(event_key(vendor_id, seq), payload, REPLAY_TIMEOUT)
+    notify(f"vendor_{vendor_id}", frame_event(payload))
+    return seq
+
+
+def replay(vendor_id, after, epoch=None):
+    """
+    The vendor's events numbered above ``after`` in ``epoch``, oldest first,
+    and the ``resync`` frame to send after them if some missed events are no
+    longer held (the client should then reload its list once instead of
+    trusting the replay), or None. A client from an older epoch, or ahead of
+    the counter, missed a restart: it gets the current epoch in full.
+    """
+    current = cache.get(epoch_key(vendor_id))
+    latest = (current and cache.get(sequence_key(vendor_id, current))) or 0
+    restarted = after > latest or (epoch is not None and epoch != current)
+    if restarted:
+        after = 0
+    start = max(after + 1, latest - REPLAY_SIZE + 1)
+    held = cache.get_many([event_key(vendor_id, seq) for seq in range(start, latest + 1)])
+    events = [
+        held[key] for key in sorted(held, key=lambda key: int(key.rsplit(':', 1)[1]))
+        if held[key].get("epoch") == current
+    ]
+    if restarted or start > after + 1 or len(events) < latest - start + 1:
+        return events, {"type": "resync", "epoch": current, "seq": latest}
+    return events, None
@@ -0,0 +1,75 @@
+import json
+
+try:
+    import msgpack
+except ImportError:  # installed with channels_redis; binary framing is simply not offered without it
+    msgpack = None
+
+JSON_SUBPROTOCOL = "cryptex.json"
+MSGPACK_SUBPROTOCOL = "cryptex.msgpack"
+
+# Event type whose payload was encoded once by the sender, in one wire
+# format; subscribers that speak the other one convert it themselves.
+FRAME_EVENT = "broadcast_frame"
+
+
+def negotiate(subprotocols):
+    """
+    Pick the wire format from the client's ``Sec-WebSocket-Protocol``
+    offers. Returns the subprotocol to accept (None for plain JSON text,
+    which is what clients offering nothing get) and whether frames are binary.
+    """
+    if MSGPACK_SUBPROTOCOL in subprotocols and msgpack is not None:
+        return MSGPACK_SUBPROTOCOL, True
+    if JSON_SUBPROTOCOL in subprotocols:
+        return JSON_SUBPROTOCOL, False
+    return None, False
+
+
+def encode_text(payload):
+    """Compact JSON: no padding whitespace and raw UTF-8, which also deflates better."""
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def encode_binary(payload):
+    if msgpack is None:
+        return None
+    return msgpack.packb(payload, use_bin_type=True, default=str)
+
+
+def decode(text_data=None, bytes_data=None):
+    """Decode an inbound frame; raises ValueError if it is not a valid payload."""
+    if bytes_data is not None:
+        if msgpack is None:
+            raise ValueError("Binary frames are not supported.")
+        try:
+            return msgpack.unpackb(bytes_data, raw=False)
+        except Exception as exc:
+            raise ValueError(str(exc)) from exc
+    return json.loads(text_data)
+
+
+def frame_event(payload, text=None, binary=None):
+    """
+    Channel-layer event carrying ``payload`` encoded once: as ``binary``
+    or ``text`` if the caller already has that encoding (e.g. the frame
+    exactly as a client sent it), else as compact JSON text. Only one
+    encoding travels, so the channel layer never carries both.
+    """
+    if binary is not None:
+        return {"type": FRAME_EVENT, "bytes": binary}
+    return {"type": FRAME_EVENT, "text": text if text is not None else encode_text(payload)}
+
+
+def frame_text(event):
+    """The JSON text of a frame event, converting from msgpack if that is what it carries."""
+    if event.get("text") is not None:
+        return event["text"]
+    return encode_text(decode(bytes_data=event["bytes"]))
+
+
+def frame_binary(event):
+    """The msgpack bytes of a frame event, converting from JSON text if need be."""
+    if event.get("bytes") is not None:
+        return event["bytes"]
+    return encode_binary(decode(text_data=event["text"]))
@@ -0,0 +1,46 @@
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from cryptex.benchmarking import scratch_environment
+from cryptex.notifications import dispatcher
+from assets.models import Asset
+from users.models import User
+from vendors.models import Vendor
+from transactions.models import Transaction
+from transactions.tasks import AUTO_CANCEL_AFTER, auto_cancel_inactive_trades
+
+
+class Command(BaseCommand):
+    help = "Seed stale pending trades in a scratch database and time one auto-cancel tick."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trades', type=int, default=100_000)
+        parser.add_argument('--batch-size', type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        with scratch_environment():
+            self.seed(options['trades'], options['batch_size'])
+            started = time.perf_counter()
+            cancelled = auto_cancel_inactive_trades()
+            elapsed = time.perf_counter() - started
+            dispatcher.flush(timeout=120)
+            delivered = time.perf_counter() - started
+
+        self.stdout.write(f"Cancelled {cancelled} trades in {elapsed:.3f}s "
+                          f"({cancelled / elapsed:,.0f} cancellations/s)")
+        self.stdout.write(f"Notifications delivered after {delivered:.3f}s: {dispatcher.metrics()}")
+
+    def seed(self, count, batch_size):
+        """Create ``count`` pending trades old enough to be auto-cancelled."""
+        seller = User.objects.create_user(username='bench-seller', email='seller@bench.local')
+        vendor_user = User.objects.create_user(username='bench-vendor', email='vendor@bench.local', is_vendor=True)
+        vendor = Vendor.objects.create(user=vendor_user, display_name='Bench Vendor', contact_email='vendor@bench.local')
+        asset = Asset.objects.create(name='Tether', symbol='USDT')
+        Transaction.objects.bulk_create(
+            (Transaction(seller=seller, vendor=vendor, asset=asset, quantity=Decimal('1'), amount=Decimal('1'))
+             for _ in range(count)),
+            batch_size=batch_size,
+        )
+        # auto_now_add overrides created_at on insert, so backdate afterwards.
+        Transaction.objects.update(created_at=timezone.now() - AUTO_CANCEL_AFTER * 2)
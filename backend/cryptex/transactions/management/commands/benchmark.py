@@ -0,0 +1,79 @@
+import json
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from cryptex.benchmarking import compare, measure_endpoint, measure_fanout, scratch_environment, seed
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmark_baseline.json'
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a scratch database at the given scale, then report p50/p99 latency and "
+        "queries per request for the main API endpoints and websocket fan-out throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--vendors', type=int, default=50)
+        parser.add_argument('--trades', type=int, default=2_000)
+        parser.add_argument('--messages-per-trade', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=30, help="Requests per endpoint.")
+        parser.add_argument('--subscribers', type=int, default=20)
+        parser.add_argument('--frames', type=int, default=200)
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE),
+                            help="Baseline JSON to compare against.")
+        parser.add_argument('--save-baseline', action='store_true',
+                            help="Write these results to --baseline instead of comparing.")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Allowed relative slowdown before a result counts as a regression.")
+
+    def handle(self, *args, **options):
+        with scratch_environment():
+            ids = seed(
+                users=options['users'], vendors=options['vendors'], trades=options['trades'],
+                messages_per_trade=options['messages_per_trade'],
+            )
+            endpoints = {
+                'transactions': '/api/transactions/',
+                'transactions_by_vendor': f"/api/transactions/?vendor_id={ids['vendor_id']}",
+                'transactions_with_messages': '/api/transactions/?include_messages=true',
+                'vendors': '/api/vendors/',
+                'vendors_with_transactions': '/api/vendors/?include_transactions=true',
+                'vendors_with_stats': '/api/vendors/?include_stats=true',
+                'vendor_discovery': f"/api/vendors/discover/?symbol={ids['symbol']}",
+                'assets': '/api/assets/',
+                'chat_sync': f"/api/chat_messages/sync/?transaction_id={ids['trade_id']}",
+            }
+            results = {
+                name: measure_endpoint(url, repeat=options['repeat'])
+                for name, url in endpoints.items()
+            }
+            results['trade_fanout'] = measure_fanout(
+                ids['trade_id'], subscribers=options['subscribers'], frames=options['frames']
+            )
+
+        self.report(results)
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            baseline_path.write_text(json.dumps(results, indent=2, sort_keys=True))
+            self.stdout.write(f"Baseline saved to {baseline_path}")
+        elif baseline_path.exists():
+            regressions = compare(results, json.loads(baseline_path.read_text()), options['tolerance'])
+            if regressions:
+                raise CommandError("Regressions against baseline:\n  " + "\n  ".join(regressions))
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {baseline_path}"))
+
+    def report(self, results):
+        self.stdout.write(f"{'scenario':<28} {'p50 ms':>9} {'p99 ms':>9} {'queries':>8} {'bytes':>10}")
+        for name, result in results.items():
+            if 'p50_ms' in result:
+                self.stdout.write(
+                    f"{name:<28} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+                    f"{result['queries']:>8} {result['bytes']:>10}"
+                )
+            else:
+                self.stdout.write(
+                    f"{name:<28} {result['messages_per_s']:>9.0f} messages/s "
+                    f"({result['deliveries']} deliveries in {result['seconds']}s)"
+                )
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+from cryptex.exports import EXPORTS, FORMATS, export_rows, render
+from cryptex.pagination import decode_cursor, parse_bound
+
+
+class Command(BaseCommand):
+    help = "Stream a full transactions or chat_messages export as CSV or NDJSON, for compliance requests."
+
+    def add_arguments(self, parser):
+        parser.add_argument('export', choices=sorted(EXPORTS))
+        parser.add_argument('--output', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--since', help="Only rows created at or after this ISO date or datetime.")
+        parser.add_argument('--until', help="Only rows created before this ISO date or datetime.")
+        parser.add_argument('--after', help="Resume after the row carrying this cursor.")
+        parser.add_argument('--file', help="Write here instead of stdout; with --after, append to it.")
+        parser.add_argument('--database', help="Read from this database alias (e.g. a replica).")
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_bound(options, 'since')
+            until = parse_bound(options, 'until')
+        except ValidationError as exc:
+            raise CommandError(exc.detail)
+        after = None
+        if options['after']:
+            try:
+                after = decode_cursor(options['after'])
+            except ValueError:
+                after = None
+            if after is None or after[0] is None:
+                raise CommandError("Invalid --after cursor.")
+
+        rows = export_rows(options['export'], since, until, after, using=options['database'])
+        lines = render(options['export'], rows, options['output'])
+        if after and options['output'] == 'csv':
+            next(lines)  # the file being resumed already has its header
+        if not options['file']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        count = 0
+        with open(options['file'], 'a' if after else 'w', encoding='utf-8', newline='') as out:
+            for line in lines:
+                out.write(line)
+                count += 1
+        self.stderr.write(self.style.SUCCESS(f"Wrote {count} lines to {options['file']}."))
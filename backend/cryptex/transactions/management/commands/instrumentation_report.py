@@ -0,0 +1,71 @@
+import json
+from collections import Counter, defaultdict
+from django.core.management.base import BaseCommand
+from cryptex.instrumentation import export_directory, prune_exports
+
+
+class Command(BaseCommand):
+    help = "Print the endpoints, serializer fields and query shapes that cost the most database time."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--reset', action='store_true', help="Delete every process's exported counters afterwards.")
+
+    def handle(self, *args, **options):
+        if export_directory().is_dir():
+            prune_exports()
+        files = sorted(export_directory().glob('*.json'))
+        if not files:
+            self.stdout.write(f"No instrumentation exports in {export_directory()}. "
+                              "Set INSTRUMENTATION_ENABLED=true and send some traffic.")
+            return
+
+        routes = defaultdict(Counter)
+        fields = defaultdict(Counter)
+        signatures = Counter()
+        notifications = Counter()
+        websockets = Counter()
+        for path in files:
+            snapshot = json.loads(path.read_text())
+            for name, values in snapshot['routes'].items():
+                routes[name].update(values)
+            for name, values in snapshot['fields'].items():
+                fields[name].update(values)
+            for row in snapshot['signatures']:
+                signatures[(row['route'], row['shape'])] += row['count']
+            notifications.update(snapshot.get('notifications', {}))
+            websockets.update(snapshot.get('websockets', {}))
+
+        limit = options['limit']
+        self.stdout.write(self.style.MIGRATE_HEADING("Endpoints by total SQL time"))
+        self.stdout.write(f"{'route':<40} {'reqs':>7} {'q/req':>7} {'sql ms':>9} {'ser ms':>9} "
+                          f"{'KB/req':>8} {'N+1 reqs':>9}")
+        for name, v in sorted(routes.items(), key=lambda item: -item[1]['sql_seconds'])[:limit]:
+            requests = v['requests'] or 1
+            self.stdout.write(
+                f"{name:<40} {int(v['requests']):>7} {v['queries'] / requests:>7.1f} "
+                f"{v['sql_seconds'] * 1000 / requests:>9.2f} {v['serializer_seconds'] * 1000 / requests:>9.2f} "
+                f"{v['response_bytes'] / 1024 / requests:>8.1f} {int(v['n_plus_one_requests']):>9}"
+            )
+
+        self.stdout.write(self.style.MIGRATE_HEADING("\nSerializer method fields by total time"))
+        self.stdout.write(f"{'field':<45} {'calls':>8} {'ms/call':>9} {'q/call':>8}")
+        for name, v in sorted(fields.items(), key=lambda item: -item[1]['seconds'])[:limit]:
+            calls = v['calls'] or 1
+            self.stdout.write(f"{name:<45} {int(v['calls']):>8} {v['seconds'] * 1000 / calls:>9.3f} "
+                              f"{v['queries'] / calls:>8.2f}")
+
+        self.stdout.write(self.style.MIGRATE_HEADING("\nRepeated query shapes (N+1 signatures)"))
+        for (route, shape), count in signatures.most_common(limit):
+            self.stdout.write(f"{count:>8}  {route}\n          {shape[:200]}")
+
+        if notifications:
+            self.stdout.write(self.style.MIGRATE_HEADING("\nNotification dispatcher (all processes)"))
+            self.stdout.write("  ".join(f"{key}={value}" for key, value in sorted(notifications.items())))
+
+        if websockets:
+            self.stdout.write(self.style.MIGRATE_HEADING("\nWebsocket flow control (all processes)"))
+            self.stdout.write("  ".join(f"{key}={value}" for key, value in sorted(websockets.items())))
+
+        if options['reset']:
+            prune_exports(max_age=0)
@@ -0,0 +1,68 @@
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from .models import Transaction
+
+PARTICIPANTS_TIMEOUT = 60 * 60 * 24
+VENDOR_OWNER_TIMEOUT = 60 * 60 * 24
+
+
+def participants_key(trade_id):
+    return f"transactions:participants:{trade_id}"
+
+
+def vendor_owner_key(vendor_id):
+    return f"vendors:owner:{vendor_id}"
+
+
+def cache_participants(trade):
+    """Remember who may join a new trade's room: ``(seller user id, vendor user id)``."""
+    cache.set(
+        participants_key(trade.pk),
+        (str(trade.seller_id), str(trade.vendor.user_id)),
+        PARTICIPANTS_TIMEOUT,
+    )
+
+
+def evict_participants(trade_ids):
+    """Forget the participants of trades that are no longer pending."""
+    cache.delete_many([participants_key(trade_id) for trade_id in trade_ids])
+
+
+def trade_participants(trade_id):
+    """
+    ``(seller user id, vendor user id)`` of a trade, or None if there is no
+    such trade. Pending trades are answered from the cache their creation
+    filled; finished trades are rare on this path and read the database.
+    """
+    participants = cache.get(participants_key(trade_id))
+    if participants is not None:
+        return participants
+    try:
+        row = Transaction.objects.filter(id=trade_id).values_list(
+            'seller_id', 'vendor__user_id', 'status'
+        ).first()
+    except ValidationError:
+        return None
+    if row is None:
+        return None
+    participants = (str(row[0]), str(row[1]))
+    if row[2] == 'pending':
+        cache.set(participants_key(trade_id), participants, PARTICIPANTS_TIMEOUT)
+    return participants
+
+
+def vendor_owner(vendor_id):
+    """User id of the vendor's account, or None if there is no such vendor."""
+    from vendors.models import Vendor
+
+    owner = cache.get(vendor_owner_key(vendor_id))
+    if owner is not None:
+        return owner
+    try:
+        user_id = Vendor.objects.filter(id=vendor_id).values_list('user_id', flat=True).first()
+    except ValidationError:
+        return None
+    if user_id is None:
+        return None
+    cache.set(vendor_owner_key(vendor_id), str(user_id), VENDOR_OWNER_TIMEOUT)
+    return str(user_id)
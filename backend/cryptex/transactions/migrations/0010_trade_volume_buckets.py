@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:01
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0001_initial'),
+        ('transactions', '0009_transaction_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsWatermark',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('position', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='TradeVolumeBucket',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('status', models.CharField(max_length=50)),
+                ('trade_count', models.IntegerField(default=0)),
+                ('quantity', models.DecimalField(decimal_places=8, default=0, max_digits=28)),
+                ('amount', models.DecimalField(decimal_places=8, default=0, max_digits=28)),
+                ('naira_paid', models.DecimalField(decimal_places=2, default=0, max_digits=24)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='volume_buckets', to='assets.asset')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'bucket_start', 'asset', 'status'), name='volume_bucket_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:36
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0010_trade_volume_buckets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('group', models.CharField(max_length=100)),
+                ('event', models.JSONField()),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('failed', 'Failed')], default='pending', max_length=20)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='outbox_pending_idx')],
+            },
+        ),
+    ]
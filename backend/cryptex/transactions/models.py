@@ -1,10 +1,17 @@
-from django.db import models
+from django.db import models, router, transaction
 from cryptex.base import BaseModel
 from users.models import User
 from vendors.models import Vendor
 from assets.models import Asset
 
 
+# Fields a trade's contribution to its vendor's VendorStats is computed from.
+STATS_FIELDS = (
+    'vendor_id', 'asset_id', 'status', 'quantity', 'amount',
+    'value_paid_in_naira', 'created_at', 'updated_at',
+)
+
+
 class Transaction(BaseModel):
     """
     Model representing a transaction in the system.
@@ -22,5 +29,92 @@ class Transaction(BaseModel):
         ('cancelled', 'Cancelled')
     ], default='pending')
 
+    class Meta:
+        # Keyset pagination walks (created_at, id); each index leads with the
+        # equality filters TransactionViewSet accepts.
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='txn_created_idx'),
+            models.Index(fields=['seller', 'created_at', 'id'], name='txn_seller_created_idx'),
+            models.Index(fields=['vendor', 'created_at', 'id'], name='txn_vendor_created_idx'),
+            models.Index(fields=['asset', 'created_at', 'id'], name='txn_asset_created_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='txn_status_created_idx'),
+            models.Index(fields=['seller', 'status', 'created_at', 'id'], name='txn_seller_status_idx'),
+            models.Index(fields=['vendor', 'status', 'created_at', 'id'], name='txn_vendor_status_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so the stats signals can tell what changed.
+        instance._loaded_stats = {
+            field: instance.__dict__[field] for field in STATS_FIELDS if field in instance.__dict__
+        }
+        return instance
+
+    def save(self, *args, **kwargs):
+        # The vendor stats signals write in the same transaction as the row.
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(Transaction, instance=self)):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(Transaction, instance=self)):
+            return super().delete(*args, **kwargs)
+
     def __str__(self):
         return f"{self.seller.username} - {self.vendor.display_name} - {self.asset.symbol} - {self.amount}"
+
+
+class TradeVolumeBucket(BaseModel):
+    """
+    Trade count and volume for one asset and status over one hour or day,
+    by trade creation time. Maintained by ``analytics.refresh_trade_buckets``.
+    """
+    GRANULARITIES = [('hour', 'Hour'), ('day', 'Day')]
+
+    granularity = models.CharField(max_length=10, choices=GRANULARITIES)
+    bucket_start = models.DateTimeField()
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='volume_buckets')
+    status = models.CharField(max_length=50)
+    trade_count = models.IntegerField(default=0)
+    quantity = models.DecimalField(max_digits=28, decimal_places=8, default=0)
+    amount = models.DecimalField(max_digits=28, decimal_places=8, default=0)
+    naira_paid = models.DecimalField(max_digits=24, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'bucket_start', 'asset', 'status'], name='volume_bucket_uniq'
+            ),
+        ]
+
+
+class AnalyticsWatermark(BaseModel):
+    """How far (by ``Transaction.updated_at``) a bucket refresh has processed."""
+    name = models.CharField(max_length=100, unique=True)
+    position = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class NotificationOutbox(BaseModel):
+    """
+    A channel-layer event written in the same database transaction as the
+    change it announces (see ``cryptex.notifications``). Rows are deleted
+    once delivered; ``failed`` rows stay for inspection.
+    """
+    group = models.CharField(max_length=100)
+    event = models.JSONField()  # see cryptex.notifications.stored_event
+    attempts = models.PositiveSmallIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=[
+        ('pending', 'Pending'),
+        ('failed', 'Failed'),
+    ], default='pending')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='outbox_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.group} ({self.status})"
@@ -1,20 +1,26 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
+from cryptex.query_plan import QueryPlan, SparseFieldsetMixin, related
 from .models import Transaction
 from .utils import send_cancelled_notification
 from users.models import User
 from vendors.models import Vendor
 from assets.models import Asset
-from assets.serializers import AssetSerializer
+from assets.serializers import CachedAssetField
 from vendors.serializers import VendorSerializer
 from users.serializers import UserSerializer
 
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Transaction model."""
+    field_plans = {
+        'seller': related('seller', UserSerializer),
+        'vendor': related('vendor', VendorSerializer),
+    }
     seller = UserSerializer(read_only=True)
     vendor = VendorSerializer(read_only=True)
-    asset = AssetSerializer(read_only=True)
+    asset = CachedAssetField()
     messages = serializers.SerializerMethodField()
     seller_id = serializers.PrimaryKeyRelatedField(
         source='seller',
@@ -46,11 +52,16 @@ class TransactionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
         
     def get_messages(self, obj):
-        from chat_messages.serializers import ChatMessageSerializer
-        """Get the chat messages for the transaction."""
+        """Get the most recent chat messages for the transaction, oldest first."""
+        from chat_messages.serializers import EmbeddedChatMessageSerializer, MESSAGES_LIMIT_DEFAULT
         if self.context.get('include_messages', False):
-            messages = obj.messages.all()
-            return ChatMessageSerializer(messages, many=True).data
+            messages = getattr(obj, 'recent_messages', None)
+            if messages is None:
+                limit = self.context.get('messages_limit', MESSAGES_LIMIT_DEFAULT)
+                messages = obj.messages.order_by('-created_at', '-id')[:limit]
+            return EmbeddedChatMessageSerializer(
+                reversed(list(messages)), many=True, fields=self.nested_fieldset('messages')
+            ).data
         return None
     
     def update(self, instance, validated_data):
@@ -59,4 +70,30 @@ class TransactionSerializer(serializers.ModelSerializer):
         if 'status' in validated_data and validated_data['status'] == 'cancelled':
             send_cancelled_notification(instance, "user")
         return instance
-            
\ No newline at end of file
+
+
+class TransactionTransitionSerializer(serializers.Serializer):
+    """One compare-and-set status change for the bulk transition endpoint."""
+    STATUSES = [choice for choice, _ in Transaction._meta.get_field('status').choices]
+
+    id = serializers.UUIDField()
+    expected_status = serializers.ChoiceField(choices=STATUSES)
+    new_status = serializers.ChoiceField(choices=STATUSES)
+
+
+class TradeVolumeSerializer(serializers.Serializer):
+    """One row of ``analytics.volume_series``."""
+    bucket = serializers.DateTimeField()
+    asset_id = serializers.UUIDField()
+    status = serializers.CharField()
+    trades = serializers.IntegerField()
+    quantity = serializers.DecimalField(max_digits=28, decimal_places=8, source='total_quantity')
+    amount = serializers.DecimalField(max_digits=28, decimal_places=8, source='total_amount')
+    naira_paid = serializers.DecimalField(max_digits=24, decimal_places=2, source='total_naira_paid')
+
+
+def transactions_query_plan():
+    """Prefetch a ``transactions`` relation with everything TransactionSerializer renders."""
+    return QueryPlan(prefetch_related=[Prefetch(
+        'transactions', queryset=TransactionSerializer.query_plan.apply(Transaction.objects.all())
+    )])
@@ -0,0 +1,62 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from vendors.stats import StatusChange, apply_status_changes
+from .membership import cache_participants, evict_participants
+from .models import STATS_FIELDS, Transaction
+
+
+def stats_change(values, old_status, new_status):
+    """A trade with ``values`` entering (old_status None) or leaving its vendor's stats."""
+    return StatusChange(
+        values['vendor_id'], values['asset_id'], old_status, new_status,
+        values['quantity'], values['amount'], values['value_paid_in_naira'],
+        values['created_at'], values['updated_at'],
+    )
+
+
+@receiver(post_save, sender=Transaction)
+def update_vendor_stats(sender, instance, created, raw=False, **kwargs):
+    """
+    Count a trade in its vendor's stats when it is created, and move its
+    contribution when a save changes any field the stats are built from
+    (its status, totals, vendor or asset). Bulk status updates record their
+    changes themselves.
+    """
+    if raw:
+        return
+    loaded = {} if created else getattr(instance, '_loaded_stats', {})
+    if not created and len(loaded) < len(STATS_FIELDS):
+        return  # not loaded from the database, or loaded without every stats field
+    current = {field: getattr(instance, field) for field in STATS_FIELDS}
+    if created:
+        apply_status_changes([stats_change(current, None, current['status'])])
+    elif any(loaded[field] != current[field] for field in STATS_FIELDS if field != 'updated_at'):
+        apply_status_changes([
+            stats_change(loaded, loaded['status'], None),
+            stats_change(current, None, current['status']),
+        ])
+    instance._loaded_stats = current
+
+
+@receiver(post_delete, sender=Transaction)
+def remove_from_vendor_stats(sender, instance, **kwargs):
+    """Take a deleted trade out of its vendor's stats, as it was last stored."""
+    values = getattr(instance, '_loaded_stats', {})
+    if len(values) < len(STATS_FIELDS):
+        values = {field: getattr(instance, field) for field in STATS_FIELDS}
+    apply_status_changes([stats_change(values, values['status'], None)])
+
+
+@receiver(post_save, sender=Transaction)
+def track_trade_participants(sender, instance, created, raw=False, **kwargs):
+    """
+    Cache who may join a trade's websocket room when it is created, and
+    drop the entry once the trade completes or is cancelled.
+    """
+    if raw:
+        return
+    if instance.status == 'pending':
+        if created:
+            cache_participants(instance)
+    else:
+        evict_participants([instance.pk])
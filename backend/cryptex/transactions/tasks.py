@@ -1,24 +1,57 @@
 from celery import shared_task
 from django.utils import timezone
 from datetime import timedelta
-from .models import Transaction
-from .utils import send_cancelled_notification
+from cryptex.locks import task_lock
+from cryptex.notifications import redeliver_outbox
+from .analytics import refresh_trade_buckets
+from .utils import claim_stale_trades, send_cancelled_notifications
+
+AUTO_CANCEL_AFTER = timedelta(minutes=10)
+AUTO_CANCEL_LOCK_KEY = "transactions:auto_cancel_inactive_trades:lock"
+AUTO_CANCEL_LOCK_TIMEOUT = 300
+ANALYTICS_LOCK_KEY = "transactions:refresh_trade_analytics:lock"
+ANALYTICS_LOCK_TIMEOUT = 600
+
 
 @shared_task
 def auto_cancel_inactive_trades():
-    cutoff = timezone.now() - timedelta(minutes=10)
-    untouched_trades = Transaction.objects.filter(
-        status="pending",
-        transaction_hash__isnull=True,
-        value_paid_in_naira__isnull=True,
-        created_at__lt=cutoff
-    )
-    print("Untouched trades to cancel:", untouched_trades.count())
-    for trade in untouched_trades:
-        print(f"Cancelling trade {trade.id} created at {trade.created_at}")
-        trade.status = "cancelled"
-        trade.save(update_fields=['status'])
-        send_cancelled_notification(trade, cancelled_by="system") 
-        
-    if untouched_trades.exists():
-        print(f"Auto-cancelled {untouched_trades.count()} untouched trades.")
+    """
+    Cancel untouched pending trades in bulk and notify their trade groups.
+    A task lock keeps overlapping beat ticks from running at the same time;
+    the claim itself never cancels a row twice either way.
+    """
+    with task_lock(AUTO_CANCEL_LOCK_KEY, AUTO_CANCEL_LOCK_TIMEOUT) as acquired:
+        if not acquired:
+            print("Auto-cancel already running, skipping this tick.")
+            return 0
+        cutoff = timezone.now() - AUTO_CANCEL_AFTER
+        trade_ids = claim_stale_trades(cutoff)
+        if trade_ids:
+            send_cancelled_notifications(trade_ids, cancelled_by="system")
+            print(f"Auto-cancelled {len(trade_ids)} untouched trades.")
+        return len(trade_ids)
+
+
+@shared_task
+def refresh_trade_analytics(full=False):
+    """
+    Fold trades changed since the last run into the volume buckets behind
+    the analytics endpoint. Overlapping runs are skipped like auto-cancel.
+    """
+    with task_lock(ANALYTICS_LOCK_KEY, ANALYTICS_LOCK_TIMEOUT) as acquired:
+        if not acquired:
+            print("Analytics refresh already running, skipping this tick.")
+            return 0
+        written = refresh_trade_buckets(full=full)
+        if written:
+            print(f"Refreshed {written} trade volume buckets.")
+        return written
+
+
+@shared_task
+def redeliver_notifications():
+    """Send notifications a process committed to the outbox but died before delivering."""
+    sent = redeliver_outbox()
+    if sent:
+        print(f"Redelivered {sent} outbox notifications.")
+    return sent
@@ -1,3 +1,678 @@
-from django.test import TestCase
+import json
+from io import StringIO
+from unittest import mock
+from datetime import timedelta
+from decimal import Decimal
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+from channels.layers import InMemoryChannelLayer
+from cryptex.benchmarking import IN_MEMORY_CHANNEL_LAYERS
+from cryptex.pagination import encode_cursor
+from cryptex.notifications import NotificationDispatcher, dispatcher
+from chat_messages.models import ChatMessage
+from cryptex.testing import QueryBudgetMixin, SettleOutboxMixin, TradeFixturesMixin
+from users.models import User
+from .models import NotificationOutbox, Transaction
+from .tasks import AUTO_CANCEL_LOCK_KEY, auto_cancel_inactive_trades
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class AutoCancelInactiveTradesTests(TradeFixturesMixin, TestCase):
+    def tearDown(self):
+        cache.delete(AUTO_CANCEL_LOCK_KEY)
+
+    def test_cancels_only_untouched_stale_trades(self):
+        stale = self.make_trade(age=timedelta(minutes=11))
+        fresh = self.make_trade()
+        paid = self.make_trade(age=timedelta(minutes=11), transaction_hash='0xabc')
+
+        self.assertEqual(auto_cancel_inactive_trades(), 1)
+
+        statuses = dict(Transaction.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[stale.id], 'cancelled')
+        self.assertEqual(statuses[fresh.id], 'pending')
+        self.assertEqual(statuses[paid.id], 'pending')
+        self.assertEqual(auto_cancel_inactive_trades(), 0)
+
+    def test_overlapping_tick_is_skipped(self):
+        self.make_trade(age=timedelta(minutes=11))
+        cache.add(AUTO_CANCEL_LOCK_KEY, 'other-tick')
+
+        self.assertEqual(auto_cancel_inactive_trades(), 0)
+        self.assertEqual(Transaction.objects.filter(status='pending').count(), 1)
+
+    def test_databases_without_update_returning_claim_with_row_locks(self):
+        from .utils import can_update_returning, claim_stale_trades
+        stale = self.make_trade(age=timedelta(minutes=11))
+        mariadb = mock.Mock(vendor='mysql')
+        self.assertFalse(can_update_returning(mariadb))
+
+        with mock.patch('transactions.utils.can_update_returning', return_value=False):
+            self.assertEqual(claim_stale_trades(timezone.now() - timedelta(minutes=10)), [stale.id])
+
+
+class TransactionPaginationTests(TradeFixturesMixin, TestCase):
+    def test_pages_walk_every_trade_once_newest_first(self):
+        trades = [self.make_trade() for _ in range(5)]
+        # Identical timestamps force the id tie-breaker to do the work.
+        Transaction.objects.update(created_at=timezone.now())
+
+        seen = []
+        url = f'/api/transactions/?vendor_id={self.vendor.id}&page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(sorted(seen), sorted(str(trade.id) for trade in trades))
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/transactions/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+class TransactionQueryBudgetTests(TradeFixturesMixin, QueryBudgetMixin, TestCase):
+    def test_list_query_count_is_flat(self):
+        self.make_trade()
+        self.assertFlatQueryCount('/api/transactions/', self.grow_trades, budget=5)
+
+    def test_list_with_messages_query_count_is_flat(self):
+        self.make_trade()
+        self.assertFlatQueryCount('/api/transactions/?include_messages=true', self.grow_trades, budget=10)
+
+    def test_embedded_messages_are_compact_and_windowed(self):
+        from chat_messages.models import ChatMessage
+        trade = self.make_trade()
+        for content in ('first', 'second', 'third'):
+            ChatMessage.objects.create(
+                sender=self.seller, recipient=self.vendor.user, transaction=trade, content=content
+            )
+
+        response = self.client.get('/api/transactions/?include_messages=true&messages_limit=2')
+
+        messages = response.data['results'][0]['messages']
+        self.assertEqual([message['content'] for message in messages], ['second', 'third'])
+        self.assertNotIn('transaction', messages[0])
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class TradeConsumerChatTests(TradeFixturesMixin, TransactionTestCase):
+    def setUp(self):
+        self.setUpTestData()
+
+    async def connect(self, trade, subprotocols=None, user=None):
+        communicator = self.socket(f'/ws/trade/{trade.id}/', user, subprotocols)
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual(subprotocol, subprotocols[0] if subprotocols else None)
+        return communicator
+
+    def test_chat_frames_are_persisted_acknowledged_and_broadcast(self):
+        from chat_messages.models import ChatMessage
+        trade = self.make_trade()
+
+        async def scenario():
+            seller, vendor = await self.connect(trade), await self.connect(trade, user=self.vendor.user)
+            await seller.send_json_to({
+                'type': 'chat_message', 'client_id': 'c1', 'sender': str(self.seller.id), 'content': 'hello',
+            })
+            ack = await seller.receive_json_from()
+            broadcast = await vendor.receive_json_from()
+            await seller.disconnect()
+            await vendor.disconnect()
+            return ack, broadcast
+
+        ack, broadcast = async_to_sync(scenario)()
+
+        message = ChatMessage.objects.get()
+        self.assertEqual(ack['type'], 'chat_message_ack')
+        self.assertEqual(ack['client_id'], 'c1')
+        self.assertEqual(ack['id'], str(message.id))
+        self.assertEqual(broadcast['id'], str(message.id))
+        self.assertEqual(message.recipient_id, self.vendor.user_id)
+
+    def test_chat_frames_from_outsiders_are_rejected(self):
+        from chat_messages.models import ChatMessage
+        trade = self.make_trade()
+        outsider = self.make_vendor('outsider')
+
+        async def scenario():
+            communicator = await self.connect(trade)
+            await communicator.send_json_to({
+                'type': 'chat_message', 'sender': str(outsider.user_id), 'content': 'hello',
+            })
+            reply = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return reply
+
+        self.assertEqual(async_to_sync(scenario)()['type'], 'chat_message_error')
+        self.assertFalse(ChatMessage.objects.exists())
+
+    def test_saved_messages_are_relayed_only_by_their_sender(self):
+        trade = self.make_trade()
+
+        async def scenario():
+            seller, vendor = await self.connect(trade), await self.connect(trade, user=self.vendor.user)
+            saved = {'type': 'chat_message', 'id': 'm1', 'sender': str(self.seller.id), 'content': 'hi'}
+            await seller.send_json_to(saved)
+            relayed = await vendor.receive_json_from()
+            await seller.receive_json_from()  # its own frame, echoed by the room
+            await vendor.send_json_to(dict(saved, id='m2', content='spoofed'))
+            reply = await vendor.receive_json_from()
+            spoofed_through = not await seller.receive_nothing()
+            await seller.disconnect()
+            await vendor.disconnect()
+            return relayed, reply, spoofed_through
+
+        relayed, reply, spoofed_through = async_to_sync(scenario)()
+        self.assertEqual(relayed['id'], 'm1')
+        self.assertEqual(reply['type'], 'chat_message_error')
+        self.assertFalse(spoofed_through)
+
+    def test_msgpack_and_json_clients_share_a_room(self):
+        import msgpack
+        from .framing import MSGPACK_SUBPROTOCOL
+        trade = self.make_trade()
+
+        async def scenario():
+            binary = await self.connect(trade, [MSGPACK_SUBPROTOCOL])
+            text = await self.connect(trade)
+            await binary.send_to(bytes_data=msgpack.packb({'type': 'payment_made', 'amount': 5}))
+            echoed = msgpack.unpackb(await binary.receive_from())
+            relayed = await text.receive_json_from()
+            await text.send_json_to({'type': 'tokens_sent', 'tx_hash': '0xabc'})
+            from_text = msgpack.unpackb(await binary.receive_from())
+            await binary.disconnect()
+            await text.disconnect()
+            return echoed, relayed, from_text
+
+        echoed, relayed, from_text = async_to_sync(scenario)()
+
+        self.assertEqual(echoed, {'type': 'payment_made', 'amount': 5})
+        self.assertEqual(relayed, echoed)
+        self.assertEqual(from_text, {'type': 'tokens_sent', 'tx_hash': '0xabc'})
+
+    def test_frame_events_carry_one_encoding(self):
+        from .framing import frame_binary, frame_event
+        event = frame_event({'type': 'ping'})
+        self.assertEqual(set(event), {'type', 'text'})
+        self.assertEqual(set(frame_event(None, binary=frame_binary(event))), {'type', 'bytes'})
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class TransactionTransitionTests(TradeFixturesMixin, SettleOutboxMixin, TestCase):
+    def post(self, changes):
+        return self.client.post('/api/transactions/transition/', changes, content_type='application/json')
+
+    def test_compare_and_set_reports_each_item(self):
+        pending = self.make_trade()
+        taken = self.make_trade(status='completed')
+        done = self.make_trade(status='completed')
+        changes = [
+            {'id': str(pending.id), 'expected_status': 'pending', 'new_status': 'cancelled'},
+            {'id': str(taken.id), 'expected_status': 'pending', 'new_status': 'cancelled'},
+            {'id': str(pending.id), 'expected_status': 'pending', 'new_status': 'completed'},
+            {'id': str(done.id), 'expected_status': 'completed', 'new_status': 'pending'},
+            {'id': '00000000-0000-0000-0000-000000000000',
+             'expected_status': 'pending', 'new_status': 'completed'},
+        ]
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.post(changes)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['applied'], 1)
+        self.assertEqual(
+            [item['result'] for item in response.data['results']],
+            ['applied', 'conflict', 'duplicate', 'invalid', 'not_found'],
+        )
+        self.assertEqual(response.data['results'][1]['status'], 'completed')
+        self.assertEqual(len(callbacks), 1)
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, 'cancelled')
+
+    def test_second_writer_loses(self):
+        trade = self.make_trade()
+        complete = [{'id': str(trade.id), 'expected_status': 'pending', 'new_status': 'completed'}]
+        cancel = [{'id': str(trade.id), 'expected_status': 'pending', 'new_status': 'cancelled'}]
+
+        self.assertEqual(self.post(complete).data['results'][0]['result'], 'applied')
+        self.assertEqual(self.post(cancel).data['results'][0]['result'], 'conflict')
+        trade.refresh_from_db()
+        self.assertEqual(trade.status, 'completed')
+
+    def test_malformed_batch_is_rejected(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post([{'id': 'nope'}]).status_code, 400)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class TradeConsumerAuthorizationTests(TradeFixturesMixin, TransactionTestCase):
+    def setUp(self):
+        self.setUpTestData()
+        cache.clear()
+
+    def connects(self, path, user=None, anonymous=False):
+        from .routing import websocket_urlpatterns
+
+        async def scenario():
+            if anonymous:
+                communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+            else:
+                communicator = self.socket(path, user)
+            connected, _ = await communicator.connect()
+            if connected:
+                await communicator.disconnect()
+            return connected
+
+        return async_to_sync(scenario)()
+
+    def test_only_participants_join_trade_rooms(self):
+        from .membership import participants_key
+        trade = self.make_trade()
+        outsider = self.make_vendor('outsider').user
+        path = f'/ws/trade/{trade.id}/'
+        self.assertEqual(cache.get(participants_key(trade.id)), (str(self.seller.id), str(self.vendor.user_id)))
+
+        self.assertTrue(self.connects(path))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.connects(path, self.vendor.user))
+            self.assertTrue(self.connects(path))
+        self.assertEqual(len(queries), 1)  # the vendor's first token resolution only
+        self.assertFalse(self.connects(path, outsider))
+        self.assertFalse(self.connects(path, anonymous=True))
+        self.assertFalse(self.connects('/ws/trade/not-a-trade/'))
+
+        self.client.post('/api/transactions/transition/', [
+            {'id': str(trade.id), 'expected_status': 'pending', 'new_status': 'completed'},
+        ], content_type='application/json')
+        self.assertIsNone(cache.get(participants_key(trade.id)))
+        self.assertTrue(self.connects(path))  # finished trades still open, from the database
+
+    def test_vendor_rooms_are_for_their_vendor_only(self):
+        from .framing import frame_event
+        path = f'/ws/vendor/{self.vendor.id}/'
+        self.assertFalse(self.connects(path))
+        self.assertFalse(self.connects(f'/ws/vendor/{self.make_vendor("other").id}/', self.vendor.user))
+
+        async def scenario():
+            owner = self.socket(path, self.vendor.user)
+            self.assertTrue((await owner.connect())[0])
+            await get_channel_layer().group_send(f'vendor_{self.vendor.id}', frame_event({'type': 'ping'}))
+            pinged = await owner.receive_json_from()
+            await owner.disconnect()
+            return pinged
+
+        self.assertEqual(async_to_sync(scenario)(), {'type': 'ping'})
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class VendorTradeFeedTests(TradeFixturesMixin, TransactionTestCase):
+    def setUp(self):
+        self.setUpTestData()
+        cache.clear()
+
+    def create_trade(self):
+        response = self.client.post('/api/transactions/', {
+            'seller_id': str(self.seller.id), 'vendor_id': str(self.vendor.id),
+            'asset_id': str(self.asset.id), 'quantity': '1.5', 'amount': '150.00',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def receive(self, after=None, epoch=None):
+        """Frames the vendor's socket gets while a trade is created, and on a later reconnect."""
+        path = f'/ws/vendor/{self.vendor.id}/'
+        resume = path
+        if after is not None:
+            resume = f'{path}?after={after}' + (f'&epoch={epoch}' if epoch else '')
+
+        async def scenario():
+            live = self.socket(path, self.vendor.user)
+            self.assertTrue((await live.connect())[0])
+            trade_id = await database_sync_to_async(self.create_trade)()
+            await database_sync_to_async(dispatcher.flush)()
+            received = [await live.receive_json_from()]
+            await live.disconnect()
+            resumed = self.socket(resume, self.vendor.user)
+            self.assertTrue((await resumed.connect())[0])
+            replayed = []
+            while not await resumed.receive_nothing(timeout=0.1):
+                replayed.append(await resumed.receive_json_from())
+            await resumed.disconnect()
+            return trade_id, received, replayed
+
+        return async_to_sync(scenario)()
+
+    def test_new_trades_reach_the_vendor_after_commit(self):
+        trade_id, received, replayed = self.receive()
+        self.assertEqual(received[0]['type'], 'trade_started')
+        self.assertEqual(received[0]['seq'], 1)
+        self.assertEqual(received[0]['trade']['id'], trade_id)
+        self.assertEqual(received[0]['trade']['seller']['username'], self.seller.username)
+        self.assertEqual(received[0]['trade']['asset']['symbol'], self.asset.symbol)
+        self.assertEqual(replayed, [])
+
+    def test_reconnecting_vendors_replay_missed_trades(self):
+        from . import feed
+        self.create_trade()
+        trade_id, received, replayed = self.receive(after=1)
+        self.assertEqual(received[0]['seq'], 2)
+        self.assertEqual(replayed, received)
+
+        # Only the newest event is still held for a client that saw none of them.
+        with mock.patch.object(feed, 'REPLAY_SIZE', 1):
+            _, received, replayed = self.receive(after=0, epoch=received[0]['epoch'])
+        self.assertEqual(replayed, [received[0], {'type': 'resync', 'epoch': received[0]['epoch'], 'seq': 3}])
+
+    def test_numbering_restarts_in_a_new_epoch_after_the_counter_is_lost(self):
+        _, received, _ = self.receive()
+        old_epoch = received[0]['epoch']
+        for _ in range(2):
+            self.create_trade()
+        cache.clear()
+
+        _, received, replayed = self.receive(after=3, epoch=old_epoch)
+
+        self.assertEqual(received[0]['seq'], 1)
+        self.assertNotEqual(received[0]['epoch'], old_epoch)
+        self.assertEqual(replayed, [received[0], {'type': 'resync', 'epoch': received[0]['epoch'], 'seq': 1}])
+
+    def test_a_lost_counter_moves_every_publisher_to_one_new_epoch(self):
+        from . import feed
+        vendor_id = self.vendor.id
+        self.assertEqual(feed.publish(vendor_id, {'type': 'ping'}), 1)
+        old_epoch = cache.get(feed.epoch_key(vendor_id))
+        cache.delete(feed.sequence_key(vendor_id, old_epoch))
+
+        self.assertEqual([feed.publish(vendor_id, {'type': 'ping'}) for _ in range(2)], [1, 2])
+        new_epoch = cache.get(feed.epoch_key(vendor_id))
+        self.assertNotEqual(new_epoch, old_epoch)
+        # A publisher that read the old epoch before the switch joins the same one.
+        self.assertEqual(feed.start_epoch(vendor_id, feed.successor_key(vendor_id, old_epoch)), new_epoch)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class TradeConsumerFlowControlTests(TradeFixturesMixin, TransactionTestCase):
+    def setUp(self):
+        self.setUpTestData()
+
+    def flood(self, senders, frames):
+        """Each sender sends ``frames`` frames; return what a listener received and the counters moved."""
+        from .throttling import counters
+        trade = self.make_trade()
+        before = dict(counters)
+
+        async def scenario():
+            listener = self.socket(f'/ws/trade/{trade.id}/', self.vendor.user)
+            sockets = [self.socket(f'/ws/trade/{trade.id}/') for _ in range(senders)]
+            for socket in [listener, *sockets]:
+                self.assertTrue((await socket.connect())[0])
+            for index in range(frames):
+                for socket in sockets:
+                    await socket.send_json_to({'type': 'typing', 'n': index})
+            await sockets[0].send_to(text_data='not json')
+            received = []
+            while not await listener.receive_nothing(timeout=0.2):
+                received.append(await listener.receive_json_from())
+            notices = []
+            while not await sockets[0].receive_nothing(timeout=0.1):
+                notices.append(await sockets[0].receive_json_from())
+            for socket in [listener, *sockets]:
+                await socket.disconnect()
+            return received, notices
+
+        received, notices = async_to_sync(scenario)()
+        return received, notices, {key: counters[key] - before.get(key, 0) for key in counters}
+
+    @override_settings(WEBSOCKET_THROTTLE={'connection': (0.01, 3), 'group': (100, 100)})
+    def test_each_connection_is_rate_limited(self):
+        received, notices, moved = self.flood(senders=1, frames=6)
+        self.assertEqual([frame['n'] for frame in received], [0, 1, 2])
+        self.assertEqual([n['type'] for n in notices].count('rate_limited'), 1)
+        self.assertEqual(moved['throttled_connection'], 3)
+        self.assertEqual(moved['invalid'], 1)
+
+    @override_settings(WEBSOCKET_THROTTLE={'connection': (100, 100), 'group': (0.01, 4)})
+    def test_rooms_share_a_rate_limit(self):
+        received, _, moved = self.flood(senders=2, frames=4)
+        self.assertEqual(len(received), 4)
+        self.assertEqual(moved['throttled_group'], 4)
+
+    def test_outbound_queue_coalesces_and_drops_oldest(self):
+        from .throttling import OutboundQueue, counters
+        before = dict(counters)
+        queue = OutboundQueue(maxsize=2)
+        for frame in ('a', 'b', 'b', 'c'):
+            queue.put(('text', frame))
+        self.assertEqual(list(queue.frames), [('text', 'b'), ('text', 'c')])
+        self.assertTrue(queue.lagged)
+        self.assertEqual(counters['coalesced'] - before.get('coalesced', 0), 1)
+        self.assertEqual(counters['dropped'] - before.get('dropped', 0), 1)
+
+
+class FlakyChannelLayer(InMemoryChannelLayer):
+    """In-memory layer whose first group_send fails."""
+    failures = 1
+
+    async def group_send(self, group, message):
+        if FlakyChannelLayer.failures:
+            FlakyChannelLayer.failures -= 1
+            raise ConnectionError("channel layer unavailable")
+        await super().group_send(group, message)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class NotificationDispatcherTests(TradeFixturesMixin, SettleOutboxMixin, TestCase):
+    def test_cancellations_are_sent_after_commit_and_coalesced(self):
+        from .utils import send_cancelled_notifications
+        trade = self.make_trade()
+        before = dispatcher.metrics()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            send_cancelled_notifications([trade.id, trade.id])
+            self.assertEqual(dispatcher.metrics()['enqueued'], before['enqueued'])
+
+        self.assertTrue(dispatcher.flush())
+        after = dispatcher.metrics()
+        self.assertEqual(after['enqueued'] - before['enqueued'], 2)
+        self.assertEqual(after['sent'] - before['sent'] + after['coalesced'] - before['coalesced'], 2)
+        self.assertEqual(after['queue_depth'], 0)
+        self.settle_outbox()
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    @override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'transactions.tests.FlakyChannelLayer'}})
+    def test_failed_sends_are_retried(self):
+        FlakyChannelLayer.failures = 1
+        local = NotificationDispatcher()
+
+        local.enqueue([('trade_1', {'type': 'trade_message', 'message': '{}'})])
+
+        self.assertTrue(local.flush())
+        metrics = local.metrics()
+        self.assertEqual((metrics['retried'], metrics['sent'], metrics['failed']), (1, 1, 0))
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class NotificationOutboxTests(TradeFixturesMixin, TransactionTestCase):
+    def setUp(self):
+        self.setUpTestData()
+
+    def test_events_are_stored_with_the_change_and_cleared_once_sent(self):
+        from django.db import transaction
+        from .models import NotificationOutbox
+        from .utils import send_cancelled_notifications
+        trade = self.make_trade()
+
+        with transaction.atomic():
+            send_cancelled_notifications([trade.id])
+            self.assertEqual(NotificationOutbox.objects.count(), 1)
+        self.assertTrue(dispatcher.flush())
+
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_rows_left_by_a_dead_process_are_redelivered(self):
+        from cryptex.notifications import redeliver_outbox, stored_event
+        from .framing import frame_event
+        from .models import NotificationOutbox
+        event = frame_event({'type': 'ping'})
+        row = NotificationOutbox.objects.create(group='vendor_1', event=stored_event(event))
+        layer = get_channel_layer()
+
+        async def listen():
+            channel = await layer.new_channel()
+            await layer.group_add('vendor_1', channel)
+            return channel
+
+        channel = async_to_sync(listen)()
+        self.assertEqual(redeliver_outbox(), 0)  # still within the live dispatcher's grace
+        five_minutes_ago = timezone.now() - timedelta(minutes=5)
+        NotificationOutbox.objects.filter(pk=row.pk).update(created_at=five_minutes_ago, updated_at=five_minutes_ago)
+
+        self.assertEqual(redeliver_outbox(), 1)
+        received = async_to_sync(layer.receive)(channel)
+        self.assertEqual(received['text'], event['text'])
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    @override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'transactions.tests.FlakyChannelLayer'}})
+    def test_failed_redeliveries_stay_claimed_until_the_grace_passes(self):
+        from cryptex.notifications import redeliver_outbox, stored_event
+        from .models import NotificationOutbox
+        FlakyChannelLayer.failures = 1
+        row = NotificationOutbox.objects.create(group='vendor_1', event=stored_event({'type': 'ping'}))
+        five_minutes_ago = timezone.now() - timedelta(minutes=5)
+        NotificationOutbox.objects.filter(pk=row.pk).update(created_at=five_minutes_ago, updated_at=five_minutes_ago)
+
+        self.assertEqual(redeliver_outbox(), 0)
+        row.refresh_from_db()
+        self.assertEqual((row.attempts, row.status), (1, 'pending'))
+        self.assertEqual(redeliver_outbox(), 0)  # claimed by the first sweep
+        self.assertEqual(redeliver_outbox(grace=timedelta(0)), 1)
+
+
+class TradeAnalyticsTests(TradeFixturesMixin, TestCase):
+    def series(self, **params):
+        response = self.client.get('/api/transactions/analytics/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_buckets_follow_new_trades_and_late_status_changes(self):
+        from .tasks import refresh_trade_analytics
+        old = self.make_trade(age=timedelta(days=3), amount=Decimal('10'))
+        self.make_trade(amount=Decimal('5'))
+        refresh_trade_analytics()
+
+        days = self.series(interval='day', start=(timezone.now() - timedelta(days=7)).date().isoformat())
+        self.assertEqual([(row['status'], row['trades'], row['amount']) for row in days],
+                         [('pending', 1, '10.00000000'), ('pending', 1, '5.00000000')])
+
+        # An old trade completing corrects its original bucket on the next run.
+        old.refresh_from_db()
+        old.status = 'completed'
+        old.save()
+        self.make_trade(amount=Decimal('7'))
+        refresh_trade_analytics()
+
+        days = self.series(interval='day', start=(timezone.now() - timedelta(days=7)).date().isoformat())
+        self.assertEqual([(row['status'], row['trades'], row['amount']) for row in days],
+                         [('completed', 1, '10.00000000'), ('pending', 2, '12.00000000')])
+        weeks = self.series(interval='week', start=(timezone.now() - timedelta(days=30)).isoformat())
+        self.assertEqual(sum(row['trades'] for row in weeks), 3)
+        hours = self.series(interval='hour', status='pending')
+        self.assertEqual(sum(row['trades'] for row in hours), 2)
+
+    def test_invalid_ranges_are_rejected(self):
+        url = '/api/transactions/analytics/'
+        self.assertEqual(self.client.get(url, {'interval': 'month'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'interval': 'hour', 'start': '2020-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': 'yesterday'}).status_code, 400)
+
+
+class ExportTests(TradeFixturesMixin, TestCase):
+    def export(self, url, **params):
+        admin = User.objects.get_or_create(username='auditor', email='auditor@example.com', is_staff=True)[0]
+        response = self.client.get(url, params, HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(admin)}')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_transactions_stream_as_flat_csv_and_resume_from_a_cursor(self):
+        trades = [self.make_trade(age=timedelta(days=age)) for age in (3, 2, 1)]
+        lines = self.export('/api/transactions/export/')
+        self.assertTrue(lines[0].startswith('id,created_at,updated_at,status,seller_id,seller__username'))
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], [str(trade.id) for trade in trades])
+
+        cursor = lines[1].rsplit(',', 1)[1]
+        rest = self.export('/api/transactions/export/', after=cursor, output='ndjson')
+        self.assertEqual([json.loads(line)['id'] for line in rest], [str(trade.id) for trade in trades[1:]])
+
+        recent = self.export('/api/transactions/export/', since=(timezone.now() - timedelta(days=1, hours=12)).isoformat())
+        self.assertEqual(len(recent), 2)  # header and the newest trade
+
+    def test_chat_messages_export_and_command(self):
+        trade = self.make_trade()
+        for content in ('hello', 'paid, check "now"'):
+            ChatMessage.objects.create(sender=self.seller, recipient=self.vendor.user, transaction=trade, content=content)
+        lines = self.export('/api/chat_messages/export/', output='ndjson')
+        self.assertEqual([json.loads(line)['content'] for line in lines], ['hello', 'paid, check "now"'])
+
+        out = StringIO()
+        call_command('export_records', 'chat_messages', stdout=out)
+        self.assertIn('"paid, check ""now"""', out.getvalue())
+        with self.assertRaisesMessage(CommandError, 'Invalid --after cursor.'):
+            call_command('export_records', 'chat_messages', after=encode_cursor(None, trade.id), stdout=out)
+
+    def test_exports_stream_chunk_by_chunk_under_asgi(self):
+        trades = [self.make_trade(age=timedelta(days=age)) for age in (3, 2, 1)]
+        admin = User.objects.create_user(username='auditor', email='auditor@example.com', is_staff=True)
+
+        async def chunks():
+            response = await AsyncClient().get(
+                '/api/transactions/export/', headers={'Authorization': f'Bearer {AccessToken.for_user(admin)}'}
+            )
+            self.assertTrue(response.is_async)
+            return [chunk async for chunk in response.streaming_content]
+
+        with mock.patch('cryptex.exports.EXPORT_CHUNK_SIZE', 2):
+            received = async_to_sync(chunks)()
+        self.assertEqual(len(received), 2)
+        lines = b''.join(received).decode().splitlines()
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], [str(trade.id) for trade in trades])
+
+    def test_export_is_for_staff_only(self):
+        self.assertEqual(self.client.get('/api/transactions/export/').status_code, 401)
+        self.assertEqual(self.client.get('/api/chat_messages/export/').status_code, 401)
+
+
+class SparseFieldsetTests(TradeFixturesMixin, QueryBudgetMixin, TestCase):
+    def test_fields_prune_the_payload_and_the_queries(self):
+        trade = self.make_trade()
+        ChatMessage.objects.create(sender=self.seller, recipient=self.vendor.user, transaction=trade, content='hi')
+        full = self.count_queries('/api/transactions/')
+        url = '/api/transactions/?fields=id,status,seller.username&expand=messages'
+        sparse = self.count_queries(url)
+        self.assertLess(sparse, full)
+
+        row = self.client.get(url).data['results'][0]
+        self.assertEqual(set(row), {'id', 'status', 'seller', 'messages'})
+        self.assertEqual(row['seller'], {'username': 'seller'})
+        self.assertEqual([m['content'] for m in row['messages']], ['hi'])
+
+    def test_nested_fieldsets_reach_method_fields(self):
+        self.make_trade()
+        row = self.client.get('/api/transactions/?fields=vendor.user.username,vendor.supported_assets').data['results'][0]
+        self.assertEqual(row['vendor']['user'], {'username': 'vendor'})
+        self.assertEqual([a['symbol'] for a in row['vendor']['supported_assets']], ['USDT'])
+        self.assertNotIn('password', self.client.get(f'/api/users/{self.seller.id}/').data)
 
-# Create your tests here.
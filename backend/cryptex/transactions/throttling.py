@@ -0,0 +1,103 @@
+import asyncio
+import time
+from collections import Counter, deque
+
+# Counters since process start, reported through instrumentation.
+counters = Counter()
+
+
+def metrics():
+    return {
+        name: counters[name]
+        for name in ('frames_in', 'invalid', 'throttled_connection', 'throttled_group',
+                     'frames_out', 'delayed', 'coalesced', 'dropped')
+    }
+
+
+class TokenBucket:
+    """
+    Allows ``rate`` events per second on average and bursts of up to
+    ``burst``. Tokens refill continuously; ``take`` never waits.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, tokens=1):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < tokens:
+            return False
+        self.tokens -= tokens
+        return True
+
+    def retry_after(self, tokens=1):
+        """Seconds until ``take(tokens)`` would succeed."""
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+
+class GroupBuckets:
+    """
+    One TokenBucket per group, shared by this process's connections to it
+    and dropped when the last of them leaves. Each app instance limits what
+    it relays into a group; instances do not coordinate.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+
+    def acquire(self, group, rate, burst):
+        bucket, users = self.buckets.get(group, (None, 0))
+        if bucket is None:
+            bucket = TokenBucket(rate, burst)
+        self.buckets[group] = (bucket, users + 1)
+        return bucket
+
+    def release(self, group):
+        bucket, users = self.buckets.get(group, (None, 0))
+        if users <= 1:
+            self.buckets.pop(group, None)
+        else:
+            self.buckets[group] = (bucket, users - 1)
+
+
+group_buckets = GroupBuckets()
+
+
+class OutboundQueue:
+    """
+    Bounded queue of frames waiting to be written to one client.
+
+    A frame identical to one still waiting is coalesced into it. When a
+    slow client lets ``maxsize`` frames pile up, the oldest is dropped and
+    the queue is marked ``lagged`` so the client can be told to resync.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.frames = deque()
+        self.ready = asyncio.Event()
+        self.lagged = False
+
+    def put(self, frame):
+        if frame in self.frames:
+            counters['coalesced'] += 1
+            return
+        if self.frames:
+            counters['delayed'] += 1
+        if len(self.frames) >= self.maxsize:
+            self.frames.popleft()
+            counters['dropped'] += 1
+            self.lagged = True
+        self.frames.append(frame)
+        self.ready.set()
+
+    async def get(self):
+        while not self.frames:
+            self.ready.clear()
+            await self.ready.wait()
+        return self.frames.popleft()
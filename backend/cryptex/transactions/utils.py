@@ -1,16 +1,219 @@
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-        
+from django.db import connection, transaction as db_transaction
+from django.utils import timezone
+from cryptex.notifications import notify, notify_many
+from .framing import frame_event
+from .membership import evict_participants
+from vendors.stats import StatusChange, apply_status_changes
+from .models import Transaction
+
+
+TRANSITION_BATCH_MAX = 500
+
+# Statuses a trade may move to from each status; completed and cancelled
+# trades are final.
+ALLOWED_TRANSITIONS = {
+    'pending': {'completed', 'cancelled'},
+}
+
+
+def cancelled_event(trade_id, cancelled_by="system"):
+    """Build the channel-layer event announcing a cancelled trade."""
+    return frame_event({
+        "type": "transaction_cancelled",
+        "cancelled_by": cancelled_by,
+        "trade_id": str(trade_id),
+        "message": f"Transaction {trade_id} has been cancelled.",
+    })
+
+
+def completed_event(trade_id, completed_by="system"):
+    """Build the channel-layer event announcing a completed trade."""
+    return frame_event({
+        "type": "transaction_completed",
+        "completed_by": completed_by,
+        "trade_id": str(trade_id),
+        "message": f"Transaction {trade_id} has been completed.",
+    })
+
+
+STATUS_EVENTS = {
+    'cancelled': cancelled_event,
+    'completed': completed_event,
+}
+
 
 def send_cancelled_notification(transaction, cancelled_by="system"):
-    """Send a notification when a transaction is cancelled."""
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        f"trade_{str(transaction.id)}",
-        {
-            "type": "transaction_cancelled",
-            "trade_id": str(transaction.id),
-            "message": f"Transaction {transaction.id} has been cancelled.",
-            "cancelled_by": cancelled_by
-        },
-    )
\ No newline at end of file
+    """Notify the trade group, once committed, that a transaction was cancelled."""
+    notify(f"trade_{transaction.id}", cancelled_event(transaction.id, cancelled_by))
+
+
+def send_cancelled_notifications(trade_ids, cancelled_by="system"):
+    """Notify each trade group in ``trade_ids``, once committed, of its cancellation."""
+    send_status_notifications([(trade_id, 'cancelled') for trade_id in trade_ids], cancelled_by)
+
+
+def send_status_notifications(changes, changed_by="system"):
+    """
+    Queue one status event per ``(trade_id, status)`` pair for its trade
+    group. Delivery happens after commit on the notification dispatcher,
+    off the calling thread.
+    """
+    notify_many(
+        (f"trade_{trade_id}", STATUS_EVENTS[status](trade_id, changed_by))
+        for trade_id, status in changes
+        if status in STATUS_EVENTS
+    )
+
+
+def transition_trades(changes, changed_by="user"):
+    """
+    Apply ``(id, expected_status, new_status)`` changes atomically with
+    compare-and-set semantics and return one result per change, in order.
+
+    A change is ``applied`` only if the trade is still in
+    ``expected_status`` when the UPDATE runs; otherwise it reports
+    ``conflict`` with the status it actually found. The affected rows are
+    locked first, then updated with one UPDATE per distinct
+    ``(expected, new)`` pair that still re-checks the status. Repeated ids
+    are reported as ``duplicate`` and disallowed moves as ``invalid``.
+    Notifications are queued for after the commit, one per changed trade.
+    """
+    results = [None] * len(changes)
+    seen = set()
+    wanted = {}
+    for index, (trade_id, expected, new) in enumerate(changes):
+        if trade_id in seen:
+            results[index] = {'id': str(trade_id), 'result': 'duplicate'}
+        elif new not in ALLOWED_TRANSITIONS.get(expected, ()):
+            results[index] = {'id': str(trade_id), 'result': 'invalid',
+                              'detail': f"Cannot move a trade from {expected} to {new}."}
+        else:
+            wanted[trade_id] = index
+        seen.add(trade_id)
+
+    now = timezone.now()
+    with db_transaction.atomic():
+        rows = {
+            row['id']: row for row in Transaction.objects.select_for_update().filter(id__in=wanted).values(
+                'id', 'status', 'vendor_id', 'asset_id', 'quantity', 'amount',
+                'value_paid_in_naira', 'created_at',
+            )
+        }
+        groups = {}
+        for trade_id, index in wanted.items():
+            _, expected, new = changes[index]
+            if trade_id not in rows:
+                results[index] = {'id': str(trade_id), 'result': 'not_found'}
+            elif rows[trade_id]['status'] != expected:
+                results[index] = {'id': str(trade_id), 'result': 'conflict', 'status': rows[trade_id]['status']}
+            else:
+                groups.setdefault((expected, new), []).append(trade_id)
+
+        applied, stats_changes = [], []
+        for (expected, new), trade_ids in groups.items():
+            updated = Transaction.objects.filter(id__in=trade_ids, status=expected).update(
+                status=new, updated_at=now
+            )
+            if updated != len(trade_ids):
+                # Only reachable where row locks are unavailable: the rows
+                # stamped with this call's ``now`` are the ones it moved.
+                moved = set(Transaction.objects.filter(
+                    id__in=trade_ids, status=new, updated_at=now
+                ).values_list('id', flat=True))
+                for trade_id in set(trade_ids) - moved:
+                    results[wanted[trade_id]] = {'id': str(trade_id), 'result': 'conflict'}
+                trade_ids = [trade_id for trade_id in trade_ids if trade_id in moved]
+            for trade_id in trade_ids:
+                results[wanted[trade_id]] = {'id': str(trade_id), 'result': 'applied', 'status': new}
+                applied.append((trade_id, new))
+                row = rows[trade_id]
+                stats_changes.append(StatusChange(
+                    row['vendor_id'], row['asset_id'], expected, new, row['quantity'], row['amount'],
+                    row['value_paid_in_naira'], row['created_at'], now,
+                ))
+
+        apply_status_changes(stats_changes)
+        evict_participants([trade_id for trade_id, _ in applied])
+        send_status_notifications(applied, changed_by)
+    return results
+
+
+def can_update_returning(connection):
+    """
+    Whether the database runs ``UPDATE ... RETURNING``: PostgreSQL, and
+    SQLite from 3.35. MariaDB only returns rows from INSERT and DELETE.
+    """
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35)
+    return False
+
+
+def claim_stale_trades(cutoff):
+    """
+    Cancel every untouched pending trade created before ``cutoff`` with a
+    single conditional UPDATE and return the ids of the rows it changed.
+    Rows already moved out of ``pending`` by someone else are never claimed.
+    Vendor stats are updated in the same database transaction.
+    """
+    now = timezone.now()
+    if not can_update_returning(connection):
+        with db_transaction.atomic():
+            rows = list(
+                stale_trades(cutoff).select_for_update(skip_locked=True)
+                .values_list('id', 'vendor_id', 'asset_id')
+            )
+            Transaction.objects.filter(id__in=[row[0] for row in rows], status='pending').update(
+                status='cancelled', updated_at=now
+            )
+            record_cancellations(rows)
+        return [row[0] for row in rows]
+
+    meta = Transaction._meta
+    qn = connection.ops.quote_name
+
+    def column(name):
+        return qn(meta.get_field(name).column)
+
+    sql = (
+        f"UPDATE {qn(meta.db_table)} SET {column('status')} = %s, {column('updated_at')} = %s "
+        f"WHERE {column('status')} = %s "
+        f"AND {column('transaction_hash')} IS NULL "
+        f"AND {column('value_paid_in_naira')} IS NULL "
+        f"AND {column('created_at')} < %s "
+        f"RETURNING {column('id')}, {column('vendor')}, {column('asset')}"
+    )
+    params = [
+        'cancelled',
+        connection.ops.adapt_datetimefield_value(now),
+        'pending',
+        connection.ops.adapt_datetimefield_value(cutoff),
+    ]
+    with db_transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = [
+                tuple(meta.pk.to_python(value) for value in row) for row in cursor.fetchall()
+            ]
+        record_cancellations(rows)
+    return [row[0] for row in rows]
+
+
+def record_cancellations(rows):
+    """Count ``(id, vendor_id, asset_id)`` rows that went from pending to cancelled."""
+    apply_status_changes(
+        StatusChange(vendor_id, asset_id, 'pending', 'cancelled', None, None, None, None, None)
+        for _, vendor_id, asset_id in rows
+    )
+    evict_participants([row[0] for row in rows])
+
+
+def stale_trades(cutoff):
+    """Pending trades with no payment activity created before ``cutoff``."""
+    return Transaction.objects.filter(
+        status="pending",
+        transaction_hash__isnull=True,
+        value_paid_in_naira__isnull=True,
+        created_at__lt=cutoff
+    )
@@ -1,13 +1,31 @@
 from rest_framework import viewsets
+import uuid
+from django.utils import timezone
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from cryptex.db_routing import ReplicaReadMixin
+from cryptex.exports import streaming_export
+from cryptex.pagination import KeysetCursorPagination, parse_bound
+from cryptex.query_plan import QueryPlan, QueryPlanMixin
+from chat_messages.serializers import (
+    MESSAGES_LIMIT_DEFAULT, MESSAGES_LIMIT_MAX, recent_messages_prefetch
+)
+from .analytics import INTERVALS, volume_series
+from .feed import publish_trade_created
 from .models import Transaction
-from .serializers import TransactionSerializer
+from .serializers import TradeVolumeSerializer, TransactionSerializer, TransactionTransitionSerializer
+from .utils import TRANSITION_BATCH_MAX, transition_trades
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(ReplicaReadMixin, QueryPlanMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and editing transaction instances.
     """
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
+    pagination_class = KeysetCursorPagination
+    replica_actions = ('list', 'analytics', 'export')
 
     def get_queryset(self):
         """
@@ -27,11 +45,98 @@ class TransactionViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(asset_id=asset_id)
         if status:
             queryset = queryset.filter(status=status)
-        if self.request.query_params.get('include_messages', 'false').lower() == 'true':
-            queryset = queryset.prefetch_related('messages')
         return queryset
+
+    def get_query_plan(self):
+        plan = super().get_query_plan()
+        if self.include_messages():
+            plan += QueryPlan(prefetch_related=[recent_messages_prefetch(self.messages_limit())])
+        return plan
+
+    def include_messages(self):
+        return ('messages' in self.expansions()
+                or self.request.query_params.get('include_messages', 'false').lower() == 'true')
+
+    def messages_limit(self):
+        """How many of the newest messages to embed per transaction."""
+        try:
+            limit = int(self.request.query_params['messages_limit'])
+        except (KeyError, ValueError):
+            return MESSAGES_LIMIT_DEFAULT
+        return max(1, min(limit, MESSAGES_LIMIT_MAX))
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        publish_trade_created(serializer.instance)
+
+    @action(detail=False, methods=['post'])
+    def transition(self, request):
+        """
+        Apply a list of ``{id, expected_status, new_status}`` changes in one
+        database transaction. Each change only applies if the trade is still
+        in ``expected_status``; the response reports every item's outcome.
+        """
+        serializer = TransactionTransitionSerializer(
+            data=request.data, many=True, allow_empty=False, max_length=TRANSITION_BATCH_MAX
+        )
+        serializer.is_valid(raise_exception=True)
+        results = transition_trades([
+            (item['id'], item['expected_status'], item['new_status'])
+            for item in serializer.validated_data
+        ])
+        return Response({
+            'applied': sum(result['result'] == 'applied' for result in results),
+            'results': results,
+        })
     
     def get_serializer_context(self):
         context = super().get_serializer_context()
-        context['include_messages'] = self.request.query_params.get('include_messages', 'false').lower() == 'true'
-        return context
\ No newline at end of file
+        context['include_messages'] = self.include_messages()
+        context['messages_limit'] = self.messages_limit()
+        return context
+
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        """
+        Trade count and volume per asset and status, bucketed by ``interval``
+        (hour, day or week) over ``start``..``end`` (ISO dates or datetimes).
+        Optional filters: ``asset_id`` and ``status``. Served from the
+        precomputed volume buckets, so figures trail live trades by up to
+        one refresh interval.
+        """
+        params = request.query_params
+        interval = params.get('interval', 'day')
+        if interval not in INTERVALS:
+            raise ValidationError({'interval': f"Choose one of {', '.join(INTERVALS)}."})
+        _, default_span, longest_span = INTERVALS[interval]
+        end = parse_bound(params, 'end') or timezone.now()
+        start = parse_bound(params, 'start') or end - default_span
+        if not start < end:
+            raise ValidationError({'start': 'Must be before end.'})
+        if end - start > longest_span:
+            raise ValidationError({'start': f"{interval} buckets span at most {longest_span.days} days."})
+
+        asset_id = params.get('asset_id')
+        if asset_id:
+            try:
+                asset_id = uuid.UUID(asset_id)
+            except ValueError:
+                raise ValidationError({'asset_id': 'A valid UUID is required.'})
+
+        rows = volume_series(interval, start, end, asset_id, params.get('status'))
+        return Response({
+            'interval': interval,
+            'start': start,
+            'end': end,
+            'results': TradeVolumeSerializer(rows, many=True).data,
+        })
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """
+        Stream every transaction as flat CSV (or NDJSON with
+        ``output=ndjson``), oldest first. ``since``/``until`` bound
+        ``created_at``; ``after`` resumes from a row's ``cursor`` column.
+        """
+        # Bind the database now: the rows are read after this view returns.
+        return streaming_export(request, 'transactions', using=Transaction.objects.db)
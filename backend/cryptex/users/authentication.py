@@ -0,0 +1,48 @@
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+AUTH_USER_CACHE_TTL = 60
+
+
+def cached_user_key(user_id, token_version):
+    return f"users:auth:{user_id}:{token_version}"
+
+
+def token_version(password):
+    """The token-version claim for a user with this password hash."""
+    return get_md5_hash_password(password)
+
+
+def invalidate_cached_user(user, *passwords):
+    """Drop ``user``'s cached copies for its current and any given previous password hashes."""
+    cache.delete_many([
+        cached_user_key(user.pk, token_version(password))
+        for password in {user.password, *passwords} if password is not None
+    ])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user from a short-lived
+    cache keyed by user id and token version instead of loading the row on
+    every request.
+
+    The token version is simplejwt's revoke claim (a hash of the password
+    hash), so tokens issued before a password change stop matching and fall
+    through to the database check, which rejects them. Saving a user evicts
+    its cached copies, so flags such as ``is_email_verified`` never lag.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        version = validated_token.get(api_settings.REVOKE_TOKEN_CLAIM)
+        if user_id is None or version is None:
+            return super().get_user(validated_token)
+        key = cached_user_key(user_id, version)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, AUTH_USER_CACHE_TTL)
+        return user
@@ -0,0 +1,139 @@
+import os
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from .models import QueuedEmail, User
+
+EMAIL_BATCH_SIZE = 100
+# A recipient gets at most one email per interval; later ones wait their turn.
+EMAIL_RECIPIENT_INTERVAL = timedelta(seconds=60)
+EMAIL_MAX_ATTEMPTS = 5
+EMAIL_RETRY_DELAY = timedelta(minutes=1)
+
+
+def recipient_rate_key(recipient):
+    return f"users:email-rate:{recipient.lower()}"
+
+
+def queue_email(recipient, kind, subject, body):
+    """
+    Queue an email and ask a worker to deliver it once the surrounding
+    transaction commits. A newer email of the same ``kind`` replaces one
+    still waiting for the recipient, so repeated requests send one link.
+    """
+    QueuedEmail.objects.filter(recipient=recipient, kind=kind, status='pending').delete()
+    email = QueuedEmail.objects.create(recipient=recipient, kind=kind, subject=subject, body=body)
+    transaction.on_commit(kick_delivery)
+    return email
+
+
+def kick_delivery():
+    from .tasks import deliver_queued_emails
+    try:
+        deliver_queued_emails.delay()
+    except Exception as exc:
+        # The periodic sweep picks the email up once the broker is back.
+        print(f"Could not schedule email delivery: {exc}")
+
+
+# Emails whose body holds a ``{link}`` to this frontend path. The signed,
+# timestamped link is made when the email is sent, so time spent queued,
+# deferred or retrying never eats into how long the link is valid.
+LINK_PATHS = {
+    'verification': 'verify-email',
+    'password_reset': 'reset-password',
+}
+
+
+def signed_link(user, path):
+    token = default_token_generator.make_token(user)
+    uid = user.pk
+    timestamp = int(time.time())
+    return f"{os.getenv('FRONTEND_URL')}/{path}/?uid={uid}&token={token}&ts={timestamp}"
+
+
+def send_verification_email(user):
+    return queue_email(
+        user.email, 'verification', "Verify your email",
+        "Click the link to verify your email: {link}. Expires in 15 minutes.",
+    )
+
+
+def send_password_reset_email(user):
+    return queue_email(
+        user.email, 'password_reset', "Reset your password",
+        "Click the link to reset your password: {link}. Expires in 15 minutes.",
+    )
+
+
+def render_bodies(emails):
+    """
+    Email body by primary key, with fresh links filled in. Link emails
+    whose recipient no longer has an account are left out.
+    """
+    linked = [email for email in emails if email.kind in LINK_PATHS]
+    users = {user.email: user for user in User.objects.filter(email__in={email.recipient for email in linked})}
+    bodies = {email.pk: email.body for email in emails if email.kind not in LINK_PATHS}
+    for email in linked:
+        user = users.get(email.recipient)
+        if user is not None:
+            bodies[email.pk] = email.body.replace('{link}', signed_link(user, LINK_PATHS[email.kind]))
+    return bodies
+
+
+def deliver_due_emails(batch_size=EMAIL_BATCH_SIZE):
+    """
+    Send up to ``batch_size`` due emails over a single connection to the
+    email backend and return how many were sent.
+
+    Recipients emailed within ``EMAIL_RECIPIENT_INTERVAL`` are pushed back
+    rather than sent; failed sends are retried with a delay until
+    ``EMAIL_MAX_ATTEMPTS``, then left marked failed.
+    """
+    now = timezone.now()
+    due = list(QueuedEmail.objects.filter(status='pending', send_after__lte=now).order_by('send_after')[:batch_size])
+    if not due:
+        return 0
+
+    sendable, deferred = [], []
+    for email in due:
+        if cache.add(recipient_rate_key(email.recipient), True, EMAIL_RECIPIENT_INTERVAL.total_seconds()):
+            sendable.append(email)
+        else:
+            deferred.append(email.pk)
+    if deferred:
+        QueuedEmail.objects.filter(pk__in=deferred).update(send_after=now + EMAIL_RECIPIENT_INTERVAL)
+
+    bodies = render_bodies(sendable)
+    # Link emails to deleted accounts are dropped unsent.
+    orphaned = [email.pk for email in sendable if email.pk not in bodies]
+    sendable = [email for email in sendable if email.pk in bodies]
+    sent, failed = [], []
+    if sendable:
+        with get_connection() as connection:
+            for email in sendable:
+                message = EmailMessage(
+                    email.subject, bodies[email.pk], settings.DEFAULT_FROM_EMAIL, [email.recipient],
+                    connection=connection,
+                )
+                try:
+                    connection.send_messages([message])
+                except Exception as exc:
+                    failed.append((email, exc))
+                else:
+                    sent.append(email.pk)
+
+    QueuedEmail.objects.filter(pk__in=sent + orphaned).delete()
+    for email, exc in failed:
+        email.attempts += 1
+        email.last_error = str(exc)
+        email.send_after = now + EMAIL_RETRY_DELAY * email.attempts
+        if email.attempts >= EMAIL_MAX_ATTEMPTS:
+            email.status = 'failed'
+        email.save(update_fields=['attempts', 'last_error', 'send_after', 'status', 'updated_at'])
+    return len(sent)
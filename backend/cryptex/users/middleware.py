@@ -0,0 +1,44 @@
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from .authentication import CachedJWTAuthentication
+
+
+def websocket_token(scope):
+    """The raw JWT a websocket client sent as ``Authorization: Bearer`` or ``?token=``."""
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode().partition(" ")
+            if scheme.lower() == "bearer" and token:
+                return token
+    tokens = parse_qs(scope.get("query_string", b"").decode()).get("token")
+    return tokens[0] if tokens else None
+
+
+@database_sync_to_async
+def authenticate_token(raw_token):
+    authentication = CachedJWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        return None
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticate websocket connections with the same access tokens as the
+    API. Browsers cannot set headers on a websocket, so the token may also
+    come as ``?token=``. Users resolve through CachedJWTAuthentication, so
+    reconnects are served from the cache. Connections without a valid token
+    keep whatever user the session middleware found (usually anonymous).
+    """
+
+    async def __call__(self, scope, receive, send):
+        raw_token = websocket_token(scope)
+        if raw_token:
+            user = await authenticate_token(raw_token)
+            if user is not None:
+                scope = dict(scope, user=user)
+        return await super().__call__(scope, receive, send)
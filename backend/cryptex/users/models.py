@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 from cryptex.base import BaseModel
 
 
@@ -14,5 +15,38 @@ class User(AbstractUser, BaseModel):
     is_email_verified = models.BooleanField(default=False)
     reset_token = models.CharField(max_length=32, blank=True, null=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored hash so a password change evicts cached auth entries.
+        instance._loaded_password = instance.__dict__.get('password')
+        return instance
+
     def __str__(self):
         return self.username
+
+
+class QueuedEmail(BaseModel):
+    """
+    Outbound email waiting for ``users.tasks.deliver_queued_emails``.
+    Rows are deleted once sent; ``failed`` rows stay for inspection.
+    """
+    recipient = models.EmailField()
+    kind = models.CharField(max_length=50)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    send_after = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    status = models.CharField(max_length=20, choices=[
+        ('pending', 'Pending'),
+        ('failed', 'Failed'),
+    ], default='pending')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'send_after'], name='queued_email_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} to {self.recipient}"
@@ -1,9 +1,11 @@
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from cryptex.query_plan import SparseFieldsetMixin, parse_fieldset, related
+from vendors.serializers import ShallowVendorSerializer
 from .models import User
 
 
-class ShallowUserSerializer(serializers.ModelSerializer):
+class ShallowUserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     picture = serializers.ImageField(
         use_url=True, required=False, allow_null=True
     )
@@ -16,10 +18,12 @@ class ShallowUserSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at',
             'picture', 'password'
         ]
+        extra_kwargs = {'password': {'write_only': True}}
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for User model."""
+    field_plans = {'vendor_profile': related('vendor', ShallowVendorSerializer)}
     transactions = serializers.SerializerMethodField()
     vendor_profile = serializers.SerializerMethodField()
     picture = serializers.ImageField(
@@ -37,20 +41,22 @@ class UserSerializer(serializers.ModelSerializer):
             'picture', 'password'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        extra_kwargs = {'password': {'write_only': True}}
 
     def get_transactions(self, obj):
         """Get the transactions for the user."""
         from transactions.serializers import TransactionSerializer
         if self.context.get('include_transactions', False):
             transactions = obj.transactions.all()
-            return TransactionSerializer(transactions, many=True).data
+            return TransactionSerializer(
+                transactions, many=True, fields=self.nested_fieldset('transactions')
+            ).data
         return None
 
     def get_vendor_profile(self, obj):
         """Get the vendor profile for the user if they are a vendor."""
         if obj.is_vendor and hasattr(obj, 'vendor'):
-            from vendors.serializers import ShallowVendorSerializer
-            return ShallowVendorSerializer(obj.vendor).data
+            return ShallowVendorSerializer(obj.vendor, fields=self.nested_fieldset('vendor_profile')).data
         return None
     
     def create(self, validated_data):
@@ -71,11 +77,21 @@ class UserSerializer(serializers.ModelSerializer):
         return instance
 
 
+# What sign-in responses embed unless the client asks for ``?fields=``.
+LOGIN_USER_FIELDS = 'id,username,email,first_name,last_name,is_vendor,picture,vendor_profile'
+
+
+def login_user_data(user, request=None, context=None):
+    """The user payload of a sign-in response, with only the requested (or login) fields."""
+    fields = request.query_params.get('fields') if request is not None else None
+    return UserSerializer(user, context=context or {}, fields=parse_fieldset(fields or LOGIN_USER_FIELDS)).data
+
+
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """Custom serializer to include user data in JWT token response."""
     
     def validate(self, attrs):
         data = super().validate(attrs)
         user = self.user
-        data['user'] = UserSerializer(user).data
+        data['user'] = login_user_data(user, self.context.get('request'))
         return data
\ No newline at end of file
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .authentication import invalidate_cached_user
+from .models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def evict_cached_user(sender, instance, **kwargs):
+    """
+    Forget the cached copies authentication keeps of a saved or deleted
+    user, under its old password hash as well as the new one.
+    """
+    invalidate_cached_user(instance, getattr(instance, '_loaded_password', None))
+    instance._loaded_password = instance.password
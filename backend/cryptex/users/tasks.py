@@ -0,0 +1,27 @@
+from celery import shared_task
+from cryptex.locks import task_lock
+from .emails import deliver_due_emails
+
+EMAIL_LOCK_KEY = "users:deliver_queued_emails:lock"
+EMAIL_LOCK_TIMEOUT = 300
+
+
+@shared_task
+def deliver_queued_emails():
+    """
+    Drain due queued emails batch by batch, one backend connection per
+    batch. Requests trigger it on commit and beat sweeps up retries; a
+    task lock keeps concurrent runs from sending the same rows twice.
+    """
+    with task_lock(EMAIL_LOCK_KEY, EMAIL_LOCK_TIMEOUT) as acquired:
+        if not acquired:
+            return 0
+        total = 0
+        while True:
+            sent = deliver_due_emails()
+            total += sent
+            if not sent:
+                break
+        if total:
+            print(f"Delivered {total} queued emails.")
+        return total
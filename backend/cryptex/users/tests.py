@@ -1,3 +1,133 @@
-from django.test import TestCase
+import re
+import time
+from unittest import mock
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+from cryptex.testing import QueryBudgetMixin, TradeFixturesMixin
+from .authentication import CachedJWTAuthentication
+from .emails import recipient_rate_key
+from .models import QueuedEmail, User
+from .tasks import deliver_queued_emails
+
+
+class UserQueryBudgetTests(TradeFixturesMixin, QueryBudgetMixin, TestCase):
+    def test_list_with_transactions_query_count_is_flat(self):
+        self.make_trade()
+        self.assertFlatQueryCount('/api/users/?include_transactions=true', self.grow_trades, budget=10)
+
+
+class CountingEmailBackend(EmailBackend):
+    """locmem backend that counts how many connections were made."""
+    connections = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        type(self).connections += 1
+
+
+@override_settings(EMAIL_BACKEND='users.tests.CountingEmailBackend')
+class QueuedEmailTests(TestCase):
+    def setUp(self):
+        CountingEmailBackend.connections = 0
+        cache.clear()
+
+    def register(self, username):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post('/api/register/', {
+                'username': username, 'email': f'{username}@example.com', 'password': 'pw-123456',
+            })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(callbacks), 1)  # delivery is scheduled, not performed
+        return response
+
+    def test_registration_queues_and_one_connection_sends_the_batch(self):
+        for username in ('ada', 'bola', 'chi'):
+            self.register(username)
+        self.assertEqual(mail.outbox, [])
+
+        self.assertEqual(deliver_queued_emails(), 3)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox),
+                         ['ada@example.com', 'bola@example.com', 'chi@example.com'])
+        self.assertEqual(CountingEmailBackend.connections, 1)
+        self.assertFalse(QueuedEmail.objects.exists())
+
+    def test_recipients_are_rate_limited_and_resends_supersede(self):
+        self.register('ada')
+        for _ in range(2):
+            self.client.post('/api/resend-verification-email/', {'username': 'ada'})
+        self.assertEqual(QueuedEmail.objects.count(), 1)
+
+        deliver_queued_emails()
+        self.client.post('/api/forgot-password/', {'email': 'ada@example.com'})
+        self.assertEqual(deliver_queued_emails(), 0)
+        self.assertEqual(len(mail.outbox), 1)
+        deferred = QueuedEmail.objects.get()
+        self.assertEqual(deferred.kind, 'password_reset')
+
+        cache.delete(recipient_rate_key('ada@example.com'))
+        QueuedEmail.objects.update(send_after=deferred.created_at)
+        self.assertEqual(deliver_queued_emails(), 1)
+        self.assertEqual(mail.outbox[-1].subject, 'Reset your password')
+
+    def test_links_are_signed_when_sent_not_when_queued(self):
+        self.register('ada')
+        queued_at = time.time()
+        with mock.patch('users.emails.time.time', return_value=queued_at + 3600):
+            deliver_queued_emails()
+        link = re.search(r'ts=(\d+)', mail.outbox[0].body)
+
+        self.assertEqual(int(link.group(1)), int(queued_at + 3600))
+        self.assertNotIn('{link}', mail.outbox[0].body)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='ada', email='ada@example.com', password='pw-123456', is_email_verified=True
+        )
+
+    def user_queries(self, method, url, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, **kwargs)
+        return response, [q['sql'] for q in queries if 'FROM "users_user"' in q['sql']]
+
+    def test_login_loads_the_user_once(self):
+        response, lookups = self.user_queries('post', '/api/token/', data={'username': 'ada', 'password': 'pw-123456'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user']['username'], 'ada')
+        self.assertEqual(len(lookups), 1)
+        self.assertEqual(set(response.data['user']), {
+            'id', 'username', 'email', 'first_name', 'last_name', 'is_vendor', 'picture', 'vendor_profile',
+        })
+        response = self.client.post('/api/token/?fields=id,username', {'username': 'ada', 'password': 'pw-123456'})
+        self.assertEqual(response.data['user'], {'id': str(self.user.id), 'username': 'ada'})
+
+        User.objects.create_user(username='bola', email='bola@example.com', password='pw-123456')
+        response = self.client.post('/api/token/', {'username': 'bola', 'password': 'pw-123456'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_authenticated_requests_reuse_the_cached_user(self):
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+        _, first = self.user_queries('get', '/api/assets/', **auth)
+        _, second = self.user_queries('get', '/api/assets/', **auth)
+        self.assertEqual((len(first), len(second)), (1, 0))
+
+    def test_saves_evict_and_password_changes_revoke(self):
+        token = AccessToken.for_user(self.user)
+        authentication = CachedJWTAuthentication()
+        self.assertTrue(authentication.get_user(token).is_email_verified)
+        self.user.is_email_verified = False
+        self.user.save()
+        self.assertFalse(authentication.get_user(token).is_email_verified)
+
+        self.user.set_password('new-pw-654321')
+        self.user.save()
+        response = self.client.get('/api/assets/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 401)
 
-# Create your tests here.
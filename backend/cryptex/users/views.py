@@ -1,19 +1,21 @@
 from rest_framework import viewsets, status
+from cryptex.query_plan import QueryPlanMixin
+from transactions.serializers import transactions_query_plan
 from rest_framework.views import APIView
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
-from django.conf import settings
 from django.utils.crypto import get_random_string
 from google.oauth2 import id_token
 from google.auth.transport import requests
+from .emails import send_password_reset_email, send_verification_email
 from .models import User
-from .serializers import UserSerializer, CustomTokenObtainPairSerializer
+from .serializers import UserSerializer, CustomTokenObtainPairSerializer, login_user_data
 from dotenv import load_dotenv
 import time
 import os
@@ -22,31 +24,7 @@ import os
 load_dotenv()
 
 
-def send_verification_email(user):
-    token = default_token_generator.make_token(user)
-    uid = user.pk
-    timestamp = int(time.time())
-    verification_url = f"{os.getenv('FRONTEND_URL')}/verify-email/?uid={uid}&token={token}&ts={timestamp}"
-    send_mail(
-        "Verify your email",
-        f"Click the link to verify your email: {verification_url}. Expires in 15 minutes.",
-        settings.DEFAULT_FROM_EMAIL,
-        [user.email],
-    )
-
-def send_password_reset_email(user):
-    token = default_token_generator.make_token(user)
-    uid = user.pk
-    timestamp = int(time.time())
-    reset_url = f"{os.getenv('FRONTEND_URL')}/reset-password/?uid={uid}&token={token}&ts={timestamp}"
-    send_mail(
-        "Reset your password",
-        f"Click the link to reset your password: {reset_url}. Expires in 15 minutes.",
-        settings.DEFAULT_FROM_EMAIL,
-        [user.email],
-    )
-
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and editing user instances.
     """
@@ -62,13 +40,21 @@ class UserViewSet(viewsets.ModelViewSet):
         username = self.request.query_params.get('username')      
         if username:
             queryset = queryset.filter(username=username)
-        if self.request.query_params.get('include_transactions', False):
-            queryset = queryset.prefetch_related('transactions')
         return queryset 
+
+    def get_query_plan(self):
+        plan = super().get_query_plan()
+        if self.include_transactions():
+            plan += transactions_query_plan()
+        return plan
+
+    def include_transactions(self):
+        return ('transactions' in self.expansions()
+                or self.request.query_params.get('include_transactions', 'false').lower() == 'true')
     
     def get_serializer_context(self):
         context = super().get_serializer_context()
-        context['include_transactions'] = self.request.query_params.get('include_transactions', 'false').lower() == 'true'
+        context['include_transactions'] = self.include_transactions()
         return context
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
@@ -134,11 +120,15 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
     def post(self, request, *args, **kwargs):
-        response = super().post(request, *args, **kwargs)
-        user = User.objects.filter(username=request.data.get('username')).first()
-        if user and not user.is_email_verified:
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        # The serializer already loaded the user while checking the password.
+        if not serializer.user.is_email_verified:
             return Response({'error': 'Email not verified.'}, status=status.HTTP_403_FORBIDDEN)
-        return response
+        return Response(serializer.validated_data, status=status.HTTP_200_OK)
 
 class GoogleLoginView(APIView):
     def post(self, request):
@@ -156,7 +146,7 @@ class GoogleLoginView(APIView):
             return Response({
                 'refresh': str(refresh),
                 'access': str(refresh.access_token),
-                'user': UserSerializer(user, context={"request": request}).data
+                'user': login_user_data(user, request, context={"request": request})
             })
         except Exception as e:
             return Response({'error': 'Invalid Google token'}, status=status.HTTP_400_BAD_REQUEST)
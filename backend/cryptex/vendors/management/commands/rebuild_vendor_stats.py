@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from vendors.stats import rebuild_vendor_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute VendorStats from the transactions table (backfill, or repair after bulk edits)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('vendor_ids', nargs='*', help="Only rebuild these vendors.")
+
+    def handle(self, *args, **options):
+        count = rebuild_vendor_stats(options['vendor_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} vendor stats rows."))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:59
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0001_initial'),
+        ('vendors', '0002_vendor_discovery_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorStats',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('pending_count', models.IntegerField(default=0)),
+                ('completed_count', models.IntegerField(default=0)),
+                ('cancelled_count', models.IntegerField(default=0)),
+                ('completed_quantity', models.DecimalField(decimal_places=8, default=0, max_digits=28)),
+                ('completed_amount', models.DecimalField(decimal_places=8, default=0, max_digits=28)),
+                ('naira_paid', models.DecimalField(decimal_places=2, default=0, max_digits=24)),
+                ('completion_seconds', models.FloatField(default=0)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vendor_stats', to='assets.asset')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='vendors.vendor')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'asset'), name='vendor_stats_vendor_asset_uniq')],
+            },
+        ),
+    ]
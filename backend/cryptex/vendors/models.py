@@ -15,5 +15,38 @@ class Vendor(BaseModel):
     is_online = models.BooleanField(default=True, blank=False, null=False)
     supported_assets = models.ManyToManyField(Asset, related_name='vendors', blank=True)
 
+    class Meta:
+        # Discovery walks vendors by rating; the supported_assets through
+        # table's (vendor_id, asset_id) unique index answers the asset probe.
+        indexes = [
+            models.Index(fields=['is_online', 'rating', 'id'], name='vendor_online_rating_idx'),
+            models.Index(fields=['rating', 'id'], name='vendor_rating_idx'),
+        ]
+
+    def __str__(self):
+        return self.display_name
+
+class VendorStats(BaseModel):
+    """
+    Running trade totals for one vendor and asset, kept up to date as
+    trades change status (see ``vendors.stats``) so dashboards never
+    aggregate a vendor's whole history.
+    """
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name='stats')
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='vendor_stats')
+    pending_count = models.IntegerField(default=0)
+    completed_count = models.IntegerField(default=0)
+    cancelled_count = models.IntegerField(default=0)
+    completed_quantity = models.DecimalField(max_digits=28, decimal_places=8, default=0)
+    completed_amount = models.DecimalField(max_digits=28, decimal_places=8, default=0)
+    naira_paid = models.DecimalField(max_digits=24, decimal_places=2, default=0)
+    # Sum over completed trades of the time from creation to completion.
+    completion_seconds = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vendor', 'asset'], name='vendor_stats_vendor_asset_uniq'),
+        ]
+
     def __str__(self):
-        return self.display_name
\ No newline at end of file
+        return f"{self.vendor_id} - {self.asset_id}"
@@ -0,0 +1,205 @@
+import asyncio
+import threading
+import time
+import uuid
+import weakref
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+PRESENCE_KEY = "presence:vendors"
+PRESENCE_TTL = 60
+HEARTBEAT_INTERVAL = 20
+FLUSH_INTERVAL = 1.0
+
+
+class LocalPresenceStore:
+    """In-process presence store for tests and single-process development."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.expiry = {}
+
+    async def apply(self, instance, touched, removed, expires_at):
+        with self.lock:
+            for vendor_id in touched:
+                self.expiry[vendor_id, instance] = expires_at
+            for vendor_id in removed:
+                self.expiry.pop((vendor_id, instance), None)
+
+    def online(self, vendor_ids=None):
+        now = time.time()
+        with self.lock:
+            self.expiry = {key: expires for key, expires in self.expiry.items() if expires > now}
+            online = {vendor_id for vendor_id, _ in self.expiry}
+        if vendor_ids is None:
+            return online
+        return online & {str(vendor_id) for vendor_id in vendor_ids}
+
+
+class RedisPresenceStore:
+    """
+    Presence kept in the channel layer's Redis as one sorted set of
+    ``vendor_id:instance`` members scored by expiry timestamp, so liveness
+    checks are range queries and dead processes age out on their own. A
+    vendor is online while any process holds an unexpired entry for them;
+    one process dropping its entry leaves the others' in place.
+    """
+
+    def __init__(self, host):
+        self.host = host
+        self.sync_client = None
+        # Asyncio clients are bound to the loop they were made on.
+        self.async_clients = weakref.WeakKeyDictionary()
+
+    def connection_kwargs(self):
+        if isinstance(self.host, str):
+            return {'url': self.host}
+        if isinstance(self.host, dict):
+            return {'url': self.host['address']} if 'address' in self.host else dict(self.host)
+        host, port = self.host
+        return {'host': host, 'port': port}
+
+    def client(self, module):
+        kwargs = self.connection_kwargs()
+        if 'url' in kwargs:
+            return module.Redis.from_url(kwargs['url'], decode_responses=True)
+        return module.Redis(decode_responses=True, **kwargs)
+
+    async def apply(self, instance, touched, removed, expires_at):
+        import redis.asyncio
+        loop = asyncio.get_running_loop()
+        client = self.async_clients.get(loop)
+        if client is None:
+            client = self.async_clients[loop] = self.client(redis.asyncio)
+        async with client.pipeline(transaction=False) as pipe:
+            if touched:
+                pipe.zadd(PRESENCE_KEY, {f"{vendor_id}:{instance}": expires_at for vendor_id in touched})
+            if removed:
+                pipe.zrem(PRESENCE_KEY, *(f"{vendor_id}:{instance}" for vendor_id in removed))
+            pipe.zremrangebyscore(PRESENCE_KEY, '-inf', time.time())
+            await pipe.execute()
+
+    def online(self, vendor_ids=None):
+        """Online vendor ids, or None when Redis cannot be reached."""
+        import redis
+        if self.sync_client is None:
+            self.sync_client = self.client(redis)
+        if vendor_ids is not None:
+            vendor_ids = {str(vendor_id) for vendor_id in vendor_ids}
+            if not vendor_ids:
+                return set()
+        try:
+            members = self.sync_client.zrangebyscore(PRESENCE_KEY, time.time(), '+inf')
+        except redis.RedisError as exc:
+            print(f"Presence lookup failed: {exc}")
+            return None
+        online = {member.rsplit(':', 1)[0] for member in members}
+        return online if vendor_ids is None else online & vendor_ids
+
+
+class PresenceTracker:
+    """
+    Per-process view of which vendors hold live websocket connections.
+
+    Connects and disconnects only update local counters; a timer flushes
+    the accumulated changes to the store in one batch every
+    ``FLUSH_INTERVAL`` seconds and re-touches every connected vendor each
+    ``HEARTBEAT_INTERVAL`` seconds so their entries never reach the TTL.
+    Entries are written under this tracker's own ``instance`` id, so its
+    last disconnect does not hide a vendor still connected elsewhere.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.instance = uuid.uuid4().hex
+        self.connections = {}
+        self.touched = set()
+        self.removed = set()
+        self.last_heartbeat = 0.0
+        self.timer = None
+
+    def connected(self, vendor_id):
+        vendor_id = str(vendor_id)
+        self.connections[vendor_id] = self.connections.get(vendor_id, 0) + 1
+        self.touched.add(vendor_id)
+        self.removed.discard(vendor_id)
+        self.schedule()
+
+    def disconnected(self, vendor_id):
+        vendor_id = str(vendor_id)
+        remaining = self.connections.get(vendor_id, 0) - 1
+        if remaining > 0:
+            self.connections[vendor_id] = remaining
+            return
+        self.connections.pop(vendor_id, None)
+        self.touched.discard(vendor_id)
+        self.removed.add(vendor_id)
+        self.schedule()
+
+    def schedule(self, delay=FLUSH_INTERVAL):
+        """Make sure a flush runs within ``delay`` seconds."""
+        loop = asyncio.get_running_loop()
+        if self.timer is not None:
+            if self.timer.when() <= loop.time() + delay:
+                return
+            self.timer.cancel()
+        self.timer = loop.call_later(delay, lambda: asyncio.ensure_future(self.flush()))
+
+    async def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        now = time.time()
+        touched, self.touched = self.touched, set()
+        removed, self.removed = self.removed, set()
+        if now - self.last_heartbeat >= HEARTBEAT_INTERVAL:
+            touched |= set(self.connections)
+            self.last_heartbeat = now
+        if touched or removed:
+            try:
+                await self.store.apply(self.instance, touched, removed, now + PRESENCE_TTL)
+            except Exception as exc:
+                print(f"Presence flush failed, retrying: {exc}")
+                self.touched |= touched - self.removed
+                self.removed |= removed - self.touched
+                self.schedule()
+                return
+        if self.connections:
+            self.schedule(HEARTBEAT_INTERVAL)
+
+
+_store = None
+_trackers = weakref.WeakKeyDictionary()
+
+
+def get_presence_store():
+    """
+    Presence lives next to the channel layer: Redis if it uses Redis (the
+    first shard's, when the layer is sharded).
+    """
+    global _store
+    if _store is None:
+        layer = settings.CHANNEL_LAYERS.get('default', {})
+        if 'shards' in layer.get('CONFIG', {}):
+            layer = layer['CONFIG']['shards'][0]
+        if 'redis' in layer.get('BACKEND', '').lower():
+            _store = RedisPresenceStore(layer['CONFIG']['hosts'][0])
+        else:
+            _store = LocalPresenceStore()
+    return _store
+
+
+def get_presence_tracker():
+    loop = asyncio.get_running_loop()
+    if loop not in _trackers:
+        _trackers[loop] = PresenceTracker(get_presence_store())
+    return _trackers[loop]
+
+
+@receiver(setting_changed)
+def reset_presence(setting, **kwargs):
+    global _store
+    if setting == 'CHANNEL_LAYERS':
+        _store = None
+        _trackers.clear()
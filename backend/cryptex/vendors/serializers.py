@@ -1,12 +1,20 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Vendor
+from cryptex.query_plan import QueryPlan, SparseFieldsetMixin, related
+from .models import Vendor, VendorStats
+from .stats import summarize
 from users.models import User
-from assets.serializers import AssetSerializer
+from assets.serializers import CachedAssetField
 from assets.models import Asset
 
 
-class ShallowVendorSerializer(serializers.ModelSerializer):
-    supported_assets = AssetSerializer(many=True, read_only=True)
+# Asset payloads come from the catalogue cache; only the ids are loaded.
+SUPPORTED_ASSET_IDS = Prefetch('supported_assets', queryset=Asset.objects.only('id'))
+
+
+class ShallowVendorSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    field_plans = {'supported_assets': QueryPlan(prefetch_related=[SUPPORTED_ASSET_IDS])}
+    supported_assets = CachedAssetField(many=True)
     class Meta:
         model = Vendor
         fields = [
@@ -17,11 +25,38 @@ class ShallowVendorSerializer(serializers.ModelSerializer):
         ]
 
 
-class VendorSerializer(serializers.ModelSerializer):
+class VendorAssetStatsSerializer(serializers.ModelSerializer):
+    asset = CachedAssetField()
+
+    class Meta:
+        model = VendorStats
+        fields = [
+            'asset', 'pending_count', 'completed_count', 'cancelled_count',
+            'completed_quantity', 'completed_amount', 'naira_paid',
+        ]
+
+
+class VendorStatsSerializer(serializers.Serializer):
+    """A vendor's trade totals, rendered from the output of ``stats.summarize``."""
+    trades = serializers.IntegerField()
+    pending = serializers.IntegerField()
+    completed = serializers.IntegerField()
+    cancelled = serializers.IntegerField()
+    naira_paid = serializers.DecimalField(max_digits=24, decimal_places=2)
+    average_completion_seconds = serializers.FloatField(allow_null=True)
+    assets = VendorAssetStatsSerializer(many=True)
+
+
+class VendorSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Vendor model."""
+    field_plans = {
+        'user': related('user'),
+        'supported_assets': QueryPlan(prefetch_related=[SUPPORTED_ASSET_IDS]),
+    }
     user = serializers.SerializerMethodField()
     transactions = serializers.SerializerMethodField()
-    supported_assets = AssetSerializer(many=True, read_only=True)
+    stats = serializers.SerializerMethodField()
+    supported_assets = CachedAssetField(many=True)
     supported_assets_ids = serializers.PrimaryKeyRelatedField(
         source='supported_assets',
         queryset=Asset.objects.all(),
@@ -37,20 +72,39 @@ class VendorSerializer(serializers.ModelSerializer):
             'contact_email', 'rating',
             'is_online', 'supported_assets',
             'supported_assets_ids', 'transactions',
-            'created_at', 'updated_at'
+            'stats', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    def to_representation(self, instance):
+        """
+        Report a vendor as online only while they also hold a live websocket
+        connection, when the view has looked up presence for this page.
+        """
+        data = super().to_representation(instance)
+        online_vendor_ids = self.context.get('online_vendor_ids')
+        if online_vendor_ids is not None and 'is_online' in data:
+            data['is_online'] = data['is_online'] and str(instance.id) in online_vendor_ids
+        return data
+
     def get_transactions(self, obj):
         """Get the transactions for the vendor."""
         from transactions.serializers import TransactionSerializer
         if self.context.get('include_transactions', False):
             transactions = obj.transactions.all()
-            return TransactionSerializer(transactions, many=True).data
+            return TransactionSerializer(
+                transactions, many=True, fields=self.nested_fieldset('transactions')
+            ).data
+        return None
+
+    def get_stats(self, obj):
+        """Trade totals from the vendor's VendorStats rows, when requested."""
+        if self.context.get('include_stats', False):
+            return VendorStatsSerializer(summarize(obj.stats.all())).data
         return None
 
     def get_user(self, obj):
         """Get the user profile for the vendor."""
         from users.serializers import ShallowUserSerializer
-        return ShallowUserSerializer(obj.user, context=self.context).data
+        return ShallowUserSerializer(obj.user, context=self.context, fields=self.nested_fieldset('user')).data
 
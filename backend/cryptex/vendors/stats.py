@@ -0,0 +1,120 @@
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from .models import VendorStats
+
+# One trade moving from ``old_status`` to ``new_status`` at ``changed_at``;
+# either status is None when the trade is being created or removed.
+StatusChange = namedtuple('StatusChange', [
+    'vendor_id', 'asset_id', 'old_status', 'new_status',
+    'quantity', 'amount', 'naira_paid', 'created_at', 'changed_at',
+])
+
+COUNTERS = {
+    'pending': 'pending_count',
+    'completed': 'completed_count',
+    'cancelled': 'cancelled_count',
+}
+
+
+def completed_totals(change):
+    """What one completed trade contributes beyond its count."""
+    return {
+        'completed_quantity': change.quantity or Decimal(0),
+        'completed_amount': change.amount or Decimal(0),
+        'naira_paid': change.naira_paid or Decimal(0),
+        'completion_seconds': (change.changed_at - change.created_at).total_seconds(),
+    }
+
+
+def apply_status_changes(changes):
+    """
+    Fold trade status changes into VendorStats: one UPDATE of ``F()``
+    increments per affected vendor and asset, so concurrent writers never
+    overwrite each other's totals.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for change in changes:
+        delta = deltas[(change.vendor_id, change.asset_id)]
+        for status, sign in ((change.old_status, -1), (change.new_status, 1)):
+            if status in COUNTERS:
+                delta[COUNTERS[status]] += sign
+            if status == 'completed':
+                for field, value in completed_totals(change).items():
+                    delta[field] += sign * value
+    deltas = {key: {f: v for f, v in delta.items() if v} for key, delta in deltas.items()}
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        VendorStats.objects.bulk_create(
+            [VendorStats(vendor_id=vendor_id, asset_id=asset_id) for vendor_id, asset_id in deltas],
+            ignore_conflicts=True,
+        )
+        for (vendor_id, asset_id), delta in deltas.items():
+            VendorStats.objects.filter(vendor_id=vendor_id, asset_id=asset_id).update(
+                **{field: F(field) + value for field, value in delta.items()}
+            )
+
+
+def rebuild_vendor_stats(vendor_ids=None):
+    """
+    Recompute VendorStats from the transactions table, for every vendor or
+    only ``vendor_ids``. Completion time is taken as ``updated_at`` here,
+    since trades do not record when they were completed.
+    """
+    from transactions.models import Transaction
+
+    completed = Q(status='completed')
+    trades = Transaction.objects.all()
+    stats = VendorStats.objects.all()
+    if vendor_ids is not None:
+        trades = trades.filter(vendor_id__in=vendor_ids)
+        stats = stats.filter(vendor_id__in=vendor_ids)
+    rows = trades.values('vendor_id', 'asset_id').order_by().annotate(
+        pending=Count('id', filter=Q(status='pending')),
+        completed=Count('id', filter=completed),
+        cancelled=Count('id', filter=Q(status='cancelled')),
+        quantity=Sum('quantity', filter=completed),
+        amount=Sum('amount', filter=completed),
+        naira=Sum('value_paid_in_naira', filter=completed),
+        duration=Sum(
+            ExpressionWrapper(F('updated_at') - F('created_at'), output_field=DurationField()),
+            filter=completed,
+        ),
+    )
+    rebuilt = [
+        VendorStats(
+            vendor_id=row['vendor_id'], asset_id=row['asset_id'],
+            pending_count=row['pending'], completed_count=row['completed'],
+            cancelled_count=row['cancelled'],
+            completed_quantity=row['quantity'] or 0, completed_amount=row['amount'] or 0,
+            naira_paid=row['naira'] or 0,
+            completion_seconds=row['duration'].total_seconds() if row['duration'] else 0,
+        )
+        for row in rows
+    ]
+    with transaction.atomic():
+        stats.delete()
+        VendorStats.objects.bulk_create(rebuilt, batch_size=1_000)
+    return len(rebuilt)
+
+
+def summarize(rows):
+    """Vendor-wide totals over the vendor's per-asset VendorStats rows, plus the rows."""
+    rows = list(rows)
+    completed = sum(row.completed_count for row in rows)
+    seconds = sum(row.completion_seconds for row in rows)
+    pending = sum(row.pending_count for row in rows)
+    cancelled = sum(row.cancelled_count for row in rows)
+    return {
+        'trades': pending + completed + cancelled,
+        'pending': pending,
+        'completed': completed,
+        'cancelled': cancelled,
+        'naira_paid': sum((row.naira_paid for row in rows), Decimal(0)),
+        'average_completion_seconds': round(seconds / completed, 1) if completed else None,
+        'assets': rows,
+    }
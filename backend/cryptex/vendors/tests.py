@@ -1,3 +1,212 @@
-from django.test import TestCase
+import time
+from unittest import mock
+from decimal import Decimal
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from django.test import TestCase, TransactionTestCase, override_settings
+from cryptex.benchmarking import IN_MEMORY_CHANNEL_LAYERS
+from cryptex.testing import QueryBudgetMixin, SettleOutboxMixin, TradeFixturesMixin
+from .presence import get_presence_store, get_presence_tracker
 
-# Create your tests here.
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class VendorQueryBudgetTests(TradeFixturesMixin, QueryBudgetMixin, TestCase):
+    def test_list_query_count_is_flat(self):
+        self.assertFlatQueryCount('/api/vendors/', self.grow_trades, budget=3)
+
+    def test_list_with_stats_query_count_is_flat(self):
+        self.make_trade()
+        self.assertFlatQueryCount('/api/vendors/?include_stats=true', self.grow_trades, budget=4)
+
+    def test_list_with_transactions_query_count_is_flat(self):
+        self.make_trade()
+        self.assertFlatQueryCount('/api/vendors/?include_transactions=true', self.grow_trades, budget=8)
+
+
+class VendorWriteTests(TradeFixturesMixin, TestCase):
+    def test_supported_assets_are_written_by_id_and_read_from_the_cache(self):
+        from assets.models import Asset
+        from .serializers import VendorSerializer
+        bitcoin = Asset.objects.create(name='Bitcoin', symbol='BTC')
+        response = self.client.patch(f'/api/vendors/{self.vendor.id}/', {
+            'supported_assets_ids': [str(bitcoin.id)],
+            'supported_assets': ['ignored'],
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([asset['symbol'] for asset in response.data['supported_assets']], ['BTC'])
+
+        serializer = VendorSerializer(data={
+            'display_name': 'New', 'contact_email': 'new@example.com',
+            'supported_assets_ids': [str(self.asset.id)],
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class VendorDiscoveryTests(TradeFixturesMixin, TestCase):
+    def connect(self, *vendors):
+        async def apply():
+            await get_presence_store().apply('test', {str(v.id) for v in vendors}, set(), time.time() + 60)
+        async_to_sync(apply)()
+
+    def test_filters_by_asset_online_and_rating_best_first(self):
+        from assets.models import Asset
+        best = self.make_vendor('best', rating=Decimal('4.90'))
+        good = self.make_vendor('good', rating=Decimal('4.10'))
+        offline = self.make_vendor('offline', rating=Decimal('5.00'), is_online=False)
+        self.make_vendor('low', rating=Decimal('2.00'))
+        other = self.make_vendor('other', rating=Decimal('4.50'))
+        other.supported_assets.set([Asset.objects.create(name='Bitcoin', symbol='BTC')])
+        self.make_vendor('disconnected', rating=Decimal('4.95'))
+        self.connect(best, good, other, offline)
+
+        response = self.client.get('/api/vendors/discover/?symbol=usdt&is_online=true&min_rating=4')
+
+        self.assertEqual([row['id'] for row in response.data['results']], [str(best.id), str(good.id)])
+
+    def test_min_rating_must_be_a_finite_number(self):
+        for value in ('abc', 'NaN', 'Infinity', '-Infinity'):
+            response = self.client.get(f'/api/vendors/discover/?min_rating={value}')
+            self.assertEqual(response.status_code, 400, value)
+            self.assertIn('min_rating', response.data)
+
+    def test_online_pages_scan_past_disconnected_vendors(self):
+        from cryptex.pagination import KeysetCursorPagination
+        vendors = [self.make_vendor(f'rated-{index}', rating=Decimal(5) - index / Decimal(10)) for index in range(7)]
+        self.connect(vendors[0], vendors[5], vendors[6])
+
+        seen, requests = [], 0
+        url = '/api/vendors/discover/?is_online=true&page_size=2'
+        with mock.patch.object(KeysetCursorPagination, 'max_scan_pages', 2):
+            while url:
+                response = self.client.get(url)
+                seen.extend(row['id'] for row in response.data['results'])
+                requests += 1
+                url = response.data['next']
+
+        self.assertEqual(seen, [str(vendors[index].id) for index in (0, 5, 6)])
+        self.assertEqual(requests, 2)  # the first page stopped scanning early and resumed
+
+    def test_pages_continue_past_unrated_vendors(self):
+        rated = self.make_vendor('rated', rating=Decimal('3.00'))
+        unrated = [self.make_vendor(f'unrated-{index}') for index in range(3)]
+
+        seen = []
+        url = f'/api/vendors/discover/?asset_id={self.asset.id}&page_size=2'
+        while url:
+            response = self.client.get(url)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen[0], str(rated.id))
+        self.assertCountEqual(seen[1:], [str(v.id) for v in unrated] + [str(self.vendor.id)])
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class VendorPresenceTests(TradeFixturesMixin, TransactionTestCase):
+    def setUp(self):
+        self.setUpTestData()
+
+    def listed_online(self):
+        return self.client.get(f'/api/vendors/{self.vendor.id}/').data['is_online']
+
+    def test_presence_follows_vendor_websocket_connections(self):
+        async def connect():
+            communicator = self.socket(f'/ws/vendor/{self.vendor.id}/', self.vendor.user)
+            await communicator.connect()
+            await get_presence_tracker().flush()
+            return communicator
+
+        async def disconnect(communicator):
+            await communicator.disconnect()
+            await get_presence_tracker().flush()
+
+        async def scenario():
+            communicator = await connect()
+            online = await database_sync_to_async(self.listed_online)()
+            await disconnect(communicator)
+            return online, await database_sync_to_async(self.listed_online)()
+
+        self.assertFalse(self.listed_online())
+        self.assertEqual(async_to_sync(scenario)(), (True, False))
+
+    def test_vendor_stays_online_while_any_process_holds_a_connection(self):
+        store, vendor_id = get_presence_store(), str(self.vendor.id)
+
+        async def apply(instance, touched=(), removed=()):
+            await store.apply(instance, set(touched), set(removed), time.time() + 60)
+
+        async_to_sync(apply)('first', touched=[vendor_id])
+        async_to_sync(apply)('second', touched=[vendor_id])
+        async_to_sync(apply)('first', removed=[vendor_id])
+        self.assertEqual(store.online([vendor_id]), {vendor_id})
+        async_to_sync(apply)('second', removed=[vendor_id])
+        self.assertEqual(store.online([vendor_id]), set())
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class VendorStatsTests(TradeFixturesMixin, SettleOutboxMixin, TestCase):
+    def snapshot(self):
+        from .models import VendorStats
+        return sorted(
+            (str(row.asset_id), row.pending_count, row.completed_count, row.cancelled_count,
+             row.completed_quantity, row.naira_paid)
+            for row in VendorStats.objects.filter(vendor=self.vendor)
+        )
+
+    def test_incremental_updates_match_a_rebuild(self):
+        from datetime import timedelta
+        from transactions.tasks import auto_cancel_inactive_trades
+        from .stats import rebuild_vendor_stats
+        patched, moved = self.make_trade(), self.make_trade()
+        self.make_trade(age=timedelta(minutes=30))
+        self.make_trade()
+
+        self.client.patch(f'/api/transactions/{patched.id}/', {'status': 'completed', 'value_paid_in_naira': '1500'},
+                          content_type='application/json')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/transactions/transition/', [
+                {'id': str(moved.id), 'expected_status': 'pending', 'new_status': 'cancelled'},
+            ], content_type='application/json')
+            auto_cancel_inactive_trades()
+
+        incremental = self.snapshot()
+        rebuild_vendor_stats()
+        self.assertEqual(incremental, self.snapshot())
+        self.assertEqual(incremental[0][1:4], (1, 1, 2))
+        self.assertEqual(incremental[0][5], Decimal('1500'))
+
+    def test_edits_and_deletes_match_a_rebuild(self):
+        from .stats import rebuild_vendor_stats
+        other = self.make_vendor('other')
+        edited, moved, deleted = (self.make_trade(status='completed', value_paid_in_naira=Decimal('100'))
+                                  for _ in range(3))
+
+        self.client.patch(f'/api/transactions/{edited.id}/', {'amount': '7', 'value_paid_in_naira': '900'},
+                          content_type='application/json')
+        self.client.patch(f'/api/transactions/{moved.id}/', {'vendor_id': str(other.id)},
+                          content_type='application/json')
+        self.client.delete(f'/api/transactions/{deleted.id}/')
+        with mock.patch('transactions.signals.apply_status_changes', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.make_trade()
+
+        incremental = self.snapshot()
+        rebuild_vendor_stats()
+        self.assertEqual(incremental, self.snapshot())
+        self.assertEqual(incremental[0][1:4], (0, 1, 0))
+        self.assertEqual(incremental[0][5], Decimal('900'))
+
+    def test_stats_are_served_from_the_rollup(self):
+        self.make_trade(status='completed', value_paid_in_naira=Decimal('200'))
+        self.make_trade()
+
+        response = self.client.get(f'/api/vendors/{self.vendor.id}/stats/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['trades'], response.data['completed']), (2, 1))
+        self.assertEqual(response.data['naira_paid'], '200.00')
+        self.assertEqual(response.data['assets'][0]['asset']['symbol'], 'USDT')
+        listed = self.client.get('/api/vendors/?include_stats=true').data[0]
+        self.assertEqual(listed['stats']['trades'], 2)
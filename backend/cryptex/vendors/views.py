@@ -1,13 +1,36 @@
+import uuid
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from cryptex.db_routing import ReplicaReadMixin
+from cryptex.pagination import KeysetCursorPagination, parse_decimal
+from cryptex.query_plan import QueryPlan, QueryPlanMixin
+from assets.cache import asset_cache
+from transactions.serializers import transactions_query_plan
 from .models import Vendor
-from .serializers import VendorSerializer
+from .presence import get_presence_store
+from .serializers import VendorSerializer, VendorStatsSerializer
+from .stats import summarize
 
-class VendorViewSet(viewsets.ModelViewSet):
+
+class VendorDiscoveryPagination(KeysetCursorPagination):
+    """Best-rated vendors first, unrated vendors last."""
+    position_field = 'rating'
+    position_nullable = True
+    page_size = 20
+
+    def parse_position(self, value):
+        return parse_decimal(value)
+
+
+class VendorViewSet(ReplicaReadMixin, QueryPlanMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and editing vendor instances.
     """
     queryset = Vendor.objects.all()
     serializer_class = VendorSerializer
+    replica_actions = ('list', 'discover')
 
     def get_queryset(self):
         """
@@ -17,12 +40,94 @@ class VendorViewSet(viewsets.ModelViewSet):
         queryset = super().get_queryset()
         username = self.request.query_params.get('username')
         if username:
-            queryset = queryset.filter(username=username)
-        if self.request.query_params.get('include_transactions', 'false').lower() == 'true':
-            queryset = queryset.prefetch_related('transactions')
+            queryset = queryset.filter(user__username=username)
         return queryset
 
+    def get_query_plan(self):
+        plan = super().get_query_plan()
+        if self.include_transactions():
+            plan += transactions_query_plan()
+        if self.include_stats():
+            plan += QueryPlan(prefetch_related=['stats'])
+        return plan
+
+    def include_transactions(self):
+        return ('transactions' in self.expansions()
+                or self.request.query_params.get('include_transactions', 'false').lower() == 'true')
+
+    def include_stats(self):
+        return ('stats' in self.expansions()
+                or self.request.query_params.get('include_stats', 'false').lower() == 'true')
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
-        context['include_transactions'] = self.request.query_params.get('include_transactions', 'false').lower() == 'true'
-        return context
\ No newline at end of file
+        context['include_transactions'] = self.include_transactions()
+        context['include_stats'] = self.include_stats()
+        return context
+
+    def get_serializer(self, *args, **kwargs):
+        """Look up live presence once for every vendor being rendered."""
+        instance = args[0] if args else None
+        if instance is not None and self.request.method == 'GET':
+            vendors = instance if kwargs.get('many') else [instance]
+            kwargs['context'] = self.get_serializer_context()
+            kwargs['context']['online_vendor_ids'] = get_presence_store().online(
+                [vendor.id for vendor in vendors]
+            )
+        return super().get_serializer(*args, **kwargs)
+
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        """The vendor's trade totals, read from its VendorStats rows."""
+        vendor = self.get_object()
+        return Response(VendorStatsSerializer(summarize(vendor.stats.all())).data)
+
+    @action(detail=False, methods=['get'], pagination_class=VendorDiscoveryPagination)
+    def discover(self, request):
+        """
+        Vendors who can take a trade, best rated first.
+
+        Filters: ``asset_id`` or ``symbol`` (supported asset), ``is_online``
+        and ``min_rating``. Results are keyset-paginated by rating.
+        """
+        queryset = self.get_queryset()
+        params = request.query_params
+
+        asset_id = params.get('asset_id')
+        symbol = params.get('symbol')
+        if symbol and not asset_id:
+            asset = next((a for a in asset_cache.all() if a['symbol'] == symbol.upper()), None)
+            if asset is None:
+                raise ValidationError({'symbol': 'Unknown asset.'})
+            asset_id = asset['id']
+        if asset_id:
+            try:
+                queryset = queryset.filter(supported_assets=uuid.UUID(str(asset_id)))
+            except ValueError:
+                raise ValidationError({'asset_id': 'A valid UUID is required.'})
+
+        # Online means the vendor's own flag (indexed) and a live connection,
+        # checked against presence one scanned batch at a time.
+        keep = None
+        is_online = params.get('is_online')
+        if is_online is not None:
+            wanted = is_online.lower() == 'true'
+            if wanted:
+                queryset = queryset.filter(is_online=True)
+
+            def keep(vendors):
+                present = get_presence_store().online([vendor.id for vendor in vendors if vendor.is_online])
+                if present is None:
+                    present = {str(vendor.id) for vendor in vendors}  # presence unknown: trust the flag
+                return [v for v in vendors if (v.is_online and str(v.id) in present) == wanted]
+
+        min_rating = params.get('min_rating')
+        if min_rating:
+            try:
+                queryset = queryset.filter(rating__gte=parse_decimal(min_rating))
+            except ValueError:
+                raise ValidationError({'min_rating': 'A number is required.'})
+
+        page = self.paginator.paginate_queryset(queryset, request, view=self, keep=keep)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
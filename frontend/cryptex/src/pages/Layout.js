@@ -15,11 +15,26 @@ const Layout = () => {
   const navigate = useNavigate();
   const location = useLocation();
 
-  // Listen for vendor notifications
+  const loadPendingTrade = () => {
+    api
+      .get(`/transactions/?vendor_id=${user.vendor_profile.id}&status=pending`)
+      .then((res) => {
+        if (res.data && res.data.results.length > 0) {
+          const latestTrade = res.data.results[0];
+          setTradeNotif(latestTrade);
+          localStorage.setItem("vendorTradeNotif", JSON.stringify(latestTrade));
+        }
+      });
+  };
+
+  // Listen for vendor notifications. Missed trades are replayed on
+  // reconnect; "resync" means some were lost, so reload the list once.
   useVendorWebSocket(user?.vendor_profile?.id, (data) => {
     if (data.type === "trade_started") {
       setTradeNotif(data.trade);
       localStorage.setItem("vendorTradeNotif", JSON.stringify(data.trade));
+    } else if (data.type === "resync") {
+      loadPendingTrade();
     }
   });
 
@@ -33,20 +48,7 @@ const Layout = () => {
     if (savedNotif) {
       setTradeNotif(JSON.parse(savedNotif));
     } else if (user?.is_vendor && user.vendor_profile?.id) {
-      api
-        .get(
-          `/transactions/?vendor_id=${user.vendor_profile.id}&status=pending`
-        )
-        .then((res) => {
-          if (res.data && res.data.length > 0) {
-            const latestTrade = res.data[res.data.length - 1];
-            setTradeNotif(latestTrade);
-            localStorage.setItem(
-              "vendorTradeNotif",
-              JSON.stringify(latestTrade)
-            );
-          }
-        });
+      loadPendingTrade();
     }
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [user]);
@@ -50,7 +50,7 @@ const SelectTrader = () => {
 
   const handleStartTrade = async (vendor) => {
     try {
-      const vendorPendingTrades = await fetchPendingTrades(vendor.user);
+      const vendorPendingTrades = await fetchPendingTrades(vendor.user, vendor.id);
       if (vendorPendingTrades.length > 0) {
         toast.error(
           "Vendor is currently busy with another trade. Please select a different vendor."
@@ -66,25 +66,6 @@ const SelectTrader = () => {
         amount: tradeDetails.amount,
         status: "pending",
       });
-
-      const ws = new window.WebSocket(
-        `ws://localhost:8000/ws/vendor/${vendor.id}/`
-      );
-      ws.onopen = () => {
-        console.log("WebSocket connection established");
-        ws.send(
-          JSON.stringify({
-            type: "trade_started",
-            trade: {
-              id: res.data.id,
-              seller: { username: user.username },
-              asset: { name: tradeDetails.asset.name },
-              amount: tradeDetails.amount,
-            },
-          })
-        );
-        ws.close();
-      };
       navigate(`/trade/${res.data.id}`);
     } catch (err) {
       toast.error("Failed to start trade. Please try again.");
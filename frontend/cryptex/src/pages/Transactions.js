@@ -1,37 +1,64 @@
-import { useEffect, useState } from "react";
+import { useCallback, useEffect, useMemo, useState } from "react";
 import { useNavigate } from "react-router-dom";
-import { api } from "../utils/api";
 import { useAuth } from "../contexts/AuthContext";
 import TransactionItem from "../components/TransactionItem";
-import { coingeckoIdMap } from "../utils/utils";
+import {
+  coingeckoIdMap,
+  fetchTradePages,
+  uniqueTrades,
+  userTradeListings,
+} from "../utils/utils";
+
+const newestFirst = (a, b) =>
+  new Date(b.created_at).getTime() - new Date(a.created_at).getTime();
 
 function Transactions() {
   const { user } = useAuth();
-  const [transactions, setTransactions] = useState([]);
+  const [loaded, setLoaded] = useState([]);
+  const [cursors, setCursors] = useState([]);
+  const [oldest, setOldest] = useState([]);
   const [cgData, setCgData] = useState({});
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const navigate = useNavigate();
+  const listings = useMemo(
+    () => userTradeListings(user.id, user.vendor_profile?.id),
+    [user.id, user.vendor_profile?.id]
+  );
+
+  // Pages of the user's listings, loaded one at a time.
+  const loadPage = useCallback(
+    async (previous, after) => {
+      const page = await fetchTradePages(listings, after);
+      setLoaded(uniqueTrades([...previous, ...page.trades]).sort(newestFirst));
+      setCursors(page.cursors);
+      setOldest(page.oldest);
+    },
+    [listings]
+  );
 
   useEffect(() => {
-    api.get("/transactions/").then((res) => {
-      const txs = res.data
-        .filter(
-          (t) => t.seller?.id === user.id || t.vendor?.user?.id === user.id
-        )
-        .sort(
-          (a, b) =>
-            new Date(b.created_at).getTime() - new Date(a.created_at).getTime()
-        );
-      setTransactions(txs);
-      setLoading(false);
-    });
-  }, [user.id]);
+    setLoading(true);
+    loadPage([]).finally(() => setLoading(false));
+  }, [loadPage]);
+
+  const loadMore = () => {
+    setLoadingMore(true);
+    loadPage(loaded, cursors).finally(() => setLoadingMore(false));
+  };
+
+  // Hold back trades that a listing's unloaded pages could still precede.
+  const cutoff = Math.max(...oldest.map((at) => new Date(at).getTime()));
+  const transactions = loaded.filter(
+    (tx) => new Date(tx.created_at).getTime() >= cutoff
+  );
+  const hasMore = cursors.some(Boolean);
 
   // Fetch CoinGecko data for all unique asset symbols in transactions
   useEffect(() => {
     const symbols = [
       ...new Set(
-        transactions
+        loaded
           .map(
             (tx) =>
               tx.asset?.symbol?.toUpperCase() ||
@@ -61,7 +88,7 @@ function Transactions() {
       }
     };
     fetchCoinGecko();
-  }, [transactions]);
+  }, [loaded]);
 
   const grouped = transactions.reduce((acc, tx) => {
     const date = new Date(tx.created_at).toLocaleDateString(undefined, {
@@ -113,6 +140,17 @@ function Transactions() {
           ))}
         </div>
       ))}
+      {hasMore && (
+        <div className="text-center">
+          <button
+            className="btn btn-outline-primary"
+            onClick={loadMore}
+            disabled={loadingMore}
+          >
+            {loadingMore ? "Loading..." : "Load more"}
+          </button>
+        </div>
+      )}
     </div>
   );
 }
@@ -1,12 +1,60 @@
 import { api } from "./api";
 
-export const fetchPendingTrades = async (user) => {
-  const res = await api.get("transactions/?status=pending");
-  const pendingTrades = res.data.filter(
-    (trade) =>
-      trade.seller?.id === user.id || trade.vendor?.user?.id === user.id
+// Every page of a transaction listing, following the cursor links. Only for
+// listings bounded by a filter, such as status=pending.
+export const fetchTrades = async (params) => {
+  const trades = [];
+  let res = await api.get("transactions/", { params });
+  trades.push(...res.data.results);
+  while (res.data.next) {
+    res = await api.get(res.data.next);
+    trades.push(...res.data.results);
+  }
+  return trades;
+};
+
+// The listings holding a user's trades: as seller, and on their vendor account.
+export const userTradeListings = (userId, vendorId, params = {}) => {
+  const listings = [{ ...params, seller_id: userId }];
+  if (vendorId) listings.push({ ...params, vendor_id: vendorId });
+  return listings;
+};
+
+export const uniqueTrades = (trades) =>
+  trades.filter(
+    (trade, index) => trades.findIndex((t) => t.id === trade.id) === index
   );
-  return pendingTrades;
+
+// The next page of each listing, newest first. Pass the returned cursors back
+// in to continue; a null cursor means that listing is exhausted. `oldest` holds
+// the last created_at of each listing with more to come: trades older than the
+// newest of those may still be preceded by ones on a page not yet loaded.
+export const fetchTradePages = async (listings, cursors = []) => {
+  const pages = await Promise.all(
+    listings.map((params, index) => {
+      if (cursors[index] === null) return { results: [], next: null };
+      const request = cursors[index]
+        ? api.get(cursors[index])
+        : api.get("transactions/", { params });
+      return request.then((res) => res.data);
+    })
+  );
+  return {
+    trades: pages.flatMap((page) => page.results),
+    cursors: pages.map((page) => page.next),
+    oldest: pages
+      .filter((page) => page.next && page.results.length)
+      .map((page) => page.results[page.results.length - 1].created_at),
+  };
+};
+
+export const fetchPendingTrades = async (
+  user,
+  vendorId = user.vendor_profile?.id
+) => {
+  const listings = userTradeListings(user.id, vendorId, { status: "pending" });
+  const trades = await Promise.all(listings.map(fetchTrades));
+  return uniqueTrades(trades.flat());
 };
 
 export const googleLogin = async (credentialResponse, login) => {
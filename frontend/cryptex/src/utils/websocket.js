@@ -1,10 +1,20 @@
 import { useEffect, useRef } from "react";
 
+// Websockets cannot send headers from the browser, so the access token
+// rides along in the query string.
+export function socketUrl(path, params = {}) {
+  const user = JSON.parse(localStorage.getItem("user") || "null");
+  const query = new URLSearchParams(params);
+  if (user?.access) query.set("token", user.access);
+  const search = query.toString();
+  return `ws://localhost:8000${path}${search ? `?${search}` : ""}`;
+}
+
 function useTradeWebSocket(tradeId, onMessage) {
   const ws = useRef(null);
 
   useEffect(() => {
-    ws.current = new WebSocket(`ws://localhost:8000/ws/trade/${tradeId}/`);
+    ws.current = new WebSocket(socketUrl(`/ws/trade/${tradeId}/`));
     ws.current.onmessage = (e) => {
       const data = JSON.parse(e.data);
       onMessage && onMessage(data);
@@ -22,14 +32,33 @@ function useTradeWebSocket(tradeId, onMessage) {
   return send;
 }
 
+// Trade events for a vendor carry a sequence number within an epoch that
+// changes whenever the server's numbering restarts. The last position seen
+// is remembered so a reconnect asks the server for what it missed.
 export function useVendorWebSocket(vendorId, onMessage) {
   const ws = useRef(null);
 
   useEffect(() => {
     if (!vendorId) return;
-    ws.current = new WebSocket(`ws://localhost:8000/ws/vendor/${vendorId}/`);
+    const feedKey = `vendorFeed:${vendorId}`;
+    const readPosition = () =>
+      JSON.parse(localStorage.getItem(feedKey) || "null");
+    const position = readPosition();
+    const params = position
+      ? { after: position.seq, ...(position.epoch && { epoch: position.epoch }) }
+      : {};
+    ws.current = new WebSocket(socketUrl(`/ws/vendor/${vendorId}/`, params));
     ws.current.onmessage = (e) => {
       const data = JSON.parse(e.data);
+      if (data.seq !== undefined) {
+        const last = readPosition();
+        const sameEpoch = last && last.epoch === data.epoch;
+        if (sameEpoch && data.type !== "resync" && data.seq <= last.seq) return;
+        localStorage.setItem(
+          feedKey,
+          JSON.stringify({ epoch: data.epoch, seq: data.seq })
+        );
+      }
       onMessage && onMessage(data);
     };
     ws.current.onclose = () => console.log("Vendor WebSocket closed");